@@ -15,10 +15,9 @@ from auth.filters import AirtimeFilter, ClassFilter, CourseFilter
 from auth.forms import SendSmsForm, SendMessageForm
 from auth.models import SystemAdministrator, SchoolManager, CourseManager, CourseMentor, Teacher, Learner
 from auth.resources import LearnerResource, TeacherResource
-from communication.models import Message
-from communication.tasks import bulk_send_all
-from communication.utils import JunebugApi
-from core.models import TeacherClass, ParticipantBadgeTemplateRel, Participant, ParticipantQuestionAnswer
+from communication.tasks import bulk_send_all, bulk_send_messages
+from communication.utils import JunebugApi, send_bulk_messages
+from core.models import TeacherClass, ParticipantBadgeTemplateRel, ParticipantQuestionAnswer
 from gamification.models import GamificationScenario
 from mobileu.export import export_selected
 from daterange_filter.filter import DateRangeFilter
@@ -206,19 +205,23 @@ def send_message(modeladmin, request, queryset):
             publish_date = datetime.combine(date, t.time())
             message = form.cleaned_data["message"]
 
-            for learner in queryset:
-                part = Participant.objects.filter(learner=learner, is_active=True).first()
-                if part and part.classs:
-                    Message.objects.create(name=name, publishdate=publish_date, content=message, to_user=learner,
-                                           author=request.user, to_class=part.classs, course=part.classs.course)
+            learner_ids = list(queryset.values_list('id', flat=True))
 
-            successful = len(queryset)
+            if len(learner_ids) <= getattr(settings, 'MIN_MESSAGE_CELERY_SEND', 1000):
+                successful = send_bulk_messages(learner_ids, name, publish_date, message, request.user.id)
+                async = False
+            else:
+                #Use celery task
+                bulk_send_messages.delay(learner_ids, name, publish_date, message, request.user.id)
+                successful = 0
+                async = True
 
             return render_to_response(
                 'admin/auth/message_result.html',
                 {
                     'redirect': request.get_full_path(),
                     'success_num': successful,
+                    'async': async
                 },
             )
     if not form:
@@ -1,9 +1,8 @@
 from datetime import datetime, timedelta
-from django.db.models import Count
 from django.contrib import admin
 from django.utils.translation import ugettext_lazy as _
 from organisation.models import Course
-from core.models import Participant, ParticipantQuestionAnswer, Class
+from core.models import AirtimeEligibility, Class
 
 
 def today():
@@ -44,26 +43,11 @@ class AirtimeFilter(admin.SimpleListFilter):
 
     @staticmethod
     def get_date_range():
-        date = today()
-        start = date - timedelta(days=date.weekday(), weeks=1)
-        start = start.replace(hour=0, minute=0, second=0, microsecond=0)
-        end = start + timedelta(days=6)
-        end = end.replace(hour=23, minute=59, second=59, microsecond=999999)
-        return [start, end]
+        week_start = AirtimeEligibility.get_week_start(today()) - timedelta(weeks=1)
+        return AirtimeEligibility.get_week_range(week_start)
 
     def get_learner_ids(self):
-        participants = ParticipantQuestionAnswer.objects.filter(
-            answerdate__range=self.get_date_range(),
-            correct=True
-        ).values('participant').annotate(Count('participant'))
-
-        filtered_participants = participants.filter(
-            participant__count__gte=12
-        ).values('participant')
-
-        return Participant.objects.filter(
-            id__in=filtered_participants
-        ).values_list('learner', flat=True)
+        return AirtimeEligibility.get_eligible_learner_ids()
 
     def lookups(self, request, model_admin):
         return [('airtime_award', _('12 to 15 questions correct'))]
@@ -6,7 +6,7 @@ import string
 from datetime import datetime, timedelta
 from communication.models import Sms
 from django.utils import timezone
-from communication.utils import get_user_bans
+from communication.utils import is_user_banned
 from django.db.models.signals import pre_delete
 from django.dispatch import receiver
 
@@ -100,12 +100,7 @@ class CustomUser(AbstractUser):
         return temp
 
     def is_banned(self):
-        cnt = get_user_bans(self).count()
-
-        if cnt > 0:
-            return True
-        else:
-            return False
+        return is_user_banned(self.id)
 
     def __str__(self):
         return self.username
@@ -1,3 +1,4 @@
+from django.core.cache import cache
 from django.test import TestCase
 from datetime import datetime, timedelta
 from auth.models import Learner
@@ -61,6 +62,7 @@ class TestAuth(TestCase):
         return GamificationPointBonus.objects.create(name=name, **kwargs)
 
     def setUp(self):
+        cache.clear()
         self.course = self.create_course()
         self.module = self.create_module('module name', self.course)
         self.classs = self.create_class('class name', self.course)
@@ -1,8 +1,9 @@
 from django.http.response import HttpResponseRedirect, HttpResponse
+from django.contrib.admin.views.main import ChangeList
 from django_summernote.admin import SummernoteModelAdmin
 from core.models import Participant
 from core.filters import UserFilter
-from .utils import get_user_bans
+from .utils import banned_user_ids, get_active_bans
 from organisation.models import CourseModuleRel
 from .filters import *
 from .models import PostCommentLike
@@ -104,7 +105,9 @@ class DiscussionAdmin(admin.ModelAdmin):
     respond_to_selected.short_description = 'Respond to selected'
 
     def moderate_selected(modeladmin, request, queryset):
+        ids = list(queryset.values_list('id', flat=True))
         queryset.update(moderated=True)
+        Moderation.sync(Moderation.MT_DISCUSSION, ids)
 
     moderate_selected.short_description = 'Moderate selected'
 
@@ -275,6 +278,19 @@ class SmsQueuedAdmin(ImportExportModelAdmin):
     mark_as_sent.short_description = 'Mark as sent'
 
 
+def load_bans(objs):
+    bans = get_active_bans(banned_user_ids(obj.author_id for obj in objs))
+    for obj in objs:
+        obj.active_ban = bans.get(obj.author_id)
+
+
+class ModerationChangeList(ChangeList):
+    def get_results(self, request):
+        super(ModerationChangeList, self).get_results(request)
+        # the bans shown for the page are looked up together rather than per row
+        load_bans(self.result_list)
+
+
 class ModerationAdmin(admin.ModelAdmin):
     list_display = (
         'get_content',
@@ -287,6 +303,7 @@ class ModerationAdmin(admin.ModelAdmin):
         'get_unmoderated_date',
         'get_ban'
     )
+    list_select_related = ('author', 'unmoderated_by')
 
     list_filter = (
         ModerationContentFilter,
@@ -404,13 +421,17 @@ class ModerationAdmin(admin.ModelAdmin):
     get_unmoderated_date.short_description = 'Unpublished on'
     get_unmoderated_date.allow_tags = True
 
+    def get_changelist(self, request, **kwargs):
+        return ModerationChangeList
+
     def get_ban(self, obj):
-        bans = get_user_bans(obj.author)
+        if not hasattr(obj, 'active_ban'):
+            load_bans([obj])
 
-        if bans.count() == 0:
+        if obj.active_ban is None:
             return ''
         else:
-            dur = bans[0].get_duration()
+            dur = obj.active_ban.get_duration()
             plural = ''
 
             if dur > 1:
@@ -448,9 +469,9 @@ class ModerationAdmin(admin.ModelAdmin):
     reply_to_selected.short_description = 'Add reply'
 
     def unpublish_selected(modeladmin, request, queryset):
-        blogcomments = queryset.filter(type=Moderation.MT_BLOG_COMMENT).values("mod_id")
-        discusions = queryset.filter(type=Moderation.MT_DISCUSSION).values("mod_id")
-        chats = queryset.filter(type=Moderation.MT_CHAT).values("mod_id")
+        blogcomments = list(queryset.filter(type=Moderation.MT_BLOG_COMMENT).values_list("mod_id", flat=True))
+        discusions = list(queryset.filter(type=Moderation.MT_DISCUSSION).values_list("mod_id", flat=True))
+        chats = list(queryset.filter(type=Moderation.MT_CHAT).values_list("mod_id", flat=True))
 
         PostComment.objects.filter(id__in=blogcomments).update(
             moderated=False,
@@ -468,17 +489,27 @@ class ModerationAdmin(admin.ModelAdmin):
             unmoderated_by=request.user
         )
 
+        # bulk updates don't send signals so bring the moderation queue up to date
+        Moderation.sync(Moderation.MT_BLOG_COMMENT, blogcomments)
+        Moderation.sync(Moderation.MT_DISCUSSION, discusions)
+        Moderation.sync(Moderation.MT_CHAT, chats)
+
     unpublish_selected.short_description = 'Unpublish'
 
     def publish_selected(modeladmin, request, queryset):
-        blogcomments = queryset.filter(type=Moderation.MT_BLOG_COMMENT).values("mod_id")
-        discusions = queryset.filter(type=Moderation.MT_DISCUSSION).values("mod_id")
-        chats = queryset.filter(type=Moderation.MT_CHAT).values("mod_id")
+        blogcomments = list(queryset.filter(type=Moderation.MT_BLOG_COMMENT).values_list("mod_id", flat=True))
+        discusions = list(queryset.filter(type=Moderation.MT_DISCUSSION).values_list("mod_id", flat=True))
+        chats = list(queryset.filter(type=Moderation.MT_CHAT).values_list("mod_id", flat=True))
 
         PostComment.objects.filter(id__in=blogcomments).update(moderated=True)
         Discussion.objects.filter(id__in=discusions).update(moderated=True)
         ChatMessage.objects.filter(id__in=chats).update(moderated=True)
 
+        # bulk updates don't send signals so bring the moderation queue up to date
+        Moderation.sync(Moderation.MT_BLOG_COMMENT, blogcomments)
+        Moderation.sync(Moderation.MT_DISCUSSION, discusions)
+        Moderation.sync(Moderation.MT_CHAT, chats)
+
     publish_selected.short_description = 'Publish'
 
     def get_actions(self, request):
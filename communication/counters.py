@@ -0,0 +1,201 @@
+"""
+Cached unread message counters.
+
+The unread count for a (user, course) pair is kept as three cache entries:
+
+    total   - published messages addressed to everyone in the course, either
+              course wide or to one of the course's classes
+    user    - published messages addressed to the user in one of the
+              course's classes
+    seen    - messages from the two sets above that the user has viewed or
+              hidden
+
+so the badge count is ``total + user - seen``. The entries are incremented in
+place when messages are created, viewed or hidden, and recomputed from
+Message/MessageStatus on a cache miss. Changes that can't be applied
+incrementally (edits, deletes, scheduled messages) bump the course's
+generation, see mobileu.utils.get_generation.
+"""
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Min, Q
+from django.utils import timezone
+from mobileu.utils import bump_generation as bump_cache_generation, get_generation as get_cache_generation
+
+UNREAD_CACHE_TIMEOUT = getattr(settings, 'UNREAD_MESSAGE_CACHE_TIMEOUT', 60 * 60 * 24)
+
+KEY_PREFIX = 'communication:unread'
+
+
+def _now_like(value):
+    # publish dates are naive when freshly assigned but aware once loaded
+    # with USE_TZ, so compare them against the matching kind of "now"
+    if timezone.is_aware(value):
+        return timezone.now()
+    return datetime.now()
+
+
+def _is_scheduled(publishdate):
+    return publishdate > _now_like(publishdate)
+
+
+def _generation_key(course_id):
+    return '%s:%s:gen' % (KEY_PREFIX, course_id)
+
+
+def _key(course_id, generation, name, user_id=None):
+    if user_id is None:
+        return '%s:%s:%s:%s' % (KEY_PREFIX, course_id, generation, name)
+    return '%s:%s:%s:%s:%s' % (KEY_PREFIX, course_id, generation, name, user_id)
+
+
+def get_generation(course_id):
+    return get_cache_generation(_generation_key(course_id))
+
+
+def bump_generation(course_id):
+    return bump_cache_generation(_generation_key(course_id))
+
+
+def _published_for_course(course_id):
+    from .models import Message
+
+    return Message.objects.filter(
+        course_id=course_id,
+        direction=1,
+        publishdate__lte=datetime.now()
+    )
+
+
+def _shared_filter(course_id):
+    return Q(to_class__isnull=True) | Q(to_class__course_id=course_id, to_user__isnull=True)
+
+
+def _user_filter(course_id, user_id):
+    return Q(to_class__course_id=course_id, to_user_id=user_id)
+
+
+def count_shared(course_id):
+    return _published_for_course(course_id).filter(_shared_filter(course_id)).count()
+
+
+def count_for_user(course_id, user_id):
+    return _published_for_course(course_id).filter(_user_filter(course_id, user_id)).count()
+
+
+def count_seen(course_id, user_id):
+    from .models import MessageStatus
+
+    return MessageStatus.objects.filter(
+        Q(view_status=True) | Q(hidden_status=True),
+        user_id=user_id,
+        message__in=_published_for_course(course_id).filter(
+            _shared_filter(course_id) | _user_filter(course_id, user_id))
+    ).values('message').distinct().count()
+
+
+def next_pending_publish(course_id):
+    from .models import Message
+
+    return Message.objects.filter(
+        course_id=course_id,
+        direction=1,
+        publishdate__gt=datetime.now()
+    ).aggregate(Min('publishdate'))['publishdate__min']
+
+
+def _timeout_until(publishdate):
+    if publishdate is None:
+        return UNREAD_CACHE_TIMEOUT
+    seconds = int((publishdate - _now_like(publishdate)).total_seconds()) + 1
+    return max(1, min(seconds, UNREAD_CACHE_TIMEOUT))
+
+
+def unread_count(user_id, course_id):
+    generation = get_generation(course_id)
+    keys = {
+        'total': _key(course_id, generation, 'total'),
+        'user': _key(course_id, generation, 'user', user_id),
+        'seen': _key(course_id, generation, 'seen', user_id),
+    }
+    cached = cache.get_many(keys.values())
+    values = dict((name, cached.get(key)) for name, key in keys.items())
+
+    if None in values.values():
+        # counters for a course expire when its next scheduled message is
+        # published so that it's picked up without any writes
+        timeout = _timeout_until(next_pending_publish(course_id))
+    if values['total'] is None:
+        values['total'] = count_shared(course_id)
+        cache.set(keys['total'], values['total'], timeout)
+    if values['user'] is None:
+        values['user'] = count_for_user(course_id, user_id)
+        cache.set(keys['user'], values['user'], timeout)
+    if values['seen'] is None:
+        values['seen'] = count_seen(course_id, user_id)
+        cache.set(keys['seen'], values['seen'], timeout)
+
+    return max(values['total'] + values['user'] - values['seen'], 0)
+
+
+def _incr(key):
+    # only existing counters are incremented, missing ones are rebuilt from
+    # the database the next time they are read
+    try:
+        cache.incr(key)
+    except ValueError:
+        pass
+
+
+def message_created(message):
+    if message.direction != 1 or message.course_id is None or message.publishdate is None:
+        return
+
+    if _is_scheduled(message.publishdate):
+        bump_generation(message.course_id)
+        return
+
+    if message.to_class_id is not None and message.to_class.course_id != message.course_id:
+        # not visible to anyone in this course
+        return
+
+    generation = get_generation(message.course_id)
+    if message.to_class_id is not None and message.to_user_id is not None:
+        _incr(_key(message.course_id, generation, 'user', message.to_user_id))
+    else:
+        _incr(_key(message.course_id, generation, 'total'))
+
+
+def is_counted_for(message, user_id):
+    if message.direction != 1 or message.course_id is None or message.publishdate is None:
+        return False
+    if _is_scheduled(message.publishdate):
+        return False
+    if message.to_class_id is None:
+        return True
+    if message.to_class.course_id != message.course_id:
+        return False
+    return message.to_user_id is None or message.to_user_id == user_id
+
+
+def message_seen(message, user_id):
+    if not is_counted_for(message, user_id):
+        return
+    _incr(_key(message.course_id, get_generation(message.course_id), 'seen', user_id))
+
+
+def message_changed(message):
+    if message.course_id is not None:
+        bump_generation(message.course_id)
+
+
+def reconcile_course(course_id):
+    """
+    Drops all cached counters for the course and primes the shared total. The
+    per-user counters are rebuilt from MessageStatus as they are read.
+    """
+    generation = bump_generation(course_id)
+    timeout = _timeout_until(next_pending_publish(course_id))
+    cache.set(_key(course_id, generation, 'total'), count_shared(course_id), timeout)
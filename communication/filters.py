@@ -4,7 +4,7 @@ from django.db.models import Min
 from datetime import datetime
 from .models import *
 from auth.models import CustomUser
-import operator
+from core.filters import AutocompleteFilter
 
 
 class ModerationContentFilter(admin.SimpleListFilter):
@@ -33,12 +33,17 @@ class ModerationContentFilter(admin.SimpleListFilter):
             return queryset.filter(description=self.value())
 
 
-class ModerationUserBaseFilter(admin.SimpleListFilter):
+class ModerationUserBaseFilter(AutocompleteFilter):
+    lookup_model = CustomUser
+    search_fields = ('first_name', 'last_name', 'username')
+    lookup_ordering = ('first_name', 'last_name', 'username', 'id')
+    label_fields = ('first_name', 'last_name', 'username')
 
-    def lookups(self, request, model_admin):
-        result = set(CustomUser.objects.all())
-        return [(c.id, c.get_display_name())
-                for c in sorted(result, key=operator.methodcaller('get_display_name'))]
+    def get_label(self, row):
+        # matches CustomUser.get_display_name
+        if row['first_name']:
+            return row['first_name'] + ' ' + row['last_name']
+        return row['username']
 
 
 class ModerationUserFilter(ModerationUserBaseFilter):
@@ -0,0 +1,44 @@
+from optparse import make_option
+from django.core.management.base import BaseCommand, CommandError
+from communication.models import Moderation
+
+MODERATION_TYPES = (
+    (Moderation.MT_BLOG_COMMENT, 'blog comments'),
+    (Moderation.MT_DISCUSSION, 'discussions'),
+    (Moderation.MT_CHAT, 'chat messages'),
+)
+
+
+class Command(BaseCommand):
+    help = 'Manages the moderation queue.'
+    args = 'backfill|check'
+    option_list = BaseCommand.option_list + (
+        make_option('-f', '--fix',
+                    dest='fix',
+                    action='store_true',
+                    default=False,
+                    help='Rebuilds inconsistent entries if operation is "check".'),
+    )
+
+    def handle(self, *args, **options):
+        if len(args) != 1 or args[0] not in ('backfill', 'check'):
+            raise CommandError('Usage: manage.py moderation_queue %s' % self.args)
+
+        if args[0] == 'backfill':
+            for mod_type, label in MODERATION_TYPES:
+                self.stdout.write('Backfilling %s... ' % label, ending='')
+                Moderation.sync_all(mod_type)
+                self.stdout.write('done')
+        elif args[0] == 'check':
+            for mod_type, label in MODERATION_TYPES:
+                self.stdout.write('Checking %s... ' % label, ending='')
+                inconsistent = Moderation.find_inconsistent(mod_type)
+                if not inconsistent:
+                    self.stdout.write('done')
+                    continue
+
+                self.stdout.write('%d inconsistent' % len(inconsistent))
+                if options['fix']:
+                    self.stdout.write('Fixing %s... ' % label, ending='')
+                    Moderation.sync(mod_type, inconsistent)
+                    self.stdout.write('done')
@@ -0,0 +1,379 @@
+# -*- coding: utf-8 -*-
+from south.utils import datetime_utils as datetime
+from south.db import db
+from south.v2 import SchemaMigration
+from django.db import models
+
+
+class Migration(SchemaMigration):
+
+    def forwards(self, orm):
+        query = """
+            drop view view_communication_moderation
+        """
+        db.execute(query)
+
+        # Adding model 'Moderation'
+        db.create_table(u'communication_moderation', (
+            ('mod_pk', self.gf('django.db.models.fields.CharField')(max_length=50, primary_key=True)),
+            ('mod_id', self.gf('django.db.models.fields.PositiveIntegerField')(db_index=True)),
+            ('type', self.gf('django.db.models.fields.PositiveIntegerField')(db_index=True, null=True, blank=True)),
+            ('description', self.gf('django.db.models.fields.CharField')(db_index=True, max_length=100, null=True, blank=True)),
+            ('content', self.gf('django.db.models.fields.TextField')(null=True, blank=True)),
+            ('author', self.gf('django.db.models.fields.related.ForeignKey')(blank=True, related_name='moderation_author', null=True, on_delete=models.SET_NULL, to=orm['auth.CustomUser'])),
+            ('moderated', self.gf('django.db.models.fields.BooleanField')(default=False, db_index=True)),
+            ('publishdate', self.gf('django.db.models.fields.DateTimeField')(db_index=True, null=True, blank=True)),
+            ('response', self.gf('django.db.models.fields.TextField')(null=True, blank=True)),
+            ('unmoderated_date', self.gf('django.db.models.fields.DateTimeField')(db_index=True, null=True, blank=True)),
+            ('unmoderated_by', self.gf('django.db.models.fields.related.ForeignKey')(blank=True, related_name='moderation_unmoderator', null=True, on_delete=models.SET_NULL, to=orm['auth.CustomUser'])),
+            ('original_content', self.gf('django.db.models.fields.TextField')(null=True, blank=True)),
+        ))
+        db.send_create_signal(u'communication', ['Moderation'])
+
+        # Populate the queue with what the view used to return
+        query = """
+            insert into communication_moderation (mod_pk, mod_id, type, description, content, author_id, moderated, publishdate, response, unmoderated_date, unmoderated_by_id, original_content)
+            select '1_' || pc.id, pc.id, 1, 'Blog: ' || p.description, pc.content, pc.author_id, coalesce(pc.moderated, 1 = 0), pc.publishdate, pc_resp.content, pc.unmoderated_date, pc.unmoderated_by_id, pc.original_content
+            from communication_postcomment pc
+            left join communication_post p
+                on p.id = pc.post_id
+            left join communication_postcomment pc_resp
+                on pc_resp.id = pc.response_id
+            union all
+            select '2_' || src.id, src.id, 2, 'Discussion: ' || src.description, src.content, src.author_id, src.moderated,  src.publishdate, resp.content, src.unmoderated_date, src.unmoderated_by_id, src.original_content
+            from communication_discussion src
+            left join communication_discussion resp
+                on resp.id = src.response_id
+            union all
+            select '3_' || cm.id, cm.id, 3, 'Chat Room: ' || cg.name, cm.content, cm.author_id, cm.moderated, cm.publishdate, cm_resp.content, cm.unmoderated_date, cm.unmoderated_by_id, cm.original_content
+            from communication_chatmessage cm
+            inner join communication_chatgroup cg
+                on cg.id = cm.chatgroup_id
+            left join communication_chatmessage cm_resp
+                on cm_resp.id = cm.response_id
+        """
+        db.execute(query)
+
+    def backwards(self, orm):
+        # Deleting model 'Moderation'
+        db.delete_table(u'communication_moderation')
+
+        query = """
+            create view view_communication_moderation as
+            select '1_' || pc.id as mod_pk, pc.id as mod_id, 1 as type, 'Blog: ' || p.description as description, pc.content, pc.author_id, pc.moderated, pc.publishdate, pc_resp.content as response, pc.unmoderated_date, pc.unmoderated_by_id, pc.original_content
+            from communication_postcomment pc
+            left join communication_post p
+                on p.id = pc.post_id
+            left join communication_postcomment pc_resp
+                on pc_resp.id = pc.response_id
+            union all
+            select '2_' || src.id, src.id, 2, 'Discussion: ' || src.description, src.content, src.author_id, src.moderated,  src.publishdate, resp.content, src.unmoderated_date, src.unmoderated_by_id, src.original_content
+            from communication_discussion src
+            left join communication_discussion resp
+                on resp.id = src.response_id
+            union all
+            select '3_' || cm.id, cm.id, 3, 'Chat Room: ' || cg.name, cm.content, cm.author_id, cm.moderated, cm.publishdate, cm_resp.content, cm.unmoderated_date, cm.unmoderated_by_id, cm.original_content
+            from communication_chatmessage cm
+            inner join communication_chatgroup cg
+                on cg.id = cm.chatgroup_id
+            left join communication_chatmessage cm_resp
+                on cm_resp.id = cm.response_id
+        """
+        db.execute(query)
+
+    models = {
+        u'auth.customuser': {
+            'Meta': {'object_name': 'CustomUser'},
+            'area': ('django.db.models.fields.CharField', [], {'max_length': '50', 'blank': 'True'}),
+            'city': ('django.db.models.fields.CharField', [], {'max_length': '50', 'blank': 'True'}),
+            'country': ('django.db.models.fields.CharField', [], {'max_length': '50'}),
+            'date_joined': ('django.db.models.fields.DateTimeField', [], {'default': 'datetime.datetime.now'}),
+            'email': ('django.db.models.fields.EmailField', [], {'max_length': '75', 'blank': 'True'}),
+            'first_name': ('django.db.models.fields.CharField', [], {'max_length': '30', 'blank': 'True'}),
+            'groups': ('django.db.models.fields.related.ManyToManyField', [], {'symmetrical': 'False', 'related_name': "u'user_set'", 'blank': 'True', 'to': u"orm['auth.Group']"}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'is_active': ('django.db.models.fields.BooleanField', [], {'default': 'True'}),
+            'is_staff': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            'is_superuser': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            'last_login': ('django.db.models.fields.DateTimeField', [], {'default': 'datetime.datetime.now'}),
+            'last_name': ('django.db.models.fields.CharField', [], {'max_length': '30', 'blank': 'True'}),
+            'mobile': ('django.db.models.fields.CharField', [], {'unique': 'True', 'max_length': '50'}),
+            'optin_email': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            'optin_sms': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            'pass_reset_token': ('django.db.models.fields.CharField', [], {'max_length': '500', 'null': 'True', 'blank': 'True'}),
+            'pass_reset_token_expiry': ('django.db.models.fields.DateTimeField', [], {'null': 'True', 'blank': 'True'}),
+            'password': ('django.db.models.fields.CharField', [], {'max_length': '128'}),
+            'unique_token': ('django.db.models.fields.CharField', [], {'max_length': '500', 'null': 'True', 'blank': 'True'}),
+            'unique_token_expiry': ('django.db.models.fields.DateTimeField', [], {'null': 'True', 'blank': 'True'}),
+            'user_permissions': ('django.db.models.fields.related.ManyToManyField', [], {'symmetrical': 'False', 'related_name': "u'user_set'", 'blank': 'True', 'to': u"orm['auth.Permission']"}),
+            'username': ('django.db.models.fields.CharField', [], {'unique': 'True', 'max_length': '30'})
+        },
+        u'auth.group': {
+            'Meta': {'object_name': 'Group'},
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'name': ('django.db.models.fields.CharField', [], {'unique': 'True', 'max_length': '80'}),
+            'permissions': ('django.db.models.fields.related.ManyToManyField', [], {'to': u"orm['auth.Permission']", 'symmetrical': 'False', 'blank': 'True'})
+        },
+        u'auth.permission': {
+            'Meta': {'ordering': "(u'content_type__app_label', u'content_type__model', u'codename')", 'unique_together': "((u'content_type', u'codename'),)", 'object_name': 'Permission'},
+            'codename': ('django.db.models.fields.CharField', [], {'max_length': '100'}),
+            'content_type': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['contenttypes.ContentType']"}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'name': ('django.db.models.fields.CharField', [], {'max_length': '50'})
+        },
+        u'communication.ban': {
+            'Meta': {'object_name': 'Ban'},
+            'banned_user': ('django.db.models.fields.related.ForeignKey', [], {'related_name': "'ban_banned_user'", 'to': u"orm['auth.CustomUser']"}),
+            'banning_user': ('django.db.models.fields.related.ForeignKey', [], {'related_name': "'ban_banning_user'", 'to': u"orm['auth.CustomUser']"}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'source_pk': ('django.db.models.fields.PositiveIntegerField', [], {}),
+            'source_type': ('django.db.models.fields.PositiveIntegerField', [], {}),
+            'till_when': ('django.db.models.fields.DateTimeField', [], {}),
+            'when': ('django.db.models.fields.DateTimeField', [], {})
+        },
+        u'communication.chatgroup': {
+            'Meta': {'object_name': 'ChatGroup'},
+            'course': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['organisation.Course']", 'null': 'True'}),
+            'description': ('django.db.models.fields.CharField', [], {'max_length': '50', 'blank': 'True'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'name': ('django.db.models.fields.CharField', [], {'max_length': '50', 'unique': 'True', 'null': 'True'})
+        },
+        u'communication.chatmessage': {
+            'Meta': {'object_name': 'ChatMessage'},
+            'author': ('django.db.models.fields.related.ForeignKey', [], {'blank': 'True', 'related_name': "'chatmessage_author'", 'null': 'True', 'to': u"orm['auth.CustomUser']"}),
+            'chatgroup': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['communication.ChatGroup']", 'null': 'True'}),
+            'content': ('django.db.models.fields.TextField', [], {'blank': 'True'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'moderated': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            'original_content': ('django.db.models.fields.TextField', [], {'null': 'True', 'blank': 'True'}),
+            'publishdate': ('django.db.models.fields.DateTimeField', [], {'null': 'True', 'blank': 'True'}),
+            'response': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['communication.ChatMessage']", 'null': 'True', 'blank': 'True'}),
+            'unmoderated_by': ('django.db.models.fields.related.ForeignKey', [], {'blank': 'True', 'related_name': "'chatmessage_unmoderated_user'", 'null': 'True', 'to': u"orm['auth.CustomUser']"}),
+            'unmoderated_date': ('django.db.models.fields.DateTimeField', [], {'null': 'True', 'blank': 'True'})
+        },
+        u'communication.chatmessagelike': {
+            'Meta': {'unique_together': "(('user', 'comment'),)", 'object_name': 'ChatMessageLike'},
+            'comment': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['communication.ChatMessage']"}),
+            'date_created': ('django.db.models.fields.DateTimeField', [], {'default': 'datetime.datetime.now'}),
+            'date_updated': ('django.db.models.fields.DateTimeField', [], {'auto_now': 'True', 'blank': 'True'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'user': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['auth.CustomUser']"})
+        },
+        u'communication.coursepostrel': {
+            'Meta': {'object_name': 'CoursePostRel'},
+            'course': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['organisation.Course']"}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'post': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['communication.Post']"})
+        },
+        u'communication.discussion': {
+            'Meta': {'object_name': 'Discussion'},
+            'author': ('django.db.models.fields.related.ForeignKey', [], {'blank': 'True', 'related_name': "'discussion_author'", 'null': 'True', 'to': u"orm['auth.CustomUser']"}),
+            'content': ('django.db.models.fields.TextField', [], {'blank': 'True'}),
+            'course': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['organisation.Course']", 'null': 'True', 'blank': 'True'}),
+            'description': ('django.db.models.fields.CharField', [], {'max_length': '50', 'blank': 'True'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'moderated': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            'module': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['organisation.Module']", 'null': 'True', 'blank': 'True'}),
+            'name': ('django.db.models.fields.CharField', [], {'max_length': '50', 'null': 'True', 'blank': 'True'}),
+            'original_content': ('django.db.models.fields.TextField', [], {'null': 'True', 'blank': 'True'}),
+            'publishdate': ('django.db.models.fields.DateTimeField', [], {'null': 'True', 'blank': 'True'}),
+            'question': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['content.TestingQuestion']", 'null': 'True', 'blank': 'True'}),
+            'reply': ('django.db.models.fields.related.ForeignKey', [], {'blank': 'True', 'related_name': "'related_discussions'", 'null': 'True', 'to': u"orm['communication.Discussion']"}),
+            'response': ('django.db.models.fields.related.ForeignKey', [], {'blank': 'True', 'related_name': "'discussion_admin_response'", 'null': 'True', 'to': u"orm['communication.Discussion']"}),
+            'unmoderated_by': ('django.db.models.fields.related.ForeignKey', [], {'blank': 'True', 'related_name': "'discussion_unmoderated_user'", 'null': 'True', 'to': u"orm['auth.CustomUser']"}),
+            'unmoderated_date': ('django.db.models.fields.DateTimeField', [], {'null': 'True', 'blank': 'True'})
+        },
+        u'communication.discussionlike': {
+            'Meta': {'unique_together': "(('user', 'comment'),)", 'object_name': 'DiscussionLike'},
+            'comment': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['communication.Discussion']"}),
+            'date_created': ('django.db.models.fields.DateTimeField', [], {'default': 'datetime.datetime.now'}),
+            'date_updated': ('django.db.models.fields.DateTimeField', [], {'auto_now': 'True', 'blank': 'True'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'user': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['auth.CustomUser']"})
+        },
+        u'communication.message': {
+            'Meta': {'object_name': 'Message'},
+            'author': ('django.db.models.fields.related.ForeignKey', [], {'blank': 'True', 'related_name': "'message_author'", 'null': 'True', 'to': u"orm['auth.CustomUser']"}),
+            'content': ('django.db.models.fields.TextField', [], {'blank': 'True'}),
+            'course': ('django.db.models.fields.related.ForeignKey', [], {'related_name': "'message_course'", 'null': 'True', 'to': u"orm['organisation.Course']"}),
+            'description': ('django.db.models.fields.CharField', [], {'max_length': '50', 'blank': 'True'}),
+            'direction': ('django.db.models.fields.PositiveIntegerField', [], {'default': '1'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'name': ('django.db.models.fields.CharField', [], {'max_length': '50', 'null': 'True'}),
+            'publishdate': ('django.db.models.fields.DateTimeField', [], {'null': 'True', 'blank': 'True'}),
+            'responddate': ('django.db.models.fields.DateTimeField', [], {'null': 'True', 'blank': 'True'}),
+            'responded': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            'to_class': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['core.Class']", 'null': 'True', 'blank': 'True'}),
+            'to_user': ('django.db.models.fields.related.ForeignKey', [], {'blank': 'True', 'related_name': "'message_for_learner'", 'null': 'True', 'to': u"orm['auth.CustomUser']"})
+        },
+        u'communication.messagestatus': {
+            'Meta': {'object_name': 'MessageStatus'},
+            'hidden_date': ('django.db.models.fields.DateTimeField', [], {'null': 'True', 'blank': 'True'}),
+            'hidden_status': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'message': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['communication.Message']", 'null': 'True'}),
+            'user': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['auth.CustomUser']", 'null': 'True', 'blank': 'True'}),
+            'view_date': ('django.db.models.fields.DateTimeField', [], {'null': 'True', 'blank': 'True'}),
+            'view_status': ('django.db.models.fields.BooleanField', [], {'default': 'False'})
+        },
+        u'communication.moderation': {
+            'Meta': {'object_name': 'Moderation'},
+            'author': ('django.db.models.fields.related.ForeignKey', [], {'blank': 'True', 'related_name': "'moderation_author'", 'null': 'True', 'on_delete': 'models.SET_NULL', 'to': u"orm['auth.CustomUser']"}),
+            'content': ('django.db.models.fields.TextField', [], {'null': 'True', 'blank': 'True'}),
+            'description': ('django.db.models.fields.CharField', [], {'db_index': 'True', 'max_length': '100', 'null': 'True', 'blank': 'True'}),
+            'mod_id': ('django.db.models.fields.PositiveIntegerField', [], {'db_index': 'True'}),
+            'mod_pk': ('django.db.models.fields.CharField', [], {'max_length': '50', 'primary_key': 'True'}),
+            'moderated': ('django.db.models.fields.BooleanField', [], {'default': 'False', 'db_index': 'True'}),
+            'original_content': ('django.db.models.fields.TextField', [], {'null': 'True', 'blank': 'True'}),
+            'publishdate': ('django.db.models.fields.DateTimeField', [], {'db_index': 'True', 'null': 'True', 'blank': 'True'}),
+            'response': ('django.db.models.fields.TextField', [], {'null': 'True', 'blank': 'True'}),
+            'type': ('django.db.models.fields.PositiveIntegerField', [], {'db_index': 'True', 'null': 'True', 'blank': 'True'}),
+            'unmoderated_by': ('django.db.models.fields.related.ForeignKey', [], {'blank': 'True', 'related_name': "'moderation_unmoderator'", 'null': 'True', 'on_delete': 'models.SET_NULL', 'to': u"orm['auth.CustomUser']"}),
+            'unmoderated_date': ('django.db.models.fields.DateTimeField', [], {'db_index': 'True', 'null': 'True', 'blank': 'True'})
+        },
+        u'communication.page': {
+            'Meta': {'object_name': 'Page'},
+            'course': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['organisation.Course']", 'null': 'True'}),
+            'description': ('django.db.models.fields.CharField', [], {'max_length': '50', 'blank': 'True'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'name': ('django.db.models.fields.CharField', [], {'max_length': '500', 'unique': 'True', 'null': 'True'})
+        },
+        u'communication.post': {
+            'Meta': {'object_name': 'Post'},
+            'big_image': ('django.db.models.fields.files.ImageField', [], {'max_length': '100', 'null': 'True', 'blank': 'True'}),
+            'content': ('django.db.models.fields.TextField', [], {'blank': 'True'}),
+            'courses': ('django.db.models.fields.related.ManyToManyField', [], {'related_name': "'posts'", 'symmetrical': 'False', 'through': u"orm['communication.CoursePostRel']", 'to': u"orm['organisation.Course']"}),
+            'description': ('django.db.models.fields.CharField', [], {'max_length': '50', 'blank': 'True'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'moderated': ('django.db.models.fields.NullBooleanField', [], {'default': 'False', 'null': 'True', 'blank': 'True'}),
+            'name': ('django.db.models.fields.CharField', [], {'max_length': '50', 'unique': 'True', 'null': 'True'}),
+            'publishdate': ('django.db.models.fields.DateTimeField', [], {'null': 'True', 'blank': 'True'}),
+            'small_image': ('django.db.models.fields.files.ImageField', [], {'max_length': '100', 'null': 'True', 'blank': 'True'})
+        },
+        u'communication.postcomment': {
+            'Meta': {'object_name': 'PostComment'},
+            'author': ('django.db.models.fields.related.ForeignKey', [], {'related_name': "'postcomment_user'", 'to': u"orm['auth.CustomUser']"}),
+            'content': ('django.db.models.fields.TextField', [], {}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'moderated': ('django.db.models.fields.NullBooleanField', [], {'default': 'False', 'null': 'True', 'blank': 'True'}),
+            'original_content': ('django.db.models.fields.TextField', [], {'null': 'True', 'blank': 'True'}),
+            'post': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['communication.Post']"}),
+            'publishdate': ('django.db.models.fields.DateTimeField', [], {'null': 'True', 'blank': 'True'}),
+            'response': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['communication.PostComment']", 'null': 'True', 'blank': 'True'}),
+            'unmoderated_by': ('django.db.models.fields.related.ForeignKey', [], {'blank': 'True', 'related_name': "'unmoderated_user'", 'null': 'True', 'to': u"orm['auth.CustomUser']"}),
+            'unmoderated_date': ('django.db.models.fields.DateTimeField', [], {'null': 'True', 'blank': 'True'})
+        },
+        u'communication.postcommentlike': {
+            'Meta': {'unique_together': "(('user', 'comment'),)", 'object_name': 'PostCommentLike'},
+            'comment': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['communication.PostComment']"}),
+            'date_created': ('django.db.models.fields.DateTimeField', [], {'default': 'datetime.datetime.now'}),
+            'date_updated': ('django.db.models.fields.DateTimeField', [], {'auto_now': 'True', 'blank': 'True'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'user': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['auth.CustomUser']"})
+        },
+        u'communication.profanity': {
+            'Meta': {'object_name': 'Profanity'},
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'translation': ('django.db.models.fields.CharField', [], {'max_length': '100', 'null': 'True', 'blank': 'True'}),
+            'word': ('django.db.models.fields.CharField', [], {'max_length': '75'})
+        },
+        u'communication.report': {
+            'Meta': {'object_name': 'Report'},
+            'fix': ('django.db.models.fields.TextField', [], {}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'issue': ('django.db.models.fields.TextField', [], {}),
+            'publish_date': ('django.db.models.fields.DateTimeField', [], {'auto_now_add': 'True', 'blank': 'True'}),
+            'question': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['content.TestingQuestion']", 'null': 'True'}),
+            'response': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['communication.ReportResponse']", 'null': 'True', 'blank': 'True'}),
+            'user': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['auth.CustomUser']", 'null': 'True'})
+        },
+        u'communication.reportresponse': {
+            'Meta': {'object_name': 'ReportResponse'},
+            'content': ('django.db.models.fields.TextField', [], {}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'publish_date': ('django.db.models.fields.DateTimeField', [], {'auto_now_add': 'True', 'blank': 'True'}),
+            'title': ('django.db.models.fields.CharField', [], {'max_length': '50'})
+        },
+        u'communication.sms': {
+            'Meta': {'object_name': 'Sms'},
+            'date_sent': ('django.db.models.fields.DateTimeField', [], {}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'message': ('django.db.models.fields.TextField', [], {}),
+            'msisdn': ('django.db.models.fields.CharField', [], {'max_length': '50', 'null': 'True', 'blank': 'True'}),
+            'respond_date': ('django.db.models.fields.DateTimeField', [], {'null': 'True', 'blank': 'True'}),
+            'responded': ('django.db.models.fields.BooleanField', [], {'default': 'False', 'db_index': 'True'}),
+            'response': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['communication.SmsQueue']", 'null': 'True', 'blank': 'True'}),
+            'uuid': ('django.db.models.fields.CharField', [], {'max_length': '50', 'null': 'True'})
+        },
+        u'communication.smsqueue': {
+            'Meta': {'object_name': 'SmsQueue'},
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'message': ('django.db.models.fields.TextField', [], {}),
+            'msisdn': ('django.db.models.fields.CharField', [], {'max_length': '50', 'null': 'True', 'db_index': 'True'}),
+            'send_date': ('django.db.models.fields.DateTimeField', [], {}),
+            'sent': ('django.db.models.fields.BooleanField', [], {'default': 'False', 'db_index': 'True'}),
+            'sent_date': ('django.db.models.fields.DateTimeField', [], {'default': 'None', 'null': 'True', 'blank': 'True'})
+        },
+        u'content.testingquestion': {
+            'Meta': {'ordering': "['name']", 'object_name': 'TestingQuestion'},
+            'answer_content': ('django.db.models.fields.TextField', [], {'blank': 'True'}),
+            'description': ('django.db.models.fields.CharField', [], {'max_length': '500', 'blank': 'True'}),
+            'difficulty': ('django.db.models.fields.PositiveIntegerField', [], {'default': '1'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'module': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['organisation.Module']", 'null': 'True'}),
+            'name': ('django.db.models.fields.CharField', [], {'default': "'Auto Generated'", 'max_length': '500', 'unique': 'True', 'null': 'True'}),
+            'notes': ('django.db.models.fields.TextField', [], {'blank': 'True'}),
+            'order': ('django.db.models.fields.PositiveIntegerField', [], {'default': '0'}),
+            'points': ('django.db.models.fields.PositiveIntegerField', [], {'default': '1'}),
+            'question_content': ('django.db.models.fields.TextField', [], {'blank': 'True'}),
+            'state': ('django.db.models.fields.PositiveIntegerField', [], {'default': '1'}),
+            'textbook_link': ('django.db.models.fields.CharField', [], {'max_length': '500', 'null': 'True', 'blank': 'True'})
+        },
+        u'contenttypes.contenttype': {
+            'Meta': {'ordering': "('name',)", 'unique_together': "(('app_label', 'model'),)", 'object_name': 'ContentType', 'db_table': "'django_content_type'"},
+            'app_label': ('django.db.models.fields.CharField', [], {'max_length': '100'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'model': ('django.db.models.fields.CharField', [], {'max_length': '100'}),
+            'name': ('django.db.models.fields.CharField', [], {'max_length': '100'})
+        },
+        u'core.class': {
+            'Meta': {'object_name': 'Class'},
+            'course': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['organisation.Course']", 'null': 'True'}),
+            'description': ('django.db.models.fields.CharField', [], {'max_length': '500', 'blank': 'True'}),
+            'enddate': ('django.db.models.fields.DateTimeField', [], {'null': 'True', 'blank': 'True'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'is_active': ('django.db.models.fields.BooleanField', [], {'default': 'True'}),
+            'name': ('django.db.models.fields.CharField', [], {'max_length': '500', 'unique': 'True', 'null': 'True'}),
+            'province': ('django.db.models.fields.CharField', [], {'max_length': '20', 'null': 'True', 'blank': 'True'}),
+            'startdate': ('django.db.models.fields.DateTimeField', [], {'null': 'True', 'blank': 'True'}),
+            'type': ('django.db.models.fields.PositiveIntegerField', [], {'default': '1'})
+        },
+        u'organisation.course': {
+            'Meta': {'object_name': 'Course'},
+            'description': ('django.db.models.fields.CharField', [], {'max_length': '500', 'blank': 'True'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'is_active': ('django.db.models.fields.BooleanField', [], {'default': 'True'}),
+            'name': ('django.db.models.fields.CharField', [], {'max_length': '500', 'unique': 'True', 'null': 'True'}),
+            'question_order': ('django.db.models.fields.PositiveIntegerField', [], {'default': '1'}),
+            'slug': ('django.db.models.fields.SlugField', [], {'max_length': '50', 'blank': 'True'})
+        },
+        u'organisation.coursemodulerel': {
+            'Meta': {'object_name': 'CourseModuleRel'},
+            'course': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['organisation.Course']"}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'module': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['organisation.Module']"})
+        },
+        u'organisation.module': {
+            'Meta': {'object_name': 'Module'},
+            'courses': ('django.db.models.fields.related.ManyToManyField', [], {'related_name': "'modules'", 'symmetrical': 'False', 'through': u"orm['organisation.CourseModuleRel']", 'to': u"orm['organisation.Course']"}),
+            'description': ('django.db.models.fields.CharField', [], {'max_length': '500', 'blank': 'True'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'is_active': ('django.db.models.fields.BooleanField', [], {'default': 'True'}),
+            'module_link': ('django.db.models.fields.CharField', [], {'max_length': '500', 'null': 'True', 'blank': 'True'}),
+            'name': ('django.db.models.fields.CharField', [], {'max_length': '500', 'unique': 'True', 'null': 'True'}),
+            'order': ('django.db.models.fields.IntegerField', [], {'null': 'True', 'blank': 'True'}),
+            'type': ('django.db.models.fields.PositiveIntegerField', [], {'default': '1'})
+        }
+    }
+
+    complete_apps = ['communication']
\ No newline at end of file
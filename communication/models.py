@@ -1,9 +1,13 @@
-from django.db import models
+from django.db import models, transaction
 from django.db.models import Q
 from django.conf import settings
+from django.core.cache import cache
 from django.utils.encoding import python_2_unicode_compatible
 from django.utils.html import format_html, mark_safe
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from datetime import datetime
+from . import counters
 from .abstracts import CommentLikeAbstractModel
 from content.models import TestingQuestion
 from organisation.models import Course, Module
@@ -281,63 +285,50 @@ class Message(models.Model):
 
     @staticmethod
     def unread_message_count(user, course):
-        from core.models import Class
-
-        _msgs_for_course = Q(
-            course=course,
-            direction=1,
-            to_class__isnull=True,
-            publishdate__lte=datetime.now()
-        )
-
-        _classes = Class.objects.filter(course=course).values('id')
-
-        _msgs_for_class = Q(
-            course=course,
-            direction=1,
-            to_class__in=_classes,
-            to_user__isnull=True,
-            publishdate__lte=datetime.now()
-        )
+        return counters.unread_count(user.id, course.id)
 
-        _msgs_for_user = Q(
-            course=course,
-            direction=1,
-            to_class__in=_classes,
-            to_user=user,
-            publishdate__lte=datetime.now()
-        )
-
-        _msgs = Message.objects.filter(_msgs_for_course | _msgs_for_class | _msgs_for_user)
-        
-        _counter = 0
-        for m in _msgs:
-            if not MessageStatus.objects.filter(
-                    message=m, user=user, view_status=True).exists():
-                _counter += 1
-        return _counter
-
-    def view_message(self, user):
+    def _get_status(self, user):
         _status = MessageStatus.objects.filter(message=self, user=user).first()
         if _status is None:
             _status = MessageStatus(message=self, user=user)
+        return _status
+
+    def view_message(self, user):
+        _status = self._get_status(user)
+        _seen = _status.view_status or _status.hidden_status
         _status.view_status = True
         _status.view_date = datetime.now()
         _status.save()
+        if not _seen:
+            counters.message_seen(self, user.id)
 
     def hide_message(self, user):
-        _status = MessageStatus.objects.filter(message=self, user=user).first()
-        if _status is None:
-            _status = MessageStatus(message=self, user=user)
+        _status = self._get_status(user)
+        _seen = _status.view_status or _status.hidden_status
         _status.hidden_status = True
         _status.hidden_date = datetime.now()
         _status.save()
+        if not _seen:
+            counters.message_seen(self, user.id)
 
     class Meta:
         verbose_name = "Message"
         verbose_name_plural = "Messages"
 
 
+@receiver(post_save, sender=Message)
+def update_unread_counters(sender, instance, created, **kwargs):
+    if created:
+        counters.message_created(instance)
+    elif instance.direction == 1:
+        counters.message_changed(instance)
+
+
+@receiver(post_delete, sender=Message)
+def invalidate_unread_counters(sender, instance, **kwargs):
+    counters.message_changed(instance)
+
+
 @python_2_unicode_compatible
 class MessageStatus(models.Model):
 
@@ -530,6 +521,12 @@ class SmsQueue(models.Model):
 
 class Moderation(models.Model):
 
+    """
+    Moderation queue entry for a blog comment, discussion or chat message.
+    Entries are kept in sync with their source through signals, use
+    Moderation.sync after bulk updates that bypass save().
+    """
+
     MT_BLOG_COMMENT = 1
     MT_DISCUSSION = 2
     MT_CHAT = 3
@@ -540,16 +537,17 @@ class Moderation(models.Model):
         (MT_CHAT, 'Chat')
     )
 
-    # pk for the view
+    # "<type>_<mod_id>"
     mod_pk = models.CharField(max_length=50, primary_key=True)
     # pk for the underlying model
-    mod_id = models.PositiveIntegerField()
+    mod_id = models.PositiveIntegerField(db_index=True)
     type = models.PositiveIntegerField(
         null=True,
         blank=True,
-        choices=moderation_types
+        choices=moderation_types,
+        db_index=True
     )
-    description = models.CharField(max_length=100, null=True, blank=True)
+    description = models.CharField(max_length=100, null=True, blank=True, db_index=True)
     content = models.TextField(null=True, blank=True)
     author = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -558,10 +556,10 @@ class Moderation(models.Model):
         related_name="moderation_author",
         on_delete=models.SET_NULL
     )
-    moderated = models.BooleanField(default=False, blank=True)
-    publishdate = models.DateTimeField(null=True, blank=True)
+    moderated = models.BooleanField(default=False, blank=True, db_index=True)
+    publishdate = models.DateTimeField(null=True, blank=True, db_index=True)
     response = models.TextField(null=True, blank=True)
-    unmoderated_date = models.DateTimeField(null=True, blank=True)
+    unmoderated_date = models.DateTimeField(null=True, blank=True, db_index=True)
     unmoderated_by = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         null=True,
@@ -571,15 +569,138 @@ class Moderation(models.Model):
     )
     original_content = models.TextField(blank=True, null=True)
 
+    compared_fields = ('mod_id', 'type', 'description', 'content', 'author_id', 'moderated', 'publishdate',
+                       'response', 'unmoderated_date', 'unmoderated_by_id', 'original_content')
+
+    sync_chunk_size = 500
+
     def save(self, *args, **kwargs):
         return
 
     def delete(self, *args, **kwargs):
         return
 
-    class Meta():
-        managed = False
-        db_table = 'view_communication_moderation'
+    @staticmethod
+    def get_source(mod_type):
+        """
+        Returns the source queryset, description field and description prefix for a moderation type.
+        """
+        if mod_type == Moderation.MT_BLOG_COMMENT:
+            return PostComment.objects.all(), 'post__description', 'Blog: '
+        elif mod_type == Moderation.MT_DISCUSSION:
+            return Discussion.objects.all(), 'description', 'Discussion: '
+        elif mod_type == Moderation.MT_CHAT:
+            return ChatMessage.objects.filter(chatgroup__isnull=False), 'chatgroup__name', 'Chat Room: '
+        raise ValueError('Unknown moderation type: %s' % mod_type)
+
+    @staticmethod
+    def build_entries(mod_type, ids=None):
+        """
+        Builds (unsaved) entries for the source objects of the given type.
+        """
+        queryset, description_field, prefix = Moderation.get_source(mod_type)
+        if ids is not None:
+            queryset = queryset.filter(id__in=ids)
+
+        rows = queryset.order_by('id').values(
+            'id', description_field, 'content', 'author', 'moderated', 'publishdate', 'response__content',
+            'unmoderated_date', 'unmoderated_by', 'original_content')
+
+        entries = []
+        for row in rows:
+            description = row[description_field]
+            entries.append(Moderation(
+                mod_pk='%d_%d' % (mod_type, row['id']),
+                mod_id=row['id'],
+                type=mod_type,
+                description=prefix + description if description is not None else None,
+                content=row['content'],
+                author_id=row['author'],
+                moderated=bool(row['moderated']),
+                publishdate=row['publishdate'],
+                response=row['response__content'],
+                unmoderated_date=row['unmoderated_date'],
+                unmoderated_by_id=row['unmoderated_by'],
+                original_content=row['original_content']))
+        return entries
+
+    @staticmethod
+    def sync(mod_type, ids):
+        """
+        Rebuilds the entries for the given source ids, removing those whose source no longer exists.
+        """
+        ids = list(ids)
+        for start in range(0, len(ids), Moderation.sync_chunk_size):
+            chunk = ids[start:start + Moderation.sync_chunk_size]
+            with transaction.atomic():
+                Moderation.objects.filter(type=mod_type, mod_id__in=chunk).delete()
+                Moderation.objects.bulk_create(Moderation.build_entries(mod_type, chunk))
+
+    @staticmethod
+    def sync_all(mod_type):
+        queryset = Moderation.get_source(mod_type)[0]
+        source_ids = set(queryset.values_list('id', flat=True))
+        stale_ids = set(Moderation.objects.filter(type=mod_type).values_list('mod_id', flat=True)) - source_ids
+        Moderation.sync(mod_type, sorted(source_ids | stale_ids))
+
+    @staticmethod
+    def find_inconsistent(mod_type):
+        """
+        Returns the source ids whose entries are missing, stale or orphaned.
+        """
+        queryset = Moderation.get_source(mod_type)[0]
+        source_ids = list(queryset.order_by('id').values_list('id', flat=True))
+        entry_ids = set(Moderation.objects.filter(type=mod_type).values_list('mod_id', flat=True))
+
+        inconsistent = sorted(entry_ids - set(source_ids))
+        for start in range(0, len(source_ids), Moderation.sync_chunk_size):
+            chunk = source_ids[start:start + Moderation.sync_chunk_size]
+            stored = dict((entry.mod_id, entry) for entry in Moderation.objects.filter(type=mod_type,
+                                                                                       mod_id__in=chunk))
+            for expected in Moderation.build_entries(mod_type, chunk):
+                entry = stored.get(expected.mod_id)
+                if entry is None or any(getattr(entry, f) != getattr(expected, f) for f in Moderation.compared_fields):
+                    inconsistent.append(expected.mod_id)
+        return inconsistent
+
+
+def _sync_moderation(mod_type, instance):
+    queryset = Moderation.get_source(mod_type)[0]
+    # entries show the content of their response so those referring to this one need updating too
+    ids = [instance.id] + list(queryset.filter(response=instance.id).values_list('id', flat=True))
+    Moderation.sync(mod_type, ids)
+
+
+@receiver(post_save, sender=PostComment)
+@receiver(post_delete, sender=PostComment)
+def sync_postcomment_moderation(sender, instance, **kwargs):
+    _sync_moderation(Moderation.MT_BLOG_COMMENT, instance)
+
+
+@receiver(post_save, sender=Discussion)
+@receiver(post_delete, sender=Discussion)
+def sync_discussion_moderation(sender, instance, **kwargs):
+    _sync_moderation(Moderation.MT_DISCUSSION, instance)
+
+
+@receiver(post_save, sender=ChatMessage)
+@receiver(post_delete, sender=ChatMessage)
+def sync_chatmessage_moderation(sender, instance, **kwargs):
+    _sync_moderation(Moderation.MT_CHAT, instance)
+
+
+@receiver(post_save, sender=Post)
+def sync_post_moderation(sender, instance, created, **kwargs):
+    if not created:
+        Moderation.sync(Moderation.MT_BLOG_COMMENT,
+                        PostComment.objects.filter(post=instance).values_list('id', flat=True))
+
+
+@receiver(post_save, sender=ChatGroup)
+def sync_chatgroup_moderation(sender, instance, created, **kwargs):
+    if not created:
+        Moderation.sync(Moderation.MT_CHAT,
+                        ChatMessage.objects.filter(chatgroup=instance).values_list('id', flat=True))
 
 
 class Profanity(models.Model):
@@ -618,6 +739,10 @@ class Ban(models.Model):
     )
     source_pk = models.PositiveIntegerField(null=False, blank=False)
 
+    @staticmethod
+    def cache_key(user_id):
+        return 'communication:ban:%s' % user_id
+
     def get_duration(self):
         diff = self.till_when - self.when
 
@@ -625,3 +750,9 @@ class Ban(models.Model):
             return diff.days + 1
         else:
             return diff.days
+
+
+@receiver(post_save, sender=Ban)
+@receiver(post_delete, sender=Ban)
+def invalidate_ban_cache(sender, instance, **kwargs):
+    cache.delete(Ban.cache_key(instance.banned_user_id))
@@ -5,8 +5,9 @@ from go_http import HttpApiSender
 from django.conf import settings
 from datetime import datetime
 from django.core.mail import mail_managers
-from .models import SmsQueue
-from communication.utils import JunebugApi, SmsSender
+from .models import Message, SmsQueue
+from communication import counters
+from communication.utils import JunebugApi, SmsSender, send_bulk_messages
 
 
 @app.task
@@ -47,6 +48,26 @@ def bulk_send_all(queryset, message):
     return successful, fail
 
 
+@app.task
+def bulk_send_messages(learner_ids, name, publish_date, content, author_id):
+    successful = send_bulk_messages(learner_ids, name, publish_date, content, author_id)
+    subject = 'Bulk Message Send'
+    message = "\n".join([
+        "Message: " + name,
+        "Time: " + str(datetime.now()),
+        "Selected learners: " + str(len(learner_ids)),
+        "Messages created: " + str(successful)
+    ])
+
+    mail_managers(
+        subject=subject,
+        message=message,
+        fail_silently=False
+    )
+
+    return successful
+
+
 @app.task
 def process_sms_queue():
     dt = datetime.now()
@@ -61,3 +82,12 @@ def process_sms_queue():
             sms.sent = True
             sms.sent_date = dt
             sms.save()
+
+
+@app.task
+def reconcile_unread_message_counts():
+    course_ids = Message.objects.filter(direction=1, course__isnull=False)\
+        .values_list('course', flat=True).distinct()
+
+    for course_id in course_ids:
+        counters.reconcile_course(course_id)
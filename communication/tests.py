@@ -1,15 +1,24 @@
 # coding: utf-8
 
 from django.contrib.auth import get_user_model
+from django.contrib.admin.sites import site
 from django.test import TestCase
 from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
 from datetime import datetime, timedelta
+from StringIO import StringIO
+import time
 from django.utils import timezone
+from mock import patch
 from auth.models import Learner
-from communication.models import Ban, ChatMessage, CoursePostRel, Message, MessageStatus, Profanity, Post, PostComment,\
-    PostCommentLike, Report, ReportResponse, SmsQueue
+from communication.admin import ModerationAdmin, load_bans
+from communication.models import Ban, ChatGroup, ChatMessage, CoursePostRel, Discussion, Message, MessageStatus, \
+    Moderation, Profanity, Post, PostComment, PostCommentLike, Report, ReportResponse, SmsQueue
+from communication.tasks import reconcile_unread_message_counts
 from communication.utils import contains_profanity, report_user_post, get_user_bans, get_replacement_content, \
-    JunebugApi
+    JunebugApi, banned_user_ids, send_bulk_messages
 from content.models import TestingQuestion
 from core.models import Class, Participant
 from organisation.models import Course, CourseModuleRel, Module, Organisation, School
@@ -79,6 +88,7 @@ class TestMessage(TestCase):
         return Message.objects.create(author=author, course=course, **kwargs)
 
     def setUp(self):
+        cache.clear()
         self.course = self.create_course()
         self.classs = self.create_class(self.course)
         self.user = self.create_user()
@@ -138,6 +148,54 @@ class TestMessage(TestCase):
         self.assertEqual(
             2, Message.unread_message_count(self.user, self.course))
 
+    def test_unread_msg_count_cached(self):
+        other_user = self.create_user(mobile="+27987654321", username="+27987654321")
+        msg = self.create_message(self.user, self.course, name="msg1", publishdate=datetime.now())
+        self.assertEqual(1, Message.unread_message_count(self.user, self.course))
+
+        # counters are updated in place from here on
+        self.create_message(self.user, self.course, name="msg2", publishdate=datetime.now(),
+                            to_class=self.classs)
+        self.create_message(self.user, self.course, name="msg3", publishdate=datetime.now(),
+                            to_class=self.classs, to_user=self.user)
+        self.create_message(self.user, self.course, name="msg4",
+                            publishdate=datetime.now() + timedelta(days=1))
+        self.assertEqual(3, Message.unread_message_count(self.user, self.course))
+        self.assertEqual(2, Message.unread_message_count(other_user, self.course))
+
+        msg.view_message(self.user)
+        self.assertEqual(2, Message.unread_message_count(self.user, self.course))
+        msg.hide_message(self.user)
+        self.assertEqual(2, Message.unread_message_count(self.user, self.course))
+        self.assertEqual(2, Message.unread_message_count(other_user, self.course))
+
+        msg.delete()
+        self.assertEqual(2, Message.unread_message_count(self.user, self.course))
+        self.assertEqual(1, Message.unread_message_count(other_user, self.course))
+
+    def test_unread_msg_count_scheduled_for_user(self):
+        publishdate = datetime.now() + timedelta(hours=1)
+        self.create_message(self.user, self.course, name="msg1", publishdate=publishdate,
+                            to_class=self.classs, to_user=self.user)
+        self.assertEqual(0, Message.unread_message_count(self.user, self.course))
+
+        # an hour later the cached counters have expired and the message is published
+        with patch('communication.counters.datetime') as mock_datetime, \
+                patch('time.time', return_value=time.time() + 60 * 61):
+            mock_datetime.now.return_value = publishdate + timedelta(minutes=1)
+            self.assertEqual(1, Message.unread_message_count(self.user, self.course))
+
+    def test_unread_msg_count_reconcile(self):
+        msg = self.create_message(self.user, self.course, name="msg1", publishdate=datetime.now())
+        self.assertEqual(1, Message.unread_message_count(self.user, self.course))
+
+        # status changes that bypass Message.view_message aren't seen by the cache
+        MessageStatus.objects.create(message=msg, user=self.user, view_status=True)
+        self.assertEqual(1, Message.unread_message_count(self.user, self.course))
+
+        reconcile_unread_message_counts()
+        self.assertEqual(0, Message.unread_message_count(self.user, self.course))
+
     def test_view_message(self):
         msg = self.create_message(
             self.user,
@@ -180,6 +238,35 @@ class TestMessage(TestCase):
         self.assertTrue(hide_status.hidden_status)
 
 
+class TestBulkMessage(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.organisation = create_organisation()
+        self.school = create_school('school name', self.organisation)
+        self.course = create_course()
+        self.classs = create_class('class name', self.course)
+        self.old_classs = create_class('old class name', self.course)
+        self.learners = [create_learner(self.school, mobile="+2712345{0:04d}".format(i)) for i in xrange(4)]
+        for learner in self.learners[:3]:
+            create_participant(learner, self.old_classs, datejoined=datetime.now(), is_active=False)
+            create_participant(learner, self.classs, datejoined=datetime.now())
+        self.author = self.learners[0]
+
+    def test_send_bulk_messages(self):
+        learner_ids = [learner.id for learner in self.learners]
+        sent = send_bulk_messages(learner_ids, "name", datetime.now(), "content", self.author.id, batch_size=2)
+
+        # the learner without an active participant doesn't get a message
+        self.assertEqual(sent, 3)
+        self.assertEqual(Message.objects.count(), 3)
+        self.assertFalse(Message.objects.filter(to_user=self.learners[3]).exists())
+        for learner in self.learners[:3]:
+            msg = Message.objects.get(to_user=learner)
+            self.assertEqual(msg.to_class, self.classs)
+            self.assertEqual(msg.course, self.course)
+            self.assertEqual(1, Message.unread_message_count(learner, self.course))
+
+
 class TestChatMessage(TestCase):
     def create_chat_message(self, content="", **kwargs):
         return ChatMessage.objects.create(content=content, **kwargs)
@@ -189,6 +276,89 @@ class TestChatMessage(TestCase):
         self.assertEqual(msg.content, 'Ò', "They are not equal")
 
 
+class TestModeration(TestCase):
+    def setUp(self):
+        self.organisation = create_organisation()
+        self.school = create_school('school name', self.organisation)
+        self.course = create_course()
+        self.learner = create_learner(self.school, mobile="+27123456789")
+        self.post = Post.objects.create(name="Blog Post", description="Post", publishdate=datetime.now())
+        self.chatgroup = ChatGroup.objects.create(name="Chat Group", course=self.course)
+
+    def test_queue_follows_sources(self):
+        comment = PostComment.objects.create(author=self.learner, post=self.post, content="comment",
+                                             publishdate=datetime.now())
+        discussion = Discussion.objects.create(author=self.learner, course=self.course, description="Question",
+                                               content="discussion", publishdate=datetime.now())
+        chat = ChatMessage.objects.create(author=self.learner, chatgroup=self.chatgroup, content="chat",
+                                          publishdate=datetime.now())
+
+        entry = Moderation.objects.get(mod_pk='1_%d' % comment.id)
+        self.assertEqual(entry.description, 'Blog: Post')
+        self.assertFalse(entry.moderated)
+        self.assertEqual(Moderation.objects.get(mod_pk='2_%d' % discussion.id).description, 'Discussion: Question')
+        self.assertEqual(Moderation.objects.get(mod_pk='3_%d' % chat.id).description, 'Chat Room: Chat Group')
+
+        # responses are shown on the entry they respond to
+        reply = Discussion.objects.create(author=self.learner, course=self.course, content="reply",
+                                          publishdate=datetime.now())
+        discussion.response = reply
+        discussion.moderated = True
+        discussion.save()
+        entry = Moderation.objects.get(mod_pk='2_%d' % discussion.id)
+        self.assertTrue(entry.moderated)
+        self.assertEqual(entry.response, 'reply')
+        reply.content = "edited reply"
+        reply.save()
+        self.assertEqual(Moderation.objects.get(mod_pk='2_%d' % discussion.id).response, 'edited reply')
+
+        self.chatgroup.name = "Renamed Group"
+        self.chatgroup.save()
+        self.assertEqual(Moderation.objects.get(mod_pk='3_%d' % chat.id).description, 'Chat Room: Renamed Group')
+
+        comment.delete()
+        self.assertFalse(Moderation.objects.filter(mod_pk='1_%d' % comment.id).exists())
+
+        for mod_type in (Moderation.MT_BLOG_COMMENT, Moderation.MT_DISCUSSION, Moderation.MT_CHAT):
+            self.assertEqual(Moderation.find_inconsistent(mod_type), [])
+
+    def test_sync_after_bulk_update(self):
+        chat = ChatMessage.objects.create(author=self.learner, chatgroup=self.chatgroup, content="chat",
+                                          publishdate=datetime.now())
+        ChatMessage.objects.filter(id=chat.id).update(moderated=True)
+        self.assertEqual(Moderation.find_inconsistent(Moderation.MT_CHAT), [chat.id])
+
+        Moderation.sync_all(Moderation.MT_CHAT)
+        self.assertTrue(Moderation.objects.get(mod_pk='3_%d' % chat.id).moderated)
+        self.assertEqual(Moderation.find_inconsistent(Moderation.MT_CHAT), [])
+
+    def test_ban_column_batched(self):
+        other = create_learner(self.school, mobile="+27987654321", username="+27987654321")
+        today = datetime.now()
+        Ban.objects.create(banned_user=self.learner, banning_user=other, when=today,
+                           till_when=datetime(today.year, today.month, today.day, 23, 59, 59) + timedelta(days=2),
+                           source_type=1, source_pk=1)
+        for author in (self.learner, other):
+            ChatMessage.objects.create(author=author, chatgroup=self.chatgroup, content="chat",
+                                       publishdate=datetime.now())
+
+        entries = list(Moderation.objects.filter(type=Moderation.MT_CHAT).order_by('author'))
+        cache.clear()
+        with self.assertNumQueries(2):
+            load_bans(entries)
+            model_admin = ModerationAdmin(Moderation, site)
+            self.assertEqual([model_admin.get_ban(entry) for entry in entries], ['3 days', ''])
+
+    def test_moderation_queue_command(self):
+        self.assertRaises(CommandError, call_command, 'moderation_queue')
+        self.assertRaises(CommandError, call_command, 'moderation_queue', 'unknown')
+        chat = ChatMessage.objects.create(author=self.learner, chatgroup=self.chatgroup, content="chat",
+                                          publishdate=datetime.now())
+        ChatMessage.objects.filter(id=chat.id).update(moderated=True)
+        call_command('moderation_queue', 'check', fix=True, stdout=StringIO())
+        self.assertEqual(Moderation.find_inconsistent(Moderation.MT_CHAT), [])
+
+
 class TestSmsQueue(TestCase):
     def create_smsqueue(self, **kwargs):
         return SmsQueue.objects.create(**kwargs)
@@ -281,6 +451,7 @@ class TestBan(TestCase):
         )
 
     def setUp(self):
+        cache.clear()
         self.user = self.create_user()
         self.user2 = self.create_user(mobile='123123', username='123123')
 
@@ -324,6 +495,25 @@ class TestBan(TestCase):
         cnt = Ban.objects.filter(banned_user=self.user).count()
         self.assertEquals(cnt, 2)
 
+    def test_banned_user_ids(self):
+        today = datetime.now()
+        end_of_today = datetime(today.year, today.month, today.day, 23, 59, 59, 999999)
+        self.assertEqual(banned_user_ids([self.user.id, self.user2.id]), set())
+
+        ban = self.create_ban(end_of_today)
+        self.assertEqual(banned_user_ids([self.user.id, self.user2.id]), set([self.user.id]))
+        self.assertTrue(self.user.is_banned())
+        self.assertFalse(self.user2.is_banned())
+
+        # expired bans are cached but don't count
+        ban.delete()
+        self.create_ban(end_of_today - timedelta(days=2))
+        self.assertEqual(banned_user_ids([self.user.id, self.user2.id]), set())
+
+        chat = self.create_chat_message(author=self.user2)
+        report_user_post(obj=chat, banning_user=self.user, num_days=1)
+        self.assertEqual(banned_user_ids([self.user.id, self.user2.id]), set([self.user2.id]))
+
     def test_replacement_content_admin(self):
         exp_admin = 'This comment has been reported by a moderator and the user has ' \
                     'been banned from commenting for 5 days.'
@@ -4,7 +4,12 @@ from go_http import LoggingSender
 from django.contrib.auth.hashers import make_password
 from random import randint
 from datetime import datetime, timedelta
-from .models import Sms, Ban, Profanity, ChatMessage, PostComment, Discussion
+from .models import Sms, Ban, Profanity, ChatMessage, PostComment, Discussion, Message
+from . import counters
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
 from requests import RequestException
 import koremutake
 import logging
@@ -171,6 +176,46 @@ class JunebugApi:
         return successful, fail
 
 
+def send_bulk_messages(learner_ids, name, publish_date, content, author_id, batch_size=None):
+    """
+    Creates a message for each learner addressed to the class of their active participant.
+    Learners without an active participant are skipped.
+
+    Returns:
+        int     The number of messages created.
+    """
+    from core.models import Participant
+
+    if batch_size is None:
+        batch_size = getattr(settings, 'MESSAGE_BULK_CREATE_BATCH_SIZE', 500)
+
+    participants = Participant.objects.filter(
+        learner__in=learner_ids,
+        is_active=True,
+        classs__isnull=False
+    ).order_by('learner', 'id').values_list('learner', 'classs', 'classs__course')
+
+    # one message per learner, addressed to their first active class
+    targets = {}
+    for learner_id, class_id, course_id in participants:
+        if learner_id not in targets:
+            targets[learner_id] = (class_id, course_id)
+
+    messages = [Message(name=name, publishdate=publish_date, content=content, author_id=author_id,
+                        to_user_id=learner_id, to_class_id=class_id, course_id=course_id)
+                for learner_id, (class_id, course_id) in targets.items()]
+
+    for start in range(0, len(messages), batch_size):
+        with transaction.atomic():
+            Message.objects.bulk_create(messages[start:start + batch_size])
+
+    # bulk_create doesn't send post_save so the counters are reset instead
+    for course_id in set(course_id for class_id, course_id in targets.values()):
+        counters.bump_generation(course_id)
+
+    return len(messages)
+
+
 def get_user_bans(user):
     today = datetime.now()
     today_start = datetime(today.year, today.month, today.day)
@@ -178,6 +223,78 @@ def get_user_bans(user):
     return Ban.objects.filter(banned_user=user, till_when__gte=today_start)
 
 
+def get_active_bans(user_ids):
+    """
+    Returns the first current ban of each of the users, keyed by user id.
+    """
+    if not user_ids:
+        return {}
+
+    today = datetime.now()
+    today_start = datetime(today.year, today.month, today.day)
+
+    bans = {}
+    for ban in Ban.objects.filter(banned_user__in=user_ids, till_when__gte=today_start).order_by('id'):
+        bans.setdefault(ban.banned_user_id, ban)
+    return bans
+
+
+BAN_CACHE_TIMEOUT = getattr(settings, 'BAN_CACHE_TIMEOUT', 60 * 60 * 24)
+
+# cached for users that have never been banned
+NOT_BANNED = 0
+
+
+def get_ban_till_when(user_ids):
+    """
+    Returns the latest ban end date for each of the users, or None if they have never been banned.
+    Cache misses are filled with a single query.
+    """
+    keys = dict((Ban.cache_key(user_id), user_id) for user_id in user_ids)
+    cached = cache.get_many(keys.keys())
+    result = dict((keys[key], value) for key, value in cached.items())
+
+    missing = [user_id for user_id in user_ids if user_id not in result]
+    if missing:
+        latest = dict(Ban.objects.filter(banned_user__in=missing)
+                      .values_list('banned_user')
+                      .annotate(Max('till_when')))
+        to_cache = {}
+        for user_id in missing:
+            result[user_id] = latest.get(user_id, NOT_BANNED)
+            to_cache[Ban.cache_key(user_id)] = result[user_id]
+        cache.set_many(to_cache, BAN_CACHE_TIMEOUT)
+
+    return dict((user_id, till_when or None) for user_id, till_when in result.items())
+
+
+def _is_active_ban(till_when):
+    if till_when is None:
+        return False
+
+    today = datetime.now()
+    today_start = datetime(today.year, today.month, today.day)
+    if timezone.is_aware(till_when):
+        today_start = timezone.make_aware(today_start, timezone.get_default_timezone())
+
+    return till_when >= today_start
+
+
+def banned_user_ids(user_ids):
+    """
+    Returns the set of ids of the given users that are currently banned.
+    """
+    user_ids = set(user_id for user_id in user_ids if user_id is not None)
+    if not user_ids:
+        return set()
+
+    return set(user_id for user_id, till_when in get_ban_till_when(user_ids).items() if _is_active_ban(till_when))
+
+
+def is_user_banned(user_id):
+    return user_id in banned_user_ids([user_id])
+
+
 def moderate(comm):
     comm.moderated = True
     comm.unmoderated_date = None
@@ -1,17 +1,18 @@
 from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
 from django_summernote.admin import SummernoteModelAdmin, SummernoteInlineModelAdmin
 from .models import TestingQuestion, TestingQuestionOption, LearningChapter, Mathml, GoldenEgg, EventSplashPage, \
     EventStartPage, EventEndPage, EventQuestionAnswer, Event, EventQuestionRel, SUMit, SUMitEndPage, SUMitLevel, \
-    Definition, GoldenEggRewardLog, EventParticipantRel, TestingQuestionDifficulty
+    Definition, GoldenEggRewardLog, EventParticipantRel, TestingQuestionDifficulty, invalidate_module_question_pools
 from import_export import resources
 from import_export.admin import ImportExportModelAdmin
 from import_export import fields
 from core.models import ParticipantQuestionAnswer, Participant, ParticipantRedoQuestionAnswer
+from .statistics import get_statistics_for_event, load_event_statistics
 from .forms import TestingQuestionCreateForm, TestingQuestionFormSet, TestingQuestionOptionCreateForm, \
     GoldenEggCreateForm, EventSplashPageInlineFormSet, EventStartPageInlineFormSet, EventEndPageInlineFormSet, \
     EventQuestionRelInline, EventForm, SUMitEndPageInlineFormSet, SUMitLevelForm, SUMitForm
 from organisation.models import Course, Module
-from django.db.models import Count
 from datetime import datetime
 
 
@@ -190,17 +191,23 @@ class TestingQuestionAdmin(SummernoteModelAdmin, ImportExportModelAdmin):
     preview_link.short_description = "Preview"
 
     def make_incomplete(modeladmin, request, queryset):
+        module_ids = list(queryset.values_list('module', flat=True).distinct())
         queryset.update(state='1')
+        invalidate_module_question_pools(module_ids)
 
     make_incomplete.short_description = "Change state to Incomplete"
 
     def make_ready(modeladmin, request, queryset):
+        module_ids = list(queryset.values_list('module', flat=True).distinct())
         queryset.update(state='2')
+        invalidate_module_question_pools(module_ids)
 
     make_ready.short_description = "Change state to Ready for Review"
 
     def make_published(modeladmin, request, queryset):
+        module_ids = list(queryset.values_list('module', flat=True).distinct())
         queryset.update(state='3')
+        invalidate_module_question_pools(module_ids)
 
     make_published.short_description = "Change state to Published"
 
@@ -320,6 +327,20 @@ class EventQuestionRelInline(admin.TabularInline):
     formset = EventQuestionRelInline
 
 
+def percentage(part, total):
+    if total > 0:
+        return round((float(part) / total) * 100)
+    else:
+        return 0
+
+
+class EventStatisticsChangeList(ChangeList):
+    def get_results(self, request):
+        super(EventStatisticsChangeList, self).get_results(request)
+        # the statistics shown for the page are looked up together rather than per row
+        load_event_statistics(list(self.result_list))
+
+
 class EventAdmin(admin.ModelAdmin):
     list_display = ("name", "course", "activation_date", "deactivation_date", "get_total_users",
                     "get_total_questions_answered", "get_percent_complete_all",
@@ -335,44 +356,34 @@ class EventAdmin(admin.ModelAdmin):
     def queryset(self, request):
         return Event.objects.all().exclude(type=0)
 
+    def get_changelist(self, request, **kwargs):
+        return EventStatisticsChangeList
+
     def get_total_users(self, obj):
-        return Participant.objects.filter(classs__course=obj.course).aggregate(Count('id'))['id__count']
+        return get_statistics_for_event(obj)[1]
 
     get_total_users.short_description = "Total Users"
 
     def get_total_questions_answered(self, obj):
-        return EventQuestionAnswer.objects.filter(event=obj).aggregate(Count('id'))['id__count']
+        return get_statistics_for_event(obj)[0]['answered']
 
     get_total_questions_answered.short_description = "Total Questions Answered"
 
     def get_percent_complete_all(self, obj):
-        # total_participants = Participant.objects.filter(classs__course=obj.course, is_active=True)\
-        #     .aggregate(Count('id'))['id__count']
-        # total_event_questions = EventQuestionRel.objects.filter(event=obj) \
-        #     .aggregate(Count('question'))['question__count']
-        # completed = EventQuestionAnswer.objects.values('participant')\
-        #     .annotate(answered=Count('question_option'))\
-        #     .filter(event=obj, answered=total_event_questions).aggregate(Count('answered'))
-        #
-        # return (completed / total_participants) * 100
-        return 0
+        stats, total_users = get_statistics_for_event(obj)
+        return percentage(stats['completed'], total_users)
 
     get_percent_complete_all.short_description = "% Complete All Questions"
 
     def get_percent_correct(self, obj):
-        answered = self.get_total_questions_answered(obj)
-        correct = EventQuestionAnswer.objects.filter(event=obj, correct=True) \
-            .aggregate(Count('correct'))['correct__count']
-        if answered > 0:
-            return (correct / answered) * 100
-        else:
-            return 0
+        stats = get_statistics_for_event(obj)[0]
+        return percentage(stats['correct'], stats['answered'])
 
     get_percent_correct.short_description = "% Correct"
 
     def get_participant(self, obj):
         participant_string = ""
-        all_participants = Participant.objects.filter(classs__course=obj.course)
+        all_participants = Participant.objects.filter(classs__course=obj.course).select_related('learner')
         for p in all_participants:
             participant_string += "%s %s, " % (p.learner.first_name, p.learner.last_name)
         return participant_string[:-2]
@@ -408,7 +419,8 @@ class SUMitAdmin(admin.ModelAdmin):
     list_display = ("name", "course", "activation_date", "deactivation_date", "get_total_users",
                     "get_total_questions_answered", "get_percent_complete_all", "get_easy_questions_answered",
                     "get_percent_correct_easy", "get_normal_questions_answered", "get_percent_correct_normal",
-                    "get_advanced_questions_answered", "get_percent_correct_advanced", "get_winners", "get_is_active")
+                    "get_advanced_questions_answered", "get_percent_correct_advanced", "get_winners", "get_is_active",
+                    "get_question_pool_size")
     list_filter = ()
     fieldsets = [
         (None, {"fields": ["name", "course", "activation_date", "deactivation_date", "event_points",
@@ -418,83 +430,63 @@ class SUMitAdmin(admin.ModelAdmin):
     form = SUMitForm
     add_form = SUMitForm
 
+    def get_changelist(self, request, **kwargs):
+        return EventStatisticsChangeList
+
     def get_total_users(self, obj):
-        return Participant.objects.filter(classs__course=obj.course).aggregate(Count('id'))['id__count']
+        return get_statistics_for_event(obj)[1]
     get_total_users.short_description = "Total Users"
 
     def get_total_questions_answered(self, obj):
-        return EventQuestionAnswer.objects.filter(event=obj).aggregate(Count('id'))['id__count']
+        return get_statistics_for_event(obj)[0]['answered']
     get_total_questions_answered.short_description = "Total Questions Answered"
 
+    def get_questions_answered(self, obj, difficulty):
+        return get_statistics_for_event(obj)[0]['difficulties'][difficulty]['answered']
+
     def get_easy_questions_answered(self, obj):
-        return EventQuestionAnswer.objects.filter(event=obj, question__difficulty=2).aggregate(Count('id'))['id__count']
+        return self.get_questions_answered(obj, TestingQuestion.DIFF_EASY)
     get_easy_questions_answered.short_description = "Total Easy Questions Answered"
 
     def get_normal_questions_answered(self, obj):
-        return EventQuestionAnswer.objects.filter(event=obj, question__difficulty=3).aggregate(Count('id'))['id__count']
+        return self.get_questions_answered(obj, TestingQuestion.DIFF_NORMAL)
     get_normal_questions_answered.short_description = "Total Normal Questions Answered"
 
     def get_advanced_questions_answered(self, obj):
-        return EventQuestionAnswer.objects.filter(event=obj, question__difficulty=4).aggregate(Count('id'))['id__count']
+        return self.get_questions_answered(obj, TestingQuestion.DIFF_ADVANCED)
     get_advanced_questions_answered.short_description = "Total Advanced Questions Answered"
 
     def get_percent_complete_all(self, obj):
-        total_participants = Participant.objects.filter(classs__course=obj.course).aggregate(Count('id'))['id__count']
-        completed = len(EventQuestionAnswer.objects.values('participant').filter(correct=True).
-                        annotate(answered=Count('question_option')).values('participant').filter(answered=15))
-        if total_participants == 0:
-            return 0
-        else:
-            return round((float(completed) / total_participants) * 100)
+        stats, total_users = get_statistics_for_event(obj)
+        return percentage(stats['completed'], total_users)
     get_percent_complete_all.short_description = "% Complete All Questions"
 
+    def get_count_correct(self, obj, difficulty):
+        return get_statistics_for_event(obj)[0]['difficulties'][difficulty]['correct']
+
     def get_count_correct_easy(self, obj):
-        return EventQuestionAnswer.objects.filter(event=obj, question__difficulty=2, correct=True) \
-            .aggregate(Count('correct'))['correct__count']
+        return self.get_count_correct(obj, TestingQuestion.DIFF_EASY)
 
     def get_count_correct_normal(self, obj):
-        return EventQuestionAnswer.objects.filter(event=obj, question__difficulty=3, correct=True) \
-            .aggregate(Count('correct'))['correct__count']
+        return self.get_count_correct(obj, TestingQuestion.DIFF_NORMAL)
 
     def get_count_correct_advanced(self, obj):
-        return EventQuestionAnswer.objects.filter(event=obj, question__difficulty=4, correct=True) \
-            .aggregate(Count('correct'))['correct__count']
+        return self.get_count_correct(obj, TestingQuestion.DIFF_ADVANCED)
 
     def get_percent_correct_easy(self, obj):
-        answered = self.get_easy_questions_answered(obj)
-        correct = self.get_count_correct_easy(obj)
-        if answered > 0:
-            return round((float(correct) / answered) * 100)
-        else:
-            return 0
+        return percentage(self.get_count_correct_easy(obj), self.get_easy_questions_answered(obj))
     get_percent_correct_easy.short_description = "% Correct Easy Questions Answered"
 
     def get_percent_correct_normal(self, obj):
-        answered = self.get_normal_questions_answered(obj)
-        correct = self.get_count_correct_normal(obj)
-        if answered > 0:
-            return round((float(correct) / answered) * 100)
-        else:
-            return 0
+        return percentage(self.get_count_correct_normal(obj), self.get_normal_questions_answered(obj))
     get_percent_correct_normal.short_description = "% Correct Normal Questions Answered"
 
     def get_percent_correct_advanced(self, obj):
-        answered = self.get_advanced_questions_answered(obj)
-        correct = self.get_count_correct_advanced(obj)
-        if answered > 0:
-            return round((float(correct) / answered) * 100)
-        else:
-            return 0
+        return percentage(self.get_count_correct_advanced(obj), self.get_advanced_questions_answered(obj))
     get_percent_correct_advanced.short_description = "% Correct Advanced Questions Answered"
 
     def get_winners(self, obj):
-        participant_string = ""
-        winner_ids = EventQuestionAnswer.objects.values('participant').filter(event=obj, correct=True).\
-            annotate(correct=Count('question_option')).values('participant').filter(correct=15)
-        all_participants = Participant.objects.filter(id__in=winner_ids)
-        for p in all_participants:
-            participant_string += "%s %s, " % (p.learner.first_name, p.learner.last_name)
-        return participant_string[:-2]
+        return ", ".join(get_statistics_for_event(obj)[0]['winners'])
     get_winners.short_description = "SUMit!s"
 
     def get_is_active(self, obj):
@@ -506,9 +498,9 @@ class SUMitAdmin(admin.ModelAdmin):
     get_is_active.allow_tags = True
 
     def get_question_pool_size(self, obj):
-        question_counts = SUMit.get(event=obj).get_question_counts_html()
-        return str(question_counts)
+        return obj.get_question_counts_html()
     get_question_pool_size.short_description = "Eligible question counts"
+    get_question_pool_size.allow_tags = True
 
 
 class SUMitLevelAdmin(admin.ModelAdmin):
@@ -1,14 +1,16 @@
 import re
-import uuid
 import os
 import shutil
 import logging
 import requests
+from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
 
 from django import forms
 from content.models import TestingQuestion, TestingQuestionOption, Module, Mathml, GoldenEgg, Event, SUMitEndPage,\
-    TestingQuestionDifficulty, EventQuestionRel
+    TestingQuestionDifficulty, EventQuestionRel, MathmlImage, MATHML_MAX_SIZE, MATHML_IMAGE_FORMAT, MATHML_QUALITY
 from django.conf import settings
+from django.db import transaction
 from django.db.models import Max
 from core.models import Class
 from organisation.models import Course
@@ -258,32 +260,29 @@ def process_mathml_content(_content, _source, _source_id):
 
 
 def process_mathml_tag(_content, _source, _source_id):
-    image_format = 'PNG'
-
     directory = settings.MEDIA_ROOT
 
-    unique_filename = str(uuid.uuid4()) + '.' + image_format.lower()
-
-    while True:
-        if not os.path.isfile(directory + unique_filename):
-            break
-        else:
-            unique_filename = str(uuid.uuid4()) + '.' + image_format.lower()
+    # rows with the same mathml share an image
+    mathml_content = convert_to_text(_content)
 
     # coming soon image that will be displayed until the mathml content is rendered
     temp_image = "%s/being_rendered.png" % settings.MEDIA_ROOT
 
-    # copy temp image to a mathml folder with unique name
-    if os.path.isfile(temp_image):
-        shutil.copyfile(temp_image, directory + unique_filename)
+    with transaction.atomic():
+        image = MathmlImage.get_for_content(mathml_content)
 
-    Mathml.objects.create(mathml_content=convert_to_text(_content),
-                          filename=unique_filename,
-                          source=_source,
-                          source_id=_source_id,
-                          rendered=False)
+        # copy temp image to the image's filename
+        if not image.rendered and not os.path.isfile(directory + image.filename) and os.path.isfile(temp_image):
+            shutil.copyfile(temp_image, directory + image.filename)
 
-    return "<img src='/media/%s'/>" % unique_filename
+        Mathml.objects.create(mathml_content=mathml_content,
+                              filename=image.filename,
+                              source=_source,
+                              source_id=_source_id,
+                              rendered=image.rendered,
+                              image=image)
+
+    return "<img src='/media/%s'/>" % image.filename
 
 
 def convert_to_tags(_content):
@@ -306,76 +305,155 @@ def convert_to_text(_content):
     return _content
 
 
-def render_mathml():
+# the number of ids used in each id__in lookup
+MATHML_BATCH_SIZE = 500
+
+
+def id_batches(ids):
+    ids = list(ids)
+    for i in xrange(0, len(ids), MATHML_BATCH_SIZE):
+        yield ids[i:i + MATHML_BATCH_SIZE]
+
+
+def get_source_model(mathml):
+    # options have their own model, the other sources are testing questions
+    if mathml.source == Mathml.TESTING_QUESTION_OPTION:
+        return TestingQuestionOption
+    return TestingQuestion
+
+
+def existing_sources(mathmls):
+    """
+    Returns the set of (source model, source id) pairs of the given Mathml rows whose testing question or
+    option still exists, with a query per source model.
+    """
+    source_ids = {}
+    for m in mathmls:
+        source_ids.setdefault(get_source_model(m), set()).add(m.source_id)
+
+    existing = set()
+    for model, ids in source_ids.items():
+        for batch in id_batches(ids):
+            existing.update((model, source_id) for source_id in
+                            model.objects.filter(id__in=batch).values_list('id', flat=True))
+    return existing
+
+
+def render_mathml_image(session, url, values, paths):
+    """
+    Renders the mathml in values into each of the given paths. Returns None if successful, otherwise the
+    renderer's error.
+    """
+    r = session.post(url, data=values, stream=True)
+    if r.status_code != 200:
+        return r.text
+
+    path = paths[0]
+    # file exists remove it
+    if os.path.isfile(path):
+        os.remove(path)
+
+    # save the new rendered image with the right filename
+    with open(path, 'wb') as f:
+        r.raw.decode_content = True
+        shutil.copyfileobj(r.raw, f)
+
+    for other in paths[1:]:
+        shutil.copyfile(path, other)
+
+    return None
+
+
+def render_mathml(workers=None):
     url = settings.MATHML_URL
-    max_size = 300
-    image_format = 'PNG'
-    quality = 3
     directory = settings.MEDIA_ROOT
+    if workers is None:
+        workers = getattr(settings, 'MATHML_RENDER_WORKERS', 4)
 
     # get all the mathml objects that have not been rendered
-    not_rendered = Mathml.objects.filter(rendered=False)
-
-    for nr in not_rendered:
+    not_rendered = list(Mathml.objects.filter(rendered=False).select_related('image'))
+    if not not_rendered:
+        return
+
+    try:
+        existing = existing_sources(not_rendered)
+    except Exception as ex:
+        logger.warning("Error while checking mathml sources. Reason: %s" % ex.message)
+        return
+
+    # delete records of sources that don't exist anymore, which also deletes
+    # their images once unused
+    orphans = [nr for nr in not_rendered if (get_source_model(nr), nr.source_id) not in existing]
+    for batch in id_batches(nr.id for nr in orphans):
         try:
-            # 0 - question 1 - answer
-            if nr.source == 0 or nr.source == 1:
-                # check if the source still exists (testing question)
-                if TestingQuestion.objects.filter(id=nr.source_id).count() == 0:
-                    # delete image and record as the source doesn't exists anymore
-                    if os.path.isfile(directory + nr.filename):
-                        os.remove(directory + nr.filename)
-                    nr.delete()
-                    continue
-            else:
-                # else is 2 - option
-                if TestingQuestionOption.objects.filter(id=nr.source_id).count() == 0:
-                    if os.path.isfile(directory + nr.filename):
-                        os.remove(directory + nr.filename)
-                    nr.delete()
-                    continue
+            Mathml.objects.filter(id__in=batch).delete()
         except Exception as ex:
-            logger.warning("Error while cleaning mathml %s of source %s. Reason: %s"
-                           % (nr.filename, nr.source_id, ex.message))
-            # error while trying to clean-up
-            continue
+            logger.warning("Error while cleaning mathml of sources %s. Reason: %s"
+                           % (", ".join(str(nr.source_id) for nr in orphans), ex.message))
 
+    # each distinct expression is rendered once for all its rows, rows from
+    # before images were shared get a copy in their own file
+    pending = OrderedDict()
+    for nr in not_rendered:
+        if (get_source_model(nr), nr.source_id) in existing:
+            digest = nr.image.digest if nr.image else MathmlImage.get_digest(nr.mathml_content)
+            pending.setdefault(digest, []).append(nr)
+    if not pending:
+        return
+
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+
+    def render(digest):
+        rows = pending[digest]
         # get the mathml content
-        content = convert_to_tags(nr.mathml_content)
-        values = {'mathml': content,
-                  'max_size': max_size,
-                  'image_format': image_format,
-                  'quality': quality}
-
+        values = {'mathml': convert_to_tags(rows[0].mathml_content),
+                  'max_size': MATHML_MAX_SIZE,
+                  'image_format': MATHML_IMAGE_FORMAT,
+                  'quality': MATHML_QUALITY}
+        paths = OrderedDict((directory + nr.filename, True) for nr in rows).keys()
         try:
             # request mathml to be processed into an image
-            r = requests.post(url, data=values, stream=True)
-
-            # if successful replace the image
-            if r.status_code == 200:
-                if not os.path.exists(directory):
-                    os.makedirs(directory)
-
-                unique_filename = nr.filename
-
-                # file exists remove it
-                if os.path.isfile(directory + unique_filename):
-                    os.remove(directory + unique_filename)
-
-                # save the new rendered image with the right filename
-                with open(directory + unique_filename, 'wb') as f:
-                    r.raw.decode_content = True
-                    shutil.copyfileobj(r.raw, f)
-
-                nr.rendered = True
-                nr.error = ""
-                nr.save()
-            else:
-                nr.error = r.text
-                nr.save()
+            return digest, rows, render_mathml_image(session, url, values, paths)
         except Exception as ex:
             logger.warning("Error while posting/processing request for mathml %s of source %s. Reason: %s"
-                           % (nr.filename, nr.source_id, ex.message))
+                           % (rows[0].filename, rows[0].source_id, ex.message))
+            return digest, rows, False
+
+    pool = ThreadPool(min(workers, len(pending)))
+    try:
+        results = pool.map(render, pending.keys())
+    finally:
+        pool.close()
+        pool.join()
+        session.close()
+
+    rendered_ids = []
+    rendered_digests = []
+    errors = {}
+    for digest, rows, error in results:
+        if error is None:
+            rendered_ids.extend(nr.id for nr in rows)
+            rendered_digests.append(digest)
+        elif error is not False:
+            ids, digests = errors.setdefault(error, ([], []))
+            ids.extend(nr.id for nr in rows)
+            digests.append(digest)
+
+    for batch in id_batches(rendered_ids):
+        Mathml.objects.filter(id__in=batch).update(rendered=True, error="")
+    for batch in id_batches(rendered_digests):
+        MathmlImage.objects.filter(digest__in=batch).update(rendered=True, error="")
+    for error, (ids, digests) in errors.items():
+        for batch in id_batches(ids):
+            Mathml.objects.filter(id__in=batch).update(error=error)
+        for batch in id_batches(digests):
+            MathmlImage.objects.filter(digest__in=batch).update(error=error)
 
 
 class GoldenEggCreateForm(forms.ModelForm):
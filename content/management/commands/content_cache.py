@@ -0,0 +1,33 @@
+from optparse import make_option
+from django.core.management.base import BaseCommand, CommandError
+from content.models import get_course_content, invalidate_question_pools
+from organisation.models import Course
+
+
+class Command(BaseCommand):
+    help = 'Manages the cached course content.'
+    args = 'warm|clear'
+    option_list = BaseCommand.option_list + (
+        make_option('-c', '--course',
+                    dest='course_ids',
+                    action='append',
+                    default=[],
+                    help='Only warms the course with the given id if operation is "warm".'),
+    )
+
+    def handle(self, *args, **options):
+        if len(args) != 1 or args[0] not in ('warm', 'clear'):
+            raise CommandError('Usage: manage.py content_cache %s' % self.args)
+
+        if args[0] == 'warm':
+            courses = Course.objects.filter(is_active=True)
+            if options['course_ids']:
+                courses = Course.objects.filter(id__in=options['course_ids'])
+            for course_id, name in courses.values_list('id', 'name'):
+                self.stdout.write('Warming %s... ' % name, ending='')
+                modules = get_course_content(course_id)
+                self.stdout.write('%d questions' % sum(len(module['questions']) for module in modules))
+        elif args[0] == 'clear':
+            self.stdout.write('Clearing course content... ', ending='')
+            invalidate_question_pools(Course.objects.values_list('id', flat=True))
+            self.stdout.write('done')
@@ -1,14 +1,41 @@
-from django.db import models
+import hashlib
+import os
+import random
+import re
+from django.db import IntegrityError, models, transaction
+from django.conf import settings
+from django.core.cache import cache
 from django.core.validators import MaxValueValidator
 from organisation.models import Module
 from django.core.urlresolvers import reverse
 from django.utils.html import remove_tags, format_html
-from mobileu.utils import format_content, format_option
-from django.db.models import Count
-from datetime import datetime
+from mobileu.utils import bump_generation, content_digest, format_content, format_option, get_generation
+from django.db.models import Count, F
+from datetime import datetime, timedelta
 from organisation.models import CourseModuleRel
 from django.core.mail import mail_managers
 from django.utils.encoding import python_2_unicode_compatible
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+QUESTION_POOL_CACHE_TIMEOUT = getattr(settings, 'QUESTION_POOL_CACHE_TIMEOUT', 60 * 60)
+QUESTION_POOL_GENERATION_KEY = 'content:question_pool:%s:gen'
+SUMIT_LEVELS_KEY = 'content:sumit_levels'
+SUMIT_SHORTAGE_MAILED_KEY = 'content:sumit_shortage_mailed:%s'
+
+
+def remember_formatted(instance, *fields):
+    """
+    Keeps a digest of each field's formatted value so that saving the
+    instance again only formats the fields that have changed since.
+    """
+    instance._format_digests = dict((field, content_digest(getattr(instance, field) or u''))
+                                    for field in fields)
+
+
+def is_changed(instance, field):
+    digests = getattr(instance, '_format_digests', {})
+    return digests.get(field) != content_digest(getattr(instance, field) or u'')
 
 
 @python_2_unicode_compatible
@@ -29,8 +56,10 @@ class LearningChapter(models.Model):
     content = models.TextField("Content", blank=True)
 
     def save(self, *args, **kwargs):
-        self.content = format_content(self.content)
+        if is_changed(self, 'content'):
+            self.content = format_content(self.content)
         super(LearningChapter, self).save(*args, **kwargs)
+        remember_formatted(self, 'content')
 
     def __str__(self):
         return self.name
@@ -95,9 +124,12 @@ class TestingQuestion(models.Model):
         return self.name
 
     def save(self, *args, **kwargs):
-        self.question_content = format_content(self.question_content)
-        self.answer_content = format_content(self.answer_content)
+        if is_changed(self, 'question_content'):
+            self.question_content = format_content(self.question_content)
+        if is_changed(self, 'answer_content'):
+            self.answer_content = format_content(self.answer_content)
         super(TestingQuestion, self).save(*args, **kwargs)
+        remember_formatted(self, 'question_content', 'answer_content')
 
     class Meta:
         verbose_name = "Test Question"
@@ -105,6 +137,145 @@ class TestingQuestion(models.Model):
         ordering = ['name']
 
 
+def question_pool_key(course_id, *parts):
+    generation = get_generation(QUESTION_POOL_GENERATION_KEY % course_id)
+    return 'content:question_pool:%s:%s:%s' % (course_id, generation, ':'.join(unicode(part) for part in parts))
+
+
+def invalidate_question_pools(course_ids):
+    for course_id in set(course_ids):
+        bump_generation(QUESTION_POOL_GENERATION_KEY % course_id)
+
+
+def invalidate_module_question_pools(module_ids):
+    """
+    Invalidates the question pools of the courses the given modules are in.
+    """
+    invalidate_question_pools(CourseModuleRel.objects
+                              .filter(module__in=module_ids)
+                              .values_list('course', flat=True))
+
+
+def get_published_questions(course_id):
+    return TestingQuestion.objects.filter(
+        module__in=CourseModuleRel.objects.filter(course_id=course_id).values('module'),
+        state=TestingQuestion.PUBLISHED)
+
+
+def get_question_pool_sizes(course_id):
+    """
+    Returns a {difficulty: count} dict of the published questions in the course's modules.
+    """
+    key = question_pool_key(course_id, 'sizes')
+    sizes = cache.get(key)
+    if sizes is None:
+        sizes = dict(get_published_questions(course_id)
+                     .order_by()
+                     .values_list('difficulty')
+                     .annotate(Count('id')))
+        cache.set(key, sizes, QUESTION_POOL_CACHE_TIMEOUT)
+    return sizes
+
+
+def get_question_pool(course_id, difficulty):
+    """
+    Returns the ids of the published questions of the given difficulty in the course's modules.
+    """
+    key = question_pool_key(course_id, 'ids', difficulty)
+    ids = cache.get(key)
+    if ids is None:
+        ids = list(get_published_questions(course_id)
+                   .filter(difficulty=difficulty)
+                   .order_by('id')
+                   .values_list('id', flat=True))
+        cache.set(key, ids, QUESTION_POOL_CACHE_TIMEOUT)
+    return ids
+
+
+def serialise_question(question, options):
+    return {
+        'id': question.id,
+        'module_id': question.module_id,
+        'name': question.name,
+        'order': question.order,
+        'difficulty': question.difficulty,
+        'points': question.points,
+        'question_content': question.question_content,
+        'answer_content': question.answer_content,
+        'notes': question.notes,
+        'textbook_link': question.textbook_link,
+        'options': [{
+            'id': option.id,
+            'order': option.order,
+            'content': option.content,
+            'correct': option.correct,
+        } for option in options],
+    }
+
+
+def load_module_questions(module_ids):
+    """
+    Returns a {module_id: [question, ...]} dict of the serialised published questions of the given
+    modules in order, loaded with two queries.
+    """
+    questions = dict((module_id, []) for module_id in module_ids)
+    if not module_ids:
+        return questions
+
+    rows = list(TestingQuestion.objects
+                .filter(module__in=module_ids, state=TestingQuestion.PUBLISHED)
+                .order_by('module', 'order', 'id'))
+    options = dict((question.id, []) for question in rows)
+    for option in TestingQuestionOption.objects.filter(question__in=options.keys()).order_by('order', 'id'):
+        options[option.question_id].append(option)
+
+    for question in rows:
+        questions[question.module_id].append(serialise_question(question, options[question.id]))
+    return questions
+
+
+def get_course_modules(course_id):
+    """
+    Returns the serialised modules of the course in order.
+    """
+    key = question_pool_key(course_id, 'modules')
+    modules = cache.get(key)
+    if modules is None:
+        modules = [{
+            'id': module.id,
+            'name': module.name,
+            'order': module.order,
+            'type': module.type,
+            'is_active': module.is_active,
+        } for module in Module.objects
+            .filter(id__in=CourseModuleRel.objects.filter(course_id=course_id).values('module'))
+            .order_by('order', 'id')]
+        cache.set(key, modules, QUESTION_POOL_CACHE_TIMEOUT)
+    return modules
+
+
+def get_course_content(course_id):
+    """
+    Returns the course's modules, each with a 'questions' list of its serialised published questions and
+    their options. Modules are cached separately and only the modules missing from the cache are
+    loaded. The content is cached until a module, question or option is saved or deleted.
+    """
+    modules = get_course_modules(course_id)
+    keys = dict((question_pool_key(course_id, 'module', module['id']), module['id']) for module in modules)
+    cached = cache.get_many(keys.keys())
+    questions = dict((keys[key], value) for key, value in cached.items())
+
+    missing = [module['id'] for module in modules if module['id'] not in questions]
+    if missing:
+        loaded = load_module_questions(missing)
+        cache.set_many(dict((question_pool_key(course_id, 'module', module_id), loaded[module_id])
+                            for module_id in missing),
+                       QUESTION_POOL_CACHE_TIMEOUT)
+        questions.update(loaded)
+
+    return [dict(module, questions=questions[module['id']]) for module in modules]
+
+
 class TestingQuestionDifficulty(models.Model):
     key = models.PositiveIntegerField(null=False,
                                       blank=False,
@@ -138,9 +309,10 @@ class TestingQuestionOption(models.Model):
     correct = models.BooleanField("Correct")
 
     def save(self, *args, **kwargs):
-        if self.content:
+        if self.content and is_changed(self, 'content'):
             self.content = format_option(self.content)
         super(TestingQuestionOption, self).save(*args, **kwargs)
+        remember_formatted(self, 'content')
 
     def link(self):
         if self.id:
@@ -166,6 +338,64 @@ class TestingQuestionOption(models.Model):
         verbose_name_plural = "Question Options"
 
 
+# the parameters MathML is rendered with
+MATHML_MAX_SIZE = 300
+MATHML_IMAGE_FORMAT = 'PNG'
+MATHML_QUALITY = 3
+
+
+@python_2_unicode_compatible
+class MathmlImage(models.Model):
+
+    """
+    A rendered MathML image shared by all the Mathml rows with the same
+    expression. It's deleted with its file once no Mathml rows refer to it.
+    """
+    digest = models.CharField(max_length=40, unique=True)
+    filename = models.CharField(max_length=255)
+    rendered = models.BooleanField(default=False)
+    error = models.TextField(blank=True)
+
+    def __str__(self):
+        return self.filename
+
+    @staticmethod
+    def normalise(mathml_content):
+        return re.sub(r'>\s+<', '><', mathml_content.strip())
+
+    @staticmethod
+    def get_digest(mathml_content):
+        """
+        Returns the content address of the image for the given mathml, which includes the render parameters.
+        """
+        key = u'%s|%s|%s|%s' % (MATHML_MAX_SIZE, MATHML_IMAGE_FORMAT, MATHML_QUALITY,
+                                MathmlImage.normalise(mathml_content))
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def get_for_content(mathml_content):
+        """
+        Returns the image for the given mathml, locked for the rest of the caller's transaction so it
+        can't be released before a row referring to it is saved.
+        """
+        digest = MathmlImage.get_digest(mathml_content)
+        with transaction.atomic():
+            image = MathmlImage.objects.select_for_update().filter(digest=digest).first()
+            if image is None:
+                try:
+                    with transaction.atomic():
+                        image = MathmlImage.objects.create(
+                            digest=digest, filename='%s.%s' % (digest, MATHML_IMAGE_FORMAT.lower()))
+                except IntegrityError:
+                    # created concurrently
+                    image = MathmlImage.objects.select_for_update().get(digest=digest)
+        return image
+
+    class Meta:
+        verbose_name = "Mathml Image"
+        verbose_name_plural = "Mathml Images"
+
+
 @python_2_unicode_compatible
 class Mathml(models.Model):
     TESTING_QUESTION_QUESTION = 0
@@ -186,6 +416,7 @@ class Mathml(models.Model):
     source = models.IntegerField(max_length=1, choices=SOURCE_CHOICES)
     source_id = models.IntegerField(null=False, blank=False)
     error = models.TextField(null=False, blank=True)
+    image = models.ForeignKey(MathmlImage, null=True, blank=True)
 
     def __str__(self):
         return self.filename
@@ -268,17 +499,48 @@ class Event(models.Model):
     def __str__(self):
         return self.name
 
+    def get_question_rels(self):
+        """
+        Returns the event's EventQuestionRels with their questions, cached until the event's questions, one
+        of those questions or its course's question pools change.
+        """
+        key = question_pool_key(self.course_id, 'event', self.pk)
+        rels = cache.get(key)
+        if rels is None:
+            rels = list(EventQuestionRel.objects.filter(event_id=self.pk).select_related('question').order_by('order'))
+            cache.set(key, rels, QUESTION_POOL_CACHE_TIMEOUT)
+        return rels
+
+    @staticmethod
+    def get_question_totals(events):
+        """
+        Returns the number of questions in each of the given events, keyed by event id, from the cached
+        question lists, loading the missing lists with one query.
+        """
+        keys = dict((question_pool_key(event.course_id, 'event', event.id), event.id) for event in events)
+        cached = cache.get_many(keys.keys())
+        rels = dict((keys[key], value) for key, value in cached.items())
+
+        missing = dict((key, event_id) for key, event_id in keys.items() if event_id not in rels)
+        if missing:
+            for event_id in missing.values():
+                rels[event_id] = []
+            for rel in EventQuestionRel.objects.filter(event_id__in=missing.values()).select_related('question') \
+                    .order_by('order'):
+                rels[rel.event_id].append(rel)
+            cache.set_many(dict((key, rels[event_id]) for key, event_id in missing.items()),
+                           QUESTION_POOL_CACHE_TIMEOUT)
+
+        return dict((event_id, len([rel for rel in event_rels if rel.question_id is not None]))
+                    for event_id, event_rels in rels.items())
+
     def get_next_event_question_rel(self, participant):
         if self.is_active():
-            event_answers = EventQuestionAnswer.objects.filter(event=self, participant=participant) \
-                .aggregate(Count('question'))['question__count']
-
-            all_event_questions = EventQuestionRel.objects.filter(event=self)
-
-            total_event_questions = all_event_questions.aggregate(Count('question'))['question__count']
-            if event_answers < total_event_questions:
-                event_question_rel = EventQuestionRel.objects.filter(event=self, order=event_answers+1).first()
-                return event_question_rel
+            rels = [rel for rel in self.get_question_rels() if rel.question_id is not None]
+            progress = EventParticipantProgress.get_progress(self, participant)
+            if progress.answered < len(rels):
+                order = progress.get_next_order()
+                return next((rel for rel in rels if rel.order == order), None)
 
         return None
 
@@ -300,30 +562,12 @@ class Event(models.Model):
         return self.activation_date < datetime.now() < self.deactivation_date
 
     def get_question_counts(self):
-        modules = CourseModuleRel.objects.filter(course=self.course).values_list('module__id', flat=True)
-
-        ec = TestingQuestion.objects.\
-            filter(
-                module__in=modules,
-                difficulty=TestingQuestion.DIFF_EASY,
-                state=TestingQuestion.PUBLISHED
-            ).count()
-
-        nc = TestingQuestion.objects.\
-            filter(
-                module__in=modules,
-                difficulty=TestingQuestion.DIFF_NORMAL,
-                state=TestingQuestion.PUBLISHED
-            ).count()
-
-        ac = TestingQuestion.objects.\
-            filter(
-                module__in=modules,
-                difficulty=TestingQuestion.DIFF_ADVANCED,
-                state=TestingQuestion.PUBLISHED
-            ).count()
-
-        return {'easy': ec, 'normal': nc, 'advanced': ac}
+        sizes = get_question_pool_sizes(self.course_id)
+        return {
+            'easy': sizes.get(TestingQuestion.DIFF_EASY, 0),
+            'normal': sizes.get(TestingQuestion.DIFF_NORMAL, 0),
+            'advanced': sizes.get(TestingQuestion.DIFF_ADVANCED, 0)
+        }
 
     def get_question_counts_html(self):
         counts = self.get_question_counts()
@@ -396,93 +640,195 @@ class EventParticipantRel(models.Model):
         verbose_name_plural = "Event Participant Relations"
 
 
-class SUMit(Event):
-
-    def get_questions(self):
-
-        event_question_rel = EventQuestionRel.objects.filter(event=self)
-
-        if not event_question_rel:
-            modules = CourseModuleRel.objects.filter(course=self.course).values_list('module__id', flat=True)
-
-            easy_questions = TestingQuestion.objects.\
-                filter(
-                    module__in=modules,
-                    difficulty=TestingQuestion.DIFF_EASY,
-                    state=TestingQuestion.PUBLISHED
-                ).order_by("?")[:15]
-
-            normal_questions = TestingQuestion.objects.\
-                filter(
-                    module__in=modules,
-                    difficulty=TestingQuestion.DIFF_NORMAL,
-                    state=TestingQuestion.PUBLISHED
-                ).order_by("?")[:11]
-
-            advanced_questions = TestingQuestion.objects.\
-                filter(
-                    module__in=modules,
-                    difficulty=TestingQuestion.DIFF_ADVANCED,
-                    state=TestingQuestion.PUBLISHED
-                ).order_by("?")[:5]
-
-            ec = easy_questions.count()
-            nc = normal_questions.count()
-            ac = advanced_questions.count()
-
-            # don't populate EventQuestionRel if we don't have enough questions
-            if ec != 15 or nc != 11 or ac != 5:
-                # inform digit about summit not having enough questions
-                subject = "".join(['%s SUMit! - NOT ENOUGH QUESTIONS' % self.name])
-                easy = ""
-                normal = ""
-                adv = ""
-
-                if ec != 15:
-                    easy = "\nEasy Difficulty requires %s questions" % (15 - ec)
-
-                if nc != 11:
-                    normal = "\nNormal Difficulty requires %s questions" % (11 - nc)
-
-                if ac != 5:
-                    adv = "\nAdvanced Difficulty requires %s questions" % (5 - ac)
-
-                message = "".join(["%s SUMit! does not have enough questions. %s%s%s" % (self.name, easy, normal, adv)])
-                mail_managers(subject=subject, message=message, fail_silently=False)
-
-                return
+class EventParticipantProgress(models.Model):
 
-            order = 1
+    """
+    The number of questions a participant has answered in an event, in total and per difficulty, kept up
+    to date as EventQuestionAnswers are created so the next question can be found without counting them.
+    """
+    DIFFICULTY_FIELDS = {
+        TestingQuestion.DIFF_EASY: 'answered_easy',
+        TestingQuestion.DIFF_NORMAL: 'answered_normal',
+        TestingQuestion.DIFF_ADVANCED: 'answered_advanced',
+    }
+
+    event = models.ForeignKey(Event)
+    participant = models.ForeignKey("core.Participant")
+    answered = models.PositiveIntegerField(default=0)
+    answered_easy = models.PositiveIntegerField(default=0)
+    answered_normal = models.PositiveIntegerField(default=0)
+    answered_advanced = models.PositiveIntegerField(default=0)
+
+    def get_next_order(self, difficulty=None):
+        """
+        Returns the order of the participant's next EventQuestionRel, among those of the given difficulty
+        for SUMits.
+        """
+        if difficulty is None:
+            return self.answered + 1
+        return getattr(self, self.DIFFICULTY_FIELDS[difficulty]) + 1
+
+    @staticmethod
+    def count_answers(event_id, participant_id):
+        counts = dict(EventQuestionAnswer.objects
+                      .filter(event_id=event_id, participant_id=participant_id)
+                      .order_by()
+                      .values_list('question__difficulty')
+                      .annotate(Count('id')))
+        values = {'answered': sum(counts.values())}
+        for difficulty, field in EventParticipantProgress.DIFFICULTY_FIELDS.items():
+            values[field] = counts.get(difficulty, 0)
+        return values
+
+    @staticmethod
+    def get_progress(event, participant):
+        """
+        Returns the participant's progress in the event, counting their answers the first time.
+        """
+        event_id = getattr(event, 'pk', event)
+        participant_id = getattr(participant, 'pk', participant)
+        progress = EventParticipantProgress.objects.filter(event_id=event_id, participant_id=participant_id).first()
+        if progress is None:
+            try:
+                with transaction.atomic():
+                    progress = EventParticipantProgress.objects.create(
+                        event_id=event_id,
+                        participant_id=participant_id,
+                        **EventParticipantProgress.count_answers(event_id, participant_id))
+            except IntegrityError:
+                # created by a concurrent request
+                progress = EventParticipantProgress.objects.get(event_id=event_id, participant_id=participant_id)
+        return progress
+
+    @staticmethod
+    def record_answer(answer):
+        if answer.event_id is None or answer.participant_id is None:
+            return
+
+        updates = {'answered': F('answered') + 1}
+        if answer.question_id is not None:
+            field = EventParticipantProgress.DIFFICULTY_FIELDS.get(answer.question.difficulty)
+            if field:
+                updates[field] = F(field) + 1
+
+        entries = EventParticipantProgress.objects.filter(event_id=answer.event_id,
+                                                          participant_id=answer.participant_id)
+        if entries.update(**updates):
+            return
+
+        try:
+            with transaction.atomic():
+                # the answer has been saved, so it's included in the counts
+                EventParticipantProgress.objects.create(
+                    event_id=answer.event_id,
+                    participant_id=answer.participant_id,
+                    **EventParticipantProgress.count_answers(answer.event_id, answer.participant_id))
+        except IntegrityError:
+            # created by a concurrent answer
+            entries.update(**updates)
 
-            for question in easy_questions:
-                EventQuestionRel.objects.create(order=order, question=question, event=self)
-                order += 1
+    class Meta:
+        unique_together = ("event", "participant")
+        verbose_name = "Event Participant Progress"
+        verbose_name_plural = "Event Participant Progress"
 
-            order = 1
 
-            for question in normal_questions:
-                EventQuestionRel.objects.create(order=order, question=question, event=self)
-                order += 1
+class SUMit(Event):
 
-            order = 1
+    # the number of questions drawn for each difficulty
+    QUESTION_COUNTS = (
+        (TestingQuestion.DIFF_EASY, 15),
+        (TestingQuestion.DIFF_NORMAL, 11),
+        (TestingQuestion.DIFF_ADVANCED, 5),
+    )
 
-            for question in advanced_questions:
-                EventQuestionRel.objects.create(order=order, question=question, event=self)
-                order += 1
+    def get_questions(self):
+        """
+        Draws the SUMit's questions from the course's question pools if that hasn't been done yet. The
+        managers are mailed once per SUMit if there aren't enough questions. Returns whether the SUMit has
+        its questions.
+        """
+        if self.get_question_rels():
+            return True
+
+        # the draw is saved, so it doesn't need to be reproducible and shouldn't be predictable
+        rng = random.SystemRandom()
+        selected = []
+        missing = {}
+        for difficulty, count in self.QUESTION_COUNTS:
+            pool = get_question_pool(self.course_id, difficulty)
+            if len(pool) < count:
+                missing[difficulty] = count - len(pool)
+            else:
+                selected.append(rng.sample(pool, count))
+
+        # don't populate EventQuestionRel if we don't have enough questions
+        if missing:
+            # the scheduled pool builds retry until the SUMit ends, so only mail the first shortage
+            timeout = None
+            if self.deactivation_date:
+                timeout = max(int((self.deactivation_date - datetime.now()).total_seconds()), 1)
+            if not cache.add(SUMIT_SHORTAGE_MAILED_KEY % self.pk, True, timeout):
+                return False
+
+            # inform digit about summit not having enough questions
+            subject = "".join(['%s SUMit! - NOT ENOUGH QUESTIONS' % self.name])
+            easy = ""
+            normal = ""
+            adv = ""
+
+            if TestingQuestion.DIFF_EASY in missing:
+                easy = "\nEasy Difficulty requires %s questions" % missing[TestingQuestion.DIFF_EASY]
+
+            if TestingQuestion.DIFF_NORMAL in missing:
+                normal = "\nNormal Difficulty requires %s questions" % missing[TestingQuestion.DIFF_NORMAL]
+
+            if TestingQuestion.DIFF_ADVANCED in missing:
+                adv = "\nAdvanced Difficulty requires %s questions" % missing[TestingQuestion.DIFF_ADVANCED]
+
+            message = "".join(["%s SUMit! does not have enough questions. %s%s%s" % (self.name, easy, normal, adv)])
+            mail_managers(subject=subject, message=message, fail_silently=False)
+
+            return False
+
+        with transaction.atomic():
+            # lock the event so concurrent callers don't both draw questions
+            Event.objects.select_for_update().filter(pk=self.pk).first()
+            if not EventQuestionRel.objects.filter(event=self).exists():
+                EventQuestionRel.objects.bulk_create([
+                    EventQuestionRel(order=order, question_id=question_id, event_id=self.pk)
+                    for question_ids in selected
+                    for order, question_id in enumerate(question_ids, 1)])
+        cache.delete(question_pool_key(self.course_id, 'event', self.pk))
+        return True
+
+    @staticmethod
+    def build_upcoming_question_pools(hours=None):
+        """
+        Draws the questions for SUMits that are active or activate within the given number of hours
+        (SUMIT_QUESTION_POOL_HOURS by default) and don't have questions yet. Returns the number of
+        SUMits that got questions.
+        """
+        if hours is None:
+            hours = getattr(settings, 'SUMIT_QUESTION_POOL_HOURS', 48)
+        now = datetime.now()
+        sumits = SUMit.objects.filter(activation_date__lt=now + timedelta(hours=hours),
+                                      deactivation_date__gt=now) \
+            .exclude(pk__in=EventQuestionRel.objects.filter(event__isnull=False).values('event'))
+        return len([s for s in sumits if s.get_questions()])
 
     def get_next_sumit_question(self, participant, level, question):
         if self.is_active():
 
             self.get_questions()
 
-            difficulty = SUMitLevel.objects.values("question_%d" % question).get(order=level).values()[0]
-            answered = EventQuestionAnswer.objects.filter(participant=participant, event=self,
-                                                          question__difficulty=difficulty).\
-                aggregate(Count('question'))['question__count']
-            next_question = EventQuestionRel.objects.filter(event=self,
-                                                            order=answered+1,
-                                                            question__difficulty=difficulty,
-                                                            question__state=TestingQuestion.PUBLISHED).first()
+            difficulty = SUMitLevel.get_question_difficulty(level, question)
+            order = EventParticipantProgress.get_progress(self, participant).get_next_order(difficulty)
+            next_question = next((rel for rel in self.get_question_rels()
+                                  if rel.order == order and
+                                  rel.question is not None and
+                                  rel.question.difficulty == difficulty and
+                                  rel.question.state == TestingQuestion.PUBLISHED), None)
             if next_question:
                 return next_question.question
             else:
@@ -555,6 +901,128 @@ class SUMitLevel(models.Model):
             self.image)
     image_.allow_tags = True
 
+    @staticmethod
+    def get_question_difficulty(level, question):
+        """
+        Returns the difficulty of the given question (1 to 3) of the level with the given order.
+        """
+        levels = cache.get(SUMIT_LEVELS_KEY)
+        if levels is None:
+            levels = dict((l['order'], (l['question_1'], l['question_2'], l['question_3']))
+                          for l in SUMitLevel.objects.values('order', 'question_1', 'question_2', 'question_3'))
+            cache.set(SUMIT_LEVELS_KEY, levels, QUESTION_POOL_CACHE_TIMEOUT)
+        if level not in levels:
+            raise SUMitLevel.DoesNotExist("SUMitLevel with order %s does not exist." % level)
+        return levels[level][question - 1]
+
     class Meta:
         verbose_name = "SUMit! Level"
         verbose_name_plural = "SUMit! Levels"
+
+
+@receiver(post_init, sender=LearningChapter)
+@receiver(post_init, sender=TestingQuestionOption)
+def remember_loaded_content(sender, instance, **kwargs):
+    # content loaded from the database was formatted when it was saved
+    if instance.pk is not None:
+        remember_formatted(instance, 'content')
+
+
+@receiver(post_init, sender=TestingQuestion)
+def remember_loaded_question_content(sender, instance, **kwargs):
+    if instance.pk is not None:
+        remember_formatted(instance, 'question_content', 'answer_content')
+
+
+@receiver(post_save, sender=TestingQuestion)
+@receiver(post_delete, sender=TestingQuestion)
+def invalidate_question_pool_cache(sender, instance, **kwargs):
+    invalidate_module_question_pools([instance.module_id])
+
+
+@receiver(post_save, sender=TestingQuestionOption)
+@receiver(post_delete, sender=TestingQuestionOption)
+def invalidate_option_course_content(sender, instance, **kwargs):
+    invalidate_question_pools(CourseModuleRel.objects
+                              .filter(module__testingquestion=instance.question_id)
+                              .values_list('course', flat=True))
+
+
+@receiver(post_save, sender=Module)
+def invalidate_module_course_content(sender, instance, **kwargs):
+    # a deleted module's courses are invalidated as its CourseModuleRels are deleted
+    invalidate_module_question_pools([instance.id])
+
+
+@receiver(post_save, sender=CourseModuleRel)
+@receiver(post_delete, sender=CourseModuleRel)
+def invalidate_course_question_pools(sender, instance, **kwargs):
+    invalidate_question_pools([instance.course_id])
+
+
+@receiver(post_save, sender=EventQuestionRel)
+@receiver(post_delete, sender=EventQuestionRel)
+def invalidate_event_questions(sender, instance, **kwargs):
+    course_id = Event.objects.filter(id=instance.event_id).values_list('course', flat=True).first()
+    cache.delete(question_pool_key(course_id, 'event', instance.event_id))
+
+
+@receiver(post_save, sender=TestingQuestion)
+def invalidate_question_events(sender, instance, **kwargs):
+    # events may use questions from other courses, so they're found through the question's rels
+    cache.delete_many([question_pool_key(course_id, 'event', event_id) for event_id, course_id in
+                       EventQuestionRel.objects.filter(question_id=instance.id, event__isnull=False)
+                       .values_list('event', 'event__course')])
+
+
+@receiver(post_save, sender=SUMitLevel)
+@receiver(post_delete, sender=SUMitLevel)
+def invalidate_sumit_levels(sender, **kwargs):
+    cache.delete(SUMIT_LEVELS_KEY)
+
+
+@receiver(post_save, sender=EventQuestionAnswer)
+def count_event_answer(sender, instance, created, **kwargs):
+    if created:
+        EventParticipantProgress.record_answer(instance)
+
+
+@receiver(post_delete, sender=EventQuestionAnswer)
+def reset_event_progress(sender, instance, **kwargs):
+    # recounted from the remaining answers when next read
+    EventParticipantProgress.objects.filter(event_id=instance.event_id,
+                                            participant_id=instance.participant_id).delete()
+
+
+def remove_media_file(filename):
+    path = settings.MEDIA_ROOT + filename
+    if filename and os.path.isfile(path):
+        os.remove(path)
+
+
+@receiver(post_delete, sender=Mathml)
+def release_mathml_image(sender, instance, **kwargs):
+    if instance.image_id is None:
+        # rows from before images were shared have their own file
+        remove_media_file(instance.filename)
+    else:
+        # the lock keeps rows from being attached to the image while its references are counted
+        with transaction.atomic():
+            image = MathmlImage.objects.select_for_update().filter(id=instance.image_id).first()
+            if image is not None and not Mathml.objects.filter(image_id=image.id).exists():
+                # that was the image's last reference
+                image.delete()
+                remove_media_file(image.filename)
+
+
+@receiver(post_delete, sender=TestingQuestion)
+def delete_question_mathml(sender, instance, **kwargs):
+    Mathml.objects.filter(source_id=instance.id,
+                          source__in=[Mathml.TESTING_QUESTION_QUESTION,
+                                      Mathml.TESTING_QUESTION_ANSWER,
+                                      Mathml.TESTING_QUESTION_NOTES]).delete()
+
+
+@receiver(post_delete, sender=TestingQuestionOption)
+def delete_option_mathml(sender, instance, **kwargs):
+    Mathml.objects.filter(source_id=instance.id, source=Mathml.TESTING_QUESTION_OPTION).delete()
@@ -0,0 +1,159 @@
+"""
+Cached answer statistics shown in the event and SUMit admin listings.
+
+Each event's statistics are cached under their own key and computed for a
+batch of events with a handful of grouped queries: answers grouped by
+(event, difficulty, correct), answers grouped by (event, participant,
+correct) for completion and winners, and event question totals. The number
+of participants per course is cached per course. Statistics for recent
+events are refreshed by content.tasks.update_event_statistics and for
+events as they are end processed. The admin listings load the statistics for
+a page of events together and recompute the page's cache misses in one batch.
+"""
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+
+from content.models import Event, EventQuestionAnswer, EventQuestionRel, TestingQuestion
+from core.models import Participant
+
+EVENT_STATISTICS_CACHE_TIMEOUT = getattr(settings, 'EVENT_STATISTICS_CACHE_TIMEOUT', 60 * 15)
+
+EVENT_STATISTICS_KEY = 'content:event_statistics:%s'
+COURSE_USERS_KEY = 'content:event_statistics:course_users:%s'
+
+# the number of correct answers needed to finish a SUMit
+SUMIT_CORRECT_TO_COMPLETE = 15
+
+# events that ended longer ago than this aren't refreshed by update_event_statistics
+RECENT_EVENT_DAYS = 1
+
+DIFFICULTIES = (TestingQuestion.DIFF_EASY, TestingQuestion.DIFF_NORMAL, TestingQuestion.DIFF_ADVANCED)
+
+
+def empty_statistics():
+    return {
+        'answered': 0,
+        'correct': 0,
+        'difficulties': dict((difficulty, {'answered': 0, 'correct': 0}) for difficulty in DIFFICULTIES),
+        'completed': 0,
+        'winners': [],
+        'created_at': None,
+    }
+
+
+def compute_event_statistics(events):
+    """
+    Returns a {event_id: statistics} dict for the given events.
+    """
+    events = dict((event.id, event.type) for event in events)
+    statistics = dict((event_id, empty_statistics()) for event_id in events)
+    if not events:
+        return statistics
+
+    answers = EventQuestionAnswer.objects \
+        .filter(event__in=events.keys()) \
+        .order_by() \
+        .values_list('event', 'question__difficulty', 'correct') \
+        .annotate(Count('id'))
+    for event_id, difficulty, correct, count in answers:
+        stats = statistics[event_id]
+        stats['answered'] += count
+        if correct:
+            stats['correct'] += count
+        if difficulty in stats['difficulties']:
+            stats['difficulties'][difficulty]['answered'] += count
+            if correct:
+                stats['difficulties'][difficulty]['correct'] += count
+
+    question_totals = dict(EventQuestionRel.objects
+                           .filter(event__in=events.keys(), question__isnull=False)
+                           .order_by()
+                           .values_list('event')
+                           .annotate(Count('id')))
+
+    # per participant answered and correct counts
+    progress = {}
+    participant_answers = EventQuestionAnswer.objects \
+        .filter(event__in=events.keys(), participant__isnull=False) \
+        .order_by() \
+        .values_list('event', 'participant', 'correct') \
+        .annotate(Count('id'))
+    for event_id, participant_id, correct, count in participant_answers:
+        counts = progress.setdefault((event_id, participant_id), [0, 0])
+        counts[0] += count
+        if correct:
+            counts[1] += count
+
+    winner_ids = {}
+    for (event_id, participant_id), (answered, correct) in progress.items():
+        if events[event_id] == Event.ET_SUMIT:
+            completed = correct == SUMIT_CORRECT_TO_COMPLETE
+            if completed:
+                winner_ids.setdefault(event_id, []).append(participant_id)
+        else:
+            completed = answered >= question_totals.get(event_id, 0) > 0
+        if completed:
+            statistics[event_id]['completed'] += 1
+
+    if winner_ids:
+        names = dict((participant_id, u'%s %s' % (first_name, last_name))
+                     for participant_id, first_name, last_name in Participant.objects
+                     .filter(id__in=set(sum(winner_ids.values(), [])))
+                     .values_list('id', 'learner__first_name', 'learner__last_name'))
+        for event_id, participant_ids in winner_ids.items():
+            statistics[event_id]['winners'] = sorted(names[participant_id] for participant_id in participant_ids
+                                                     if participant_id in names)
+
+    created_at = datetime.now()
+    for stats in statistics.values():
+        stats['created_at'] = created_at
+    return statistics
+
+
+def refresh_event_statistics(events=None):
+    """
+    Recomputes and caches the statistics of the given events, by default the events that are active or
+    ended within RECENT_EVENT_DAYS.
+    """
+    if events is None:
+        events = Event.objects.filter(deactivation_date__gte=datetime.now() - timedelta(days=RECENT_EVENT_DAYS))
+    statistics = compute_event_statistics(list(events))
+    cache.set_many(dict((EVENT_STATISTICS_KEY % event_id, stats) for event_id, stats in statistics.items()),
+                   EVENT_STATISTICS_CACHE_TIMEOUT)
+    return statistics
+
+
+def get_course_users(course_id):
+    key = COURSE_USERS_KEY % course_id
+    total = cache.get(key)
+    if total is None:
+        total = Participant.objects.filter(classs__course_id=course_id).count()
+        cache.set(key, total, EVENT_STATISTICS_CACHE_TIMEOUT)
+    return total
+
+
+def load_event_statistics(events):
+    """
+    Attaches the cached statistics to each of the events, computing the cache misses together.
+    """
+    keys = dict((EVENT_STATISTICS_KEY % event.pk, event.pk) for event in events)
+    statistics = dict((keys[key], stats) for key, stats in cache.get_many(keys.keys()).items())
+
+    missing = [event for event in events if event.pk not in statistics]
+    if missing:
+        statistics.update(refresh_event_statistics(missing))
+
+    for event in events:
+        event.cached_statistics = statistics[event.pk]
+
+
+def get_statistics_for_event(event):
+    """
+    Returns the event's cached statistics along with the number of participants in its course.
+    """
+    if not hasattr(event, 'cached_statistics'):
+        load_event_statistics([event])
+    return event.cached_statistics, get_course_users(event.course_id)
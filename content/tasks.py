@@ -1,11 +1,12 @@
 from datetime import datetime
-import operator
 
 from djcelery import celery
 from content.forms import render_mathml
-from content.models import Event, EventParticipantRel, EventQuestionRel, EventQuestionAnswer
+from content.models import Event, EventParticipantRel, EventQuestionRel, EventQuestionAnswer, SUMit
+from content.statistics import refresh_event_statistics
 from core.models import Participant
 from organisation.models import CourseModuleRel
+from django.db import transaction
 from django.db.models import Count
 
 
@@ -16,7 +17,25 @@ def render_mathml_content():
 
 @celery.task
 def end_event_processing():
-    end_event_processing_body()
+    # each event is processed by its own task so they can run concurrently
+    for event_id in get_events_to_end().values_list('id', flat=True):
+        end_event.delay(event_id)
+
+
+@celery.task
+def end_event(event_id):
+    if end_event_body(event_id):
+        refresh_event_statistics(Event.objects.filter(id=event_id))
+
+
+@celery.task
+def build_sumit_question_pools():
+    SUMit.build_upcoming_question_pools()
+
+
+@celery.task
+def update_event_statistics():
+    refresh_event_statistics()
 
 
 # function to assist with testing
@@ -24,37 +43,50 @@ def today():
     return datetime.now()
 
 
-def end_event_processing_body():
+def get_events_to_end():
     # Only get exams and spot tests
-    events = Event.objects.filter(
+    return Event.objects.filter(
         deactivation_date__lt=today(),
         end_processed=False,
         type__in=[Event.ET_EXAM, Event.ET_SPOT_TEST]
     )
 
+
+def end_event_body(event_id):
+    """
+    Marks the participants with the most correct answers in the event as winners and awards them the
+    event's champion scenario. Returns False if the event has already been processed.
+    """
     scenarios = {
         Event.ET_SPOT_TEST: "SPOT_TEST_CHAMP",
         Event.ET_EXAM: "EXAM_CHAMP"
     }
 
-    for event in events:
-        scores = EventQuestionAnswer.objects.filter(event=event, correct=True).values("participant") \
-            .order_by("-score").annotate(score=Count("pk"))
-        if scores:
-            winner_ids = [scores[0]["participant"]]
-            index = 0
-            score_size = len(scores)
-            if score_size > 1:
-                while index + 1 < score_size and scores[index]["score"] == scores[index + 1]["score"]:
-                    winner_ids.append(scores[index + 1]["participant"])
-                    index += 1
-
-            winners = Participant.objects.filter(id__in=winner_ids)
-            module = CourseModuleRel.objects.filter(course=event.course).first()
-
-            for winner in winners:
-                winner.award_scenario(scenarios[event.type], module, special_rule=True)
-                EventParticipantRel.objects.filter(event=event, participant__id__in=winner_ids).update(winner=True)
+    with transaction.atomic():
+        # lock the event so it's only processed once when workers overlap
+        event = Event.objects.select_for_update().filter(id=event_id, end_processed=False).first()
+        if event is None:
+            return False
+
+        scores = EventQuestionAnswer.objects.filter(event=event, correct=True).order_by() \
+            .values("participant").annotate(score=Count("pk"))
+        top_score = scores.order_by("-score").first()
+        if top_score:
+            winner_ids = [score["participant"] for score in scores.filter(score=top_score["score"])]
+            EventParticipantRel.objects.filter(event=event, participant__id__in=winner_ids).update(winner=True)
+
+            module = CourseModuleRel.objects.filter(course=event.course_id).values_list("module", flat=True).first()
+            Participant.award_scenario_to_participants(winner_ids, scenarios[event.type], module, special_rule=True)
 
         event.end_processed = True
-        event.save()
\ No newline at end of file
+        event.save()
+    return True
+
+
+def end_event_processing_body():
+    processed = [event_id for event_id in get_events_to_end().values_list('id', flat=True)
+                 if end_event_body(event_id)]
+
+    # the admin statistics for the processed events are final now
+    if processed:
+        refresh_event_statistics(Event.objects.filter(id__in=processed))
@@ -1,19 +1,34 @@
 from content.models import TestingQuestion, Mathml, SUMit, Event, TestingQuestionOption, EventQuestionRel, \
-    EventQuestionAnswer
+    EventQuestionAnswer, EventParticipantProgress, MathmlImage
 from content.forms import process_mathml_content, render_mathml, convert_to_tags, convert_to_text, \
-    TestingQuestionCreateForm
+    TestingQuestionCreateForm, existing_sources, get_source_model
 from organisation.models import Course, Module, CourseModuleRel, School, Organisation
 from auth.models import Learner
-from core.models import Participant, Class, ParticipantBadgeTemplateRel
+from core.models import Participant, Class, ParticipantBadgeTemplateRel, BadgeAwardLog
+from gamification.models import GamificationScenario
+from content.models import get_course_content, get_question_pool_sizes
 from content.tasks import end_event_processing_body
+from content.admin import TestingQuestionAdmin, SUMitAdmin, EventAdmin, TestingQuestionResource
+from content.statistics import refresh_event_statistics, get_course_users, get_statistics_for_event, \
+    load_event_statistics
+from django.contrib.admin.sites import site
 from mobileu.tasks import send_sumit_counts_body
+from mobileu.utils import format_content
 
 from django.test import TestCase
+from django.test.utils import override_settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.cache import cache
 from datetime import datetime, timedelta
 from mock import patch
 from django.conf import settings
 import responses
+import tablib
 import os
+from StringIO import StringIO
+import threading
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
 
 
 class TestContent(TestCase):
@@ -60,6 +75,7 @@ class TestContent(TestCase):
         question.delete()
 
     def setUp(self):
+        cache.clear()
         self.course = self.create_course()
         self.module = self.create_module('module', self.course)
         self.classs = self.create_class('class name', self.course)
@@ -257,6 +273,256 @@ class TestContent(TestCase):
                     "\nNormal Difficulty requires 10 questions\nAdvanced Difficulty requires 4 questions",
             fail_silently=False)
 
+    @patch("content.models.mail_managers")
+    def test_sumit_shortage_mailed_once(self, mocked_mail_managers):
+        s = SUMit.objects.create(name='short',
+                                 course=self.course,
+                                 activation_date=datetime.now()+timedelta(hours=12),
+                                 deactivation_date=datetime.now()+timedelta(hours=24))
+        self.assertEquals(SUMit.build_upcoming_question_pools(), 0)
+        self.assertEquals(SUMit.build_upcoming_question_pools(), 0)
+        self.assertFalse(s.get_questions())
+        self.assertEquals(mocked_mail_managers.call_count, 1)
+
+    def test_event_questions_from_other_course(self):
+        other_module = self.create_module('other module', self.create_course('other course'))
+        q = self.create_test_question('other question', other_module, state=TestingQuestion.REVIEW_READY)
+        e = self.create_eov_event()
+        EventQuestionRel.objects.create(order=1, event=e, question=q)
+        self.assertEquals(e.get_question_rels()[0].question.state, TestingQuestion.REVIEW_READY)
+
+        q.state = TestingQuestion.PUBLISHED
+        q.save()
+        self.assertEquals(e.get_question_rels()[0].question.state, TestingQuestion.PUBLISHED)
+
+    def test_sumit_build_question_pools(self):
+        for difficulty, count in SUMit.QUESTION_COUNTS:
+            for i in range(count + 2):
+                self.create_test_question(
+                    'pool %d %d' % (difficulty, i),
+                    self.module,
+                    difficulty=difficulty,
+                    state=TestingQuestion.PUBLISHED
+                )
+        upcoming = SUMit.objects.create(name='upcoming',
+                                        course=self.course,
+                                        activation_date=datetime.now()+timedelta(hours=12),
+                                        deactivation_date=datetime.now()+timedelta(hours=24))
+        later = SUMit.objects.create(name='later',
+                                     course=self.course,
+                                     activation_date=datetime.now()+timedelta(days=7),
+                                     deactivation_date=datetime.now()+timedelta(days=8))
+
+        self.assertEquals(SUMit.build_upcoming_question_pools(), 1)
+        rels = EventQuestionRel.objects.filter(event=upcoming)
+        self.assertEquals(rels.count(), 31)
+        self.assertFalse(EventQuestionRel.objects.filter(event=later).exists())
+        for difficulty, count in SUMit.QUESTION_COUNTS:
+            orders = rels.filter(question__difficulty=difficulty).values_list('order', flat=True)
+            self.assertEquals(sorted(orders), range(1, count + 1))
+
+        # SUMits that have their questions are left alone
+        self.assertEquals(SUMit.build_upcoming_question_pools(), 0)
+        self.assertTrue(upcoming.get_questions())
+        self.assertEquals(EventQuestionRel.objects.filter(event=upcoming).count(), 31)
+
+    def test_course_content_cached(self):
+        second = self.create_test_question('second question', self.module, order=2,
+                                           state=TestingQuestion.PUBLISHED, points=5)
+        first = self.create_test_question('first question', self.module, order=1,
+                                          state=TestingQuestion.PUBLISHED)
+        option = self.create_test_question_option('first option', first)
+        self.create_test_question_option('second option', first, correct=False)
+
+        modules = get_course_content(self.course.id)
+        self.assertEquals([module['id'] for module in modules], [self.module.id])
+        # unpublished questions are left out
+        questions = modules[0]['questions']
+        self.assertEquals([question['id'] for question in questions], [first.id, second.id])
+        self.assertEquals(questions[1]['points'], 5)
+        self.assertEquals([o['correct'] for o in questions[0]['options']], [True, False])
+
+        with self.assertNumQueries(0):
+            self.assertEquals(get_course_content(self.course.id), modules)
+
+        # edits are picked up
+        option.correct = False
+        option.save()
+        self.assertFalse(get_course_content(self.course.id)[0]['questions'][0]['options'][0]['correct'])
+
+        self.module.name = 'renamed module'
+        self.module.save()
+        self.assertEquals(get_course_content(self.course.id)[0]['name'], 'renamed module')
+
+        second.delete()
+        self.assertEquals(len(get_course_content(self.course.id)[0]['questions']), 1)
+
+    def test_content_cache_command(self):
+        self.assertRaises(CommandError, call_command, 'content_cache')
+        self.assertRaises(CommandError, call_command, 'content_cache', 'unknown')
+        call_command('content_cache', 'warm', stdout=StringIO())
+        with self.assertNumQueries(0):
+            get_course_content(self.course.id)
+
+    def test_event_progress(self):
+        e = Event.objects.create(name='Progress',
+                                 course=self.course,
+                                 activation_date=datetime.now()-timedelta(days=1),
+                                 deactivation_date=datetime.now()+timedelta(days=1),
+                                 type=Event.ET_EXAM)
+        q1 = self.create_test_question('progress 1', self.module, difficulty=TestingQuestion.DIFF_EASY,
+                                       state=TestingQuestion.PUBLISHED)
+        q2 = self.create_test_question('progress 2', self.module, difficulty=TestingQuestion.DIFF_NORMAL,
+                                       state=TestingQuestion.PUBLISHED)
+        EventQuestionRel.objects.create(order=1, event=e, question=q1)
+        EventQuestionRel.objects.create(order=2, event=e, question=q2)
+
+        self.assertEquals(e.get_next_event_question(self.participant), q1)
+
+        self.participant.answer_event(e, q1, self.create_test_question_option('progress option 1', q1))
+        progress = EventParticipantProgress.objects.get(event=e, participant=self.participant)
+        self.assertEquals(progress.answered, 1)
+        self.assertEquals(progress.answered_easy, 1)
+        self.assertEquals(progress.answered_normal, 0)
+
+        # served from the progress record and the cached question list
+        with self.assertNumQueries(1):
+            self.assertEquals(e.get_next_event_question(self.participant), q2)
+
+        self.participant.answer_event(e, q2, self.create_test_question_option('progress option 2', q2))
+        self.assertIsNone(e.get_next_event_question(self.participant))
+
+        # removing answers recounts the progress
+        EventQuestionAnswer.objects.filter(event=e, question=q2).delete()
+        self.assertEquals(e.get_next_event_question(self.participant), q2)
+        self.assertEquals(EventParticipantProgress.objects.get(event=e, participant=self.participant).answered, 1)
+
+    def test_event_statistics(self):
+        e = self.create_eov_event()
+        s = SUMit.objects.create(name='Statistics',
+                                 course=self.course,
+                                 activation_date=datetime.now()-timedelta(days=1),
+                                 deactivation_date=datetime.now()+timedelta(days=1))
+        easy = self.create_test_question('statistics easy', self.module, difficulty=TestingQuestion.DIFF_EASY)
+        normal = self.create_test_question('statistics normal', self.module, difficulty=TestingQuestion.DIFF_NORMAL)
+        right = self.create_test_question_option('statistics right', easy)
+        wrong = self.create_test_question_option('statistics wrong', normal, correct=False)
+        EventQuestionRel.objects.create(order=1, event=e, question=easy)
+
+        # answers to other events don't count towards the SUMit
+        self.answer_event_question(e, easy, right, True, datetime.now(), self.participant)
+        for i in range(15):
+            self.answer_event_question(s, easy, right, True, datetime.now(), self.participant)
+        self.answer_event_question(s, normal, wrong, False, datetime.now(), self.participant)
+        refresh_event_statistics([e, s])
+        get_course_users(self.course.id)
+
+        sumit_admin = SUMitAdmin(SUMit, site)
+        event_admin = EventAdmin(Event, site)
+        with self.assertNumQueries(0):
+            self.assertEquals(sumit_admin.get_total_users(s), 1)
+            self.assertEquals(sumit_admin.get_total_questions_answered(s), 16)
+            self.assertEquals(sumit_admin.get_easy_questions_answered(s), 15)
+            self.assertEquals(sumit_admin.get_percent_correct_easy(s), 100)
+            self.assertEquals(sumit_admin.get_normal_questions_answered(s), 1)
+            self.assertEquals(sumit_admin.get_percent_correct_normal(s), 0)
+            self.assertEquals(sumit_admin.get_advanced_questions_answered(s), 0)
+            self.assertEquals(sumit_admin.get_percent_complete_all(s), 100)
+            self.assertEquals(sumit_admin.get_winners(s), "%s %s" % (self.learner.first_name, self.learner.last_name))
+
+            self.assertEquals(event_admin.get_total_questions_answered(e), 1)
+            self.assertEquals(event_admin.get_percent_correct(e), 100)
+            self.assertEquals(event_admin.get_percent_complete_all(e), 100)
+
+        # statistics are cached per event and computed on their own on a miss
+        cache.clear()
+        stats, total_users = get_statistics_for_event(Event.objects.get(id=e.id))
+        self.assertEquals(stats['answered'], 1)
+        self.assertEquals(total_users, 1)
+        self.assertIsNone(cache.get('content:event_statistics:%s' % s.id))
+
+        # a page of events has its cache misses computed together
+        cache.delete('content:event_statistics:%s' % e.id)
+        events = list(Event.objects.filter(id__in=[e.id, s.id]))
+        with patch('content.statistics.refresh_event_statistics', wraps=refresh_event_statistics) as mocked_refresh:
+            load_event_statistics(events)
+        mocked_refresh.assert_called_once_with(events)
+        self.assertEquals(sorted(event.cached_statistics['answered'] for event in events), [1, 16])
+
+    def test_render_mathml_concurrent(self):
+        # a local stub standing in for the renderer
+        requests_received = []
+
+        class RendererStub(BaseHTTPRequestHandler):
+            def do_POST(self):
+                requests_received.append(self.rfile.read(int(self.headers['Content-Length'])))
+                self.send_response(200)
+                self.send_header('Content-Type', 'image/png')
+                self.end_headers()
+                self.wfile.write('png')
+
+            def log_message(self, *args):
+                pass
+
+        server = HTTPServer(('127.0.0.1', 0), RendererStub)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+        try:
+            with override_settings(MATHML_URL='http://127.0.0.1:%d/' % server.server_port, MEDIA_ROOT="/tmp/"):
+                shared = "<math><mi>x</mi></math>"
+                q1 = self.create_test_question('mathml 1', self.module)
+                q2 = self.create_test_question('mathml 2', self.module)
+                process_mathml_content(shared, 0, q1.id)
+                process_mathml_content(shared, 0, q2.id)
+                process_mathml_content("<math><mi>y</mi></math>", 1, q2.id)
+                process_mathml_content(shared, 0, 0)
+
+                render_mathml(workers=2)
+        finally:
+            server.shutdown()
+
+        # identical mathml is rendered once and rows without a source are removed
+        self.assertEquals(len(requests_received), 2)
+        self.assertEquals(Mathml.objects.filter(source_id=0).count(), 0)
+        self.assertEquals(Mathml.objects.filter(rendered=True).count(), 3)
+        for m in Mathml.objects.all():
+            with open("/tmp/" + m.filename) as f:
+                self.assertEquals(f.read(), 'png')
+
+    def test_mathml_note_sources(self):
+        # notes are processed with the question's id, like the question and answer content
+        process_mathml_content("<math><mi>n</mi></math>", Mathml.TESTING_QUESTION_NOTES, self.question.id)
+        self.assertFalse(TestingQuestionOption.objects.filter(id=self.question.id).exists())
+
+        notes = Mathml.objects.get(source=Mathml.TESTING_QUESTION_NOTES)
+        self.assertEquals(get_source_model(notes), TestingQuestion)
+        self.assertEquals(existing_sources([notes]), set([(TestingQuestion, self.question.id)]))
+
+    @override_settings(MEDIA_ROOT="/tmp/")
+    def test_mathml_image_shared(self):
+        q1 = self.create_test_question('shared mathml 1', self.module)
+        q2 = self.create_test_question('shared mathml 2', self.module)
+        output1 = process_mathml_content("<math><mi>z</mi></math>", 0, q1.id)
+        output2 = process_mathml_content("<math>\n  <mi>z</mi>\n</math>", 1, q2.id)
+
+        # the same expression refers to the same image
+        self.assertEquals(output1, output2)
+        self.assertEquals(MathmlImage.objects.count(), 1)
+        image = MathmlImage.objects.get()
+        self.assertEquals(Mathml.objects.filter(image=image).count(), 2)
+        with open("/tmp/" + image.filename, 'wb') as f:
+            f.write('png')
+
+        # the image is kept until its last source is deleted
+        q1.delete()
+        self.assertTrue(MathmlImage.objects.filter(id=image.id).exists())
+        self.assertTrue(os.path.isfile("/tmp/" + image.filename))
+        q2.delete()
+        self.assertFalse(MathmlImage.objects.filter(id=image.id).exists())
+        self.assertFalse(os.path.isfile("/tmp/" + image.filename))
+
     #TODO def test_render_mathml(self):
 
     def create_eov_event(self):
@@ -340,6 +606,33 @@ class TestContent(TestCase):
         self.assertEquals(awarded_badge.count(), 1)
         self.assertEquals(awarded_badge[0].awardcount, 1)
 
+    def test_end_of_event_task_reawards_badge(self):
+        scenario = GamificationScenario.objects.get(event="EXAM_CHAMP")
+        scenario.award_type = 2
+        scenario.save()
+        ParticipantBadgeTemplateRel.objects.create(participant=self.participant, badgetemplate=scenario.badge,
+                                                   scenario=scenario, awarddate=datetime.now())
+        e = self.create_eov_event()
+        q = self.create_test_question('question2', self.module, difficulty=TestingQuestion.DIFF_EASY,
+                                      state=TestingQuestion.PUBLISHED)
+        qo = self.create_test_question_option(name="q2_o1", question=q)
+        EventQuestionRel.objects.create(order=1, event=e, question=q)
+        self.answer_event_question(event=e, question=q, question_option=qo, correct=True, answer_date=datetime.now(),
+                                   participant=self.participant)
+        Participant.objects.filter(id=self.participant.id).update(points=100)
+
+        end_event_processing_body()
+
+        awarded_badge = ParticipantBadgeTemplateRel.objects.get(participant=self.participant,
+                                                                badgetemplate=scenario.badge)
+        self.assertEquals(awarded_badge.awardcount, 2)
+        self.assertEquals(BadgeAwardLog.objects.filter(participant_badge_rel=awarded_badge).count(), 1)
+
+        # the winner's points are recalculated rather than incremented
+        participant = Participant.objects.get(id=self.participant.id)
+        self.assertNotEquals(participant.points, 100)
+        self.assertEquals(participant.points, participant.recalculate_total_points())
+
     def test_end_of_event_task_event_with_answers_for_multiple_learners_both_awarded(self):
         e = self.create_eov_event()
         self.assertEquals(Event.objects.all().count(), 1)
@@ -521,6 +814,61 @@ class TestContent(TestCase):
             counts,
             'Should have normal=2, got %s' % str(counts))
 
+    def test_question_import_skips_unchanged_content(self):
+        dataset = tablib.Dataset(headers=['id', 'name', 'description'])
+        dataset.append([self.question.id, self.question.name, 'imported'])
+
+        with patch('content.models.format_content', wraps=format_content) as mocked_format_content:
+            result = TestingQuestionResource().import_data(dataset, dry_run=False)
+            self.assertFalse(result.has_errors())
+            self.assertFalse(mocked_format_content.called)
+
+            question = TestingQuestion.objects.get(id=self.question.id)
+            self.assertEquals(question.description, 'imported')
+            question.answer_content = '<b>answer</b>'
+            question.save()
+            mocked_format_content.assert_called_once_with('<b>answer</b>')
+
+    def test_sumit_counts_cached(self):
+        s = SUMit.objects.create(name='Blarg',
+                                 course=self.course,
+                                 activation_date=datetime.now()+timedelta(hours=12),
+                                 deactivation_date=datetime.now()+timedelta(hours=24))
+        q = TestingQuestion.objects.create(name='TQ1',
+                                           module=self.module,
+                                           question_content='First question?',
+                                           state=TestingQuestion.PUBLISHED,
+                                           difficulty=TestingQuestion.DIFF_EASY)
+        with self.assertNumQueries(1):
+            s.get_question_counts()
+        with self.assertNumQueries(0):
+            counts = s.get_question_counts()
+        self.assertEquals(counts['easy'], 1)
+
+        # state changes through the admin actions don't fire signals
+        question_admin = TestingQuestionAdmin(TestingQuestion, site)
+        question_admin.make_incomplete(None, TestingQuestion.objects.filter(id=q.id))
+        self.assertEquals(s.get_question_counts()['easy'], 0)
+
+        # modules removed from the course drop their questions from the pool
+        question_admin.make_published(None, TestingQuestion.objects.filter(id=q.id))
+        self.assertEquals(s.get_question_counts()['easy'], 1)
+        CourseModuleRel.objects.filter(course=self.course, module=self.module).delete()
+        self.assertEquals(s.get_question_counts()['easy'], 0)
+
+    def test_question_pools_per_course(self):
+        other_course = self.create_course('other course')
+        other_module = self.create_module('other module', other_course)
+        self.create_test_question('TQ1', self.module, state=TestingQuestion.PUBLISHED,
+                                  difficulty=TestingQuestion.DIFF_EASY)
+        self.assertEquals(get_question_pool_sizes(self.course.id), {TestingQuestion.DIFF_EASY: 1})
+
+        # changes to another course's questions keep this course's pools
+        self.create_test_question('TQ2', other_module, state=TestingQuestion.PUBLISHED)
+        with self.assertNumQueries(0):
+            get_question_pool_sizes(self.course.id)
+        self.assertEquals(get_question_pool_sizes(other_course.id), {TestingQuestion.DIFF_NONE: 1})
+
     @patch("mobileu.tasks.mail_managers")
     def test_send_sumit_counts_insufficient(self, mocked_mail_managers):
         s = SUMit.objects.create(name='Blarg',
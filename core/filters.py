@@ -1,21 +1,103 @@
 from datetime import datetime, timedelta
-from django.db.models import Count
+from django.db.models import Count, Q
 from django.contrib import admin
 from django.utils.translation import ugettext_lazy as _
-import operator
 from gamification.models import GamificationScenario
 
 from auth.models import Learner
 
 
-class ParticipantFilter(admin.SimpleListFilter):
-    title = _('Participant')
-    parameter_name = 'id'
+class AutocompleteFilter(admin.SimpleListFilter):
+
+    """
+    A list filter for tables too large to list in full. Rather than every
+    object it shows a search box and one page of the objects whose search
+    fields start with the search term, ordered by the lookup ordering.
+
+    Subclasses set lookup_model, search_fields, lookup_ordering and
+    label_fields and may override get_label to build an option's label from
+    a row of label_fields values. The search and page parameters are named
+    after lookup_key, which defaults to parameter_name and needs to be set
+    when filters on the same changelist share a parameter_name.
+    """
+    template = 'admin/autocomplete_filter.html'
+    lookup_key = None
+    lookup_model = None
+    search_fields = ()
+    lookup_ordering = ('id',)
+    label_fields = ()
+    page_size = 20
+
+    def __init__(self, request, params, model, model_admin):
+        # take the search and page parameters out of params so the
+        # changelist doesn't treat them as field lookups
+        lookup_key = self.lookup_key or self.parameter_name
+        self.search_parameter_name = '%s_q' % lookup_key
+        self.page_parameter_name = '%s_p' % lookup_key
+        self.search_term = params.pop(self.search_parameter_name, '').strip()
+        try:
+            self.page = max(int(params.pop(self.page_parameter_name, 1)), 1)
+        except ValueError:
+            self.page = 1
+        self.has_next_page = False
+        self.previous_query_string = None
+        self.next_query_string = None
+        self.hidden_params = []
+        super(AutocompleteFilter, self).__init__(request, params, model, model_admin)
+
+    def get_label(self, row):
+        return u' '.join(row[f] for f in self.label_fields if row[f])
+
+    def get_lookup_queryset(self, request):
+        queryset = self.lookup_model.objects.all()
+        if self.search_term:
+            # prefix matches on the indexed upper() expressions, see the
+            # auth migration adding the prefix search indexes
+            query = Q()
+            for field in self.search_fields:
+                query |= Q(**{'%s__istartswith' % field: self.search_term})
+            queryset = queryset.filter(query)
+        return queryset
 
     def lookups(self, request, model_admin):
-        result = set([c.learner for c in Learner.objects.all()])
-        return [(c.id, c.first_name + ' ' + c.last_name)
-                for c in sorted(result, key=operator.attrgetter('first_name'))]
+        fields = ('id',) + tuple(self.label_fields)
+        start = (self.page - 1) * self.page_size
+        rows = list(self.get_lookup_queryset(request).order_by(*self.lookup_ordering)
+                    .values(*fields)[start:start + self.page_size + 1])
+        self.has_next_page = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+
+        # keep the selected object listed when it's not on this page
+        if self.value() and not any(unicode(row['id']) == self.value() for row in rows):
+            rows = list(self.lookup_model.objects.filter(id=self.value()).values(*fields)) + rows
+
+        return [(row['id'], self.get_label(row)) for row in rows]
+
+    def has_output(self):
+        # the search box is shown even when nothing matches the search
+        return True
+
+    def choices(self, cl):
+        self.hidden_params = [(k, v) for k, v in cl.params.items()
+                              if k not in (self.search_parameter_name, self.page_parameter_name)]
+        if self.page > 1:
+            self.previous_query_string = cl.get_query_string({self.page_parameter_name: self.page - 1})
+        if self.has_next_page:
+            self.next_query_string = cl.get_query_string({self.page_parameter_name: self.page + 1})
+        for choice in super(AutocompleteFilter, self).choices(cl):
+            yield choice
+
+
+class LearnerAutocompleteFilter(AutocompleteFilter):
+    lookup_model = Learner
+    search_fields = ('first_name', 'last_name', 'mobile')
+    lookup_ordering = ('first_name', 'last_name', 'id')
+    label_fields = ('first_name', 'last_name')
+
+
+class ParticipantFilter(LearnerAutocompleteFilter):
+    title = _('Participant')
+    parameter_name = 'id'
 
     def queryset(self, request, queryset):
         if self.value() is None:
@@ -24,12 +106,13 @@ class ParticipantFilter(admin.SimpleListFilter):
             return queryset.filter(participant__learner__id=self.value())
 
 
-class FirstNameFilter(admin.SimpleListFilter):
+class FirstNameFilter(LearnerAutocompleteFilter):
     title = _('First Name')
     parameter_name = 'id'
-
-    def lookups(self, request, model_admin):
-        return Learner.objects.all().values_list('id', 'first_name').order_by('first_name')
+    lookup_key = 'first_name'
+    search_fields = ('first_name',)
+    lookup_ordering = ('first_name', 'id')
+    label_fields = ('first_name',)
 
     def queryset(self, request, queryset):
         if self.value() is None:
@@ -38,12 +121,13 @@ class FirstNameFilter(admin.SimpleListFilter):
             return queryset.filter(participant__learner__id=self.value())
 
 
-class LastNameFilter(admin.SimpleListFilter):
+class LastNameFilter(LearnerAutocompleteFilter):
     title = _('Last Name')
     parameter_name = 'id'
-
-    def lookups(self, request, model_admin):
-        return Learner.objects.all().values_list('id', 'last_name').order_by('last_name')
+    lookup_key = 'last_name'
+    search_fields = ('last_name',)
+    lookup_ordering = ('last_name', 'id')
+    label_fields = ('last_name',)
 
     def queryset(self, request, queryset):
         if self.value() is None:
@@ -52,12 +136,13 @@ class LastNameFilter(admin.SimpleListFilter):
             return queryset.filter(participant__learner__id=self.value())
 
 
-class MobileFilter(admin.SimpleListFilter):
+class MobileFilter(LearnerAutocompleteFilter):
     title = _('Mobile')
     parameter_name = 'id'
-
-    def lookups(self, request, model_admin):
-        return Learner.objects.all().values_list('id', 'mobile').order_by('mobile')
+    lookup_key = 'mobile'
+    search_fields = ('mobile',)
+    lookup_ordering = ('mobile', 'id')
+    label_fields = ('mobile',)
 
     def queryset(self, request, queryset):
         if self.value() is None:
@@ -66,15 +151,10 @@ class MobileFilter(admin.SimpleListFilter):
             return queryset.filter(participant__learner__id=self.value())
 
 
-class LearnerFilter(admin.SimpleListFilter):
+class LearnerFilter(LearnerAutocompleteFilter):
     title = _('Learner')
     parameter_name = 'id'
 
-    def lookups(self, request, model_admin):
-        result = set([c.learner for c in Learner.objects.all()])
-        return [(c.id, c.first_name + ' ' + c.last_name)
-                for c in sorted(result, key=operator.attrgetter('first_name'))]
-
     def queryset(self, request, queryset):
         if self.value() is None:
             return queryset
@@ -82,12 +162,13 @@ class LearnerFilter(admin.SimpleListFilter):
             return queryset.filter(learner__id=self.value())
 
 
-class ParticipantFirstNameFilter(admin.SimpleListFilter):
+class ParticipantFirstNameFilter(LearnerAutocompleteFilter):
     title = _('First Name')
     parameter_name = 'id'
-
-    def lookups(self, request, model_admin):
-        return Learner.objects.all().values_list('id', 'first_name').order_by('first_name')
+    lookup_key = 'first_name'
+    search_fields = ('first_name',)
+    lookup_ordering = ('first_name', 'id')
+    label_fields = ('first_name',)
 
     def queryset(self, request, queryset):
         if self.value() is None:
@@ -96,12 +177,13 @@ class ParticipantFirstNameFilter(admin.SimpleListFilter):
             return queryset.filter(learner__id=self.value())
 
 
-class ParticipantLastNameFilter(admin.SimpleListFilter):
+class ParticipantLastNameFilter(LearnerAutocompleteFilter):
     title = _('Last Name')
     parameter_name = 'id'
-
-    def lookups(self, request, model_admin):
-        return Learner.objects.all().values_list('id', 'last_name').order_by('last_name')
+    lookup_key = 'last_name'
+    search_fields = ('last_name',)
+    lookup_ordering = ('last_name', 'id')
+    label_fields = ('last_name',)
 
     def queryset(self, request, queryset):
         if self.value() is None:
@@ -110,12 +192,13 @@ class ParticipantLastNameFilter(admin.SimpleListFilter):
             return queryset.filter(learner__id=self.value())
 
 
-class ParticipantMobileFilter(admin.SimpleListFilter):
+class ParticipantMobileFilter(LearnerAutocompleteFilter):
     title = _('Mobile')
     parameter_name = 'id'
-
-    def lookups(self, request, model_admin):
-        return Learner.objects.all().values_list('id', 'mobile').order_by('mobile')
+    lookup_key = 'mobile'
+    search_fields = ('mobile',)
+    lookup_ordering = ('mobile', 'id')
+    label_fields = ('mobile',)
 
     def queryset(self, request, queryset):
         if self.value() is None:
@@ -124,15 +207,10 @@ class ParticipantMobileFilter(admin.SimpleListFilter):
             return queryset.filter(learner__id=self.value())
 
 
-class UserFilter(admin.SimpleListFilter):
+class UserFilter(LearnerAutocompleteFilter):
     title = _('User')
     parameter_name = 'id'
 
-    def lookups(self, request, model_admin):
-        result = set([c.learner for c in Learner.objects.all()])
-        return [(c.id, c.first_name + ' ' + c.last_name)
-                for c in sorted(result, key=operator.attrgetter('first_name'))]
-
     def queryset(self, request, queryset):
         if self.value() is None:
             return queryset
@@ -1,29 +1,57 @@
-from datetime import datetime
+import json
+from datetime import datetime, timedelta
 
 from auth.models import Learner, Teacher
 
 from content.models import Event, EventParticipantRel, EventQuestionAnswer, \
-    EventQuestionRel, GoldenEggRewardLog, TestingQuestion, TestingQuestionOption
+    GoldenEggRewardLog, TestingQuestion, TestingQuestionOption
 
-from django.db import models
+from django.db import IntegrityError, models, transaction
 
-from django.db.models import Count
+from django.db.models import Count, F
+
+from django.conf import settings
+
+from django.core.cache import cache
+
+from django.db.models.signals import post_delete, post_save
+
+from django.dispatch import receiver
+
+from django.utils import timezone
 
 from django.utils.encoding import python_2_unicode_compatible
 
 from gamification.models import GamificationBadgeTemplate, GamificationPointBonus, GamificationScenario
 
-from organisation.models import Course
+from organisation.models import Course, School
 
 from organisation.models import PROVINCE_CHOICES
 
 from mobileu.settings import GRADE_10_COURSE_NAME, GRADE_11_COURSE_NAME, GRADE_12_COURSE_NAME
 
+from mobileu.utils import LRUCache, bump_generation, get_generation
+
 
 def today():
     return datetime.now()
 
 
+RESOLVER_CACHE_TIMEOUT = getattr(settings, 'CLASS_RESOLVER_CACHE_TIMEOUT', 60 * 60)
+ANSWERED_QUESTIONS_CACHE_TIMEOUT = getattr(settings, 'ANSWERED_QUESTIONS_CACHE_TIMEOUT', 60 * 60 * 24)
+RESOLVER_GENERATION_KEY = 'core:resolver:gen'
+AIRTIME_SNAPSHOT_KEY = 'core:airtime_snapshot:%s'
+
+
+def resolver_key(*parts):
+    generation = get_generation(RESOLVER_GENERATION_KEY)
+    return 'core:resolver:%s:%s' % (generation, ':'.join(unicode(part) for part in parts))
+
+
+def invalidate_resolver():
+    bump_generation(RESOLVER_GENERATION_KEY)
+
+
 @python_2_unicode_compatible
 class Class(models.Model):
 
@@ -63,16 +91,17 @@ class Class(models.Model):
 
     @staticmethod
     def get_or_create_grade_course(grade):
-        try:
-            course = Course.objects.get(name=Class.grade_course_lookup.get(grade))
-        except:
-            course = Course.objects.create(name=Class.grade_course_lookup.get(grade))
+        course = cache.get(resolver_key('course', grade))
+        if course is None:
+            course, created = Course.objects.get_or_create(name=Class.grade_course_lookup.get(grade))
+            cache.set(resolver_key('course', grade), course, RESOLVER_CACHE_TIMEOUT)
         return course
 
     @staticmethod
     def get_or_create_class(grade, school):
         """
         Returns a class for the appropriate course/grade/school. Will be created if it doesn't exist.
+        Resolved classes are cached until a class, course or school is saved or deleted.
 
         Args:
             grade   (str):      String representing the grade of the class.
@@ -80,18 +109,61 @@ class Class(models.Model):
         Returns:
             Class   The fetched/generated class object.
         """
-        class_name = "%s - %s" % (school.name, grade)
-        try:
-            classs = Class.objects.get(name=class_name)
-        except Class.DoesNotExist:
-            classs = Class.objects.create(
-                name=class_name,
-                description="%s open class for %s" % (school.name, grade),
-                province=school.province,
-                type=Class.CT_OPEN,
-                course=Class.get_or_create_grade_course(grade))
+        classs = cache.get(resolver_key('class', school.id, grade))
+        if classs is None:
+            classs, created = Class.objects.get_or_create(
+                name="%s - %s" % (school.name, grade),
+                defaults={
+                    'description': "%s open class for %s" % (school.name, grade),
+                    'province': school.province,
+                    'type': Class.CT_OPEN,
+                    'course': Class.get_or_create_grade_course(grade)})
+            # the key is built again as creating the class moves the generation on
+            cache.set(resolver_key('class', school.id, grade), classs, RESOLVER_CACHE_TIMEOUT)
         return classs
 
+    @staticmethod
+    def get_or_create_classes(grade_schools):
+        """
+        Bulk version of get_or_create_class. Missing classes are created with
+        a single insert.
+
+        Args:
+            grade_schools   (iterable): (grade, school id, school name, school province) tuples.
+        Returns:
+            dict    Class ids keyed by (school id, grade).
+        """
+        wanted = {}
+        for grade, school_id, school_name, province in grade_schools:
+            wanted["%s - %s" % (school_name, grade)] = (grade, school_id, school_name, province)
+
+        found = dict(Class.objects.filter(name__in=wanted.keys()).values_list('name', 'id'))
+        missing = [name for name in wanted if name not in found]
+        if missing:
+            new_classes = []
+            for name in missing:
+                grade, school_id, school_name, province = wanted[name]
+                new_classes.append(Class(
+                    name=name,
+                    description="%s open class for %s" % (school_name, grade),
+                    province=province,
+                    type=Class.CT_OPEN,
+                    course=Class.get_or_create_grade_course(grade)))
+            try:
+                with transaction.atomic():
+                    Class.objects.bulk_create(new_classes)
+            except IntegrityError:
+                # some of them were created concurrently
+                for classs in new_classes:
+                    Class.objects.get_or_create(name=classs.name, defaults={
+                        'description': classs.description,
+                        'province': classs.province,
+                        'type': classs.type,
+                        'course': classs.course})
+            found.update(Class.objects.filter(name__in=missing).values_list('name', 'id'))
+
+        return dict(((wanted[name][1], wanted[name][0]), class_id) for name, class_id in found.items())
+
     def create_participant(self, learner):
         return Participant.objects.create(learner=learner,
                                           classs=self,
@@ -132,9 +204,13 @@ class Participant(models.Model):
 
     # Get the scenarios
     def get_scenarios(self, event, module, special_rule=False):
+        return Participant.get_course_scenarios(event, self.classs.course_id, module, special_rule=special_rule)
+
+    @staticmethod
+    def get_course_scenarios(event, course, module, special_rule=False):
         scenarios = GamificationScenario.objects.filter(
             event=event,
-            course=self.classs.course,
+            course=course,
             module=module)
 
         if scenarios.count() > 0:
@@ -143,7 +219,7 @@ class Participant(models.Model):
             # Fall back to a default rule
             scenarios = GamificationScenario.objects.filter(
                 event=event,
-                course=self.classs.course,
+                course=course,
                 module=None
             )
 
@@ -176,20 +252,22 @@ class Participant(models.Model):
             self.save()
 
     def answer_event(self, event, question, option):
-        # Create participant event question answer
-        answer = EventQuestionAnswer(
-            participant=self,
-            event=event,
-            question=question,
-            question_option=option,
-            correct=option.correct
-        )
-        answer.save()
+        with transaction.atomic():
+            # Create participant event question answer, which also moves the
+            # participant's EventParticipantProgress on
+            answer = EventQuestionAnswer(
+                participant=self,
+                event=event,
+                question=question,
+                question_option=option,
+                correct=option.correct
+            )
+            answer.save()
 
-        # Award points to participant if it's sumit
-        if event.type == Event.ET_SUMIT and option.correct:
-            self.points += question.points
-            self.save()
+            # Award points to participant if it's sumit
+            if event.type == Event.ET_SUMIT and option.correct:
+                self.points += question.points
+                self.save()
 
     def answer_redo(self, question, option):
         # Create participant question answer
@@ -208,25 +286,49 @@ class Participant(models.Model):
         answer.save()
 
     def can_take_event(self, event):
-        event_participant_rel = EventParticipantRel.objects.filter(event=event, participant=self).first()
+        return self.can_take_events([event])[event.id]
 
-        if event_participant_rel:
-            answered = EventQuestionAnswer.objects.filter(participant=self, event=event)\
-                .aggregate(Count('question'))['question__count']
-            total_questions = EventQuestionRel.objects.filter(event=event).\
-                aggregate(Count('question'))['question__count']
+    def can_take_events(self, events):
+        """
+        Returns a dict of (can take, EventParticipantRel) tuples, as returned by can_take_event, keyed by the
+        ids of the given events. Uses a query for the participant's rels, one for their answer counts and
+        the events' cached question totals.
+        """
+        events = list(events)
+        event_ids = [event.id for event in events]
+        rels = dict((rel.event_id, rel) for rel in EventParticipantRel.objects
+                    .filter(event_id__in=event_ids, participant=self)
+                    .order_by('-id'))
+        if not rels:
+            return dict((event_id, (True, None)) for event_id in event_ids)
+
+        answered = dict(EventQuestionAnswer.objects
+                        .filter(participant=self, event_id__in=rels.keys(), question__isnull=False)
+                        .order_by()
+                        .values_list('event')
+                        .annotate(Count('id')))
+        totals = Event.get_question_totals([event for event in events if event.id in rels])
+
+        result = {}
+        for event in events:
+            event_participant_rel = rels.get(event.id)
+            if event_participant_rel is None:
+                result[event.id] = (True, None)
+                continue
 
+            event_answered = answered.get(event.id, 0)
             if event.type != 0:
-                if event.number_sittings == 1 or event_participant_rel.results_received and answered >= total_questions:
-                    return None, event_participant_rel
+                if event.number_sittings == 1 or event_participant_rel.results_received and \
+                        event_answered >= totals[event.id]:
+                    result[event.id] = (None, event_participant_rel)
                 else:
-                    return True, event_participant_rel
+                    result[event.id] = (True, event_participant_rel)
             else:
-                if answered <= 15:
-                    return None, event_participant_rel
+                if event_answered <= 15:
+                    result[event.id] = (None, event_participant_rel)
                 else:
-                    return True, event_participant_rel
-        return True, None
+                    result[event.id] = (True, event_participant_rel)
+        return result
 
     # # Probably to be used in migrations
     def recalculate_total_points(self):
@@ -317,6 +419,58 @@ class Participant(models.Model):
 
         self.save()
 
+    @staticmethod
+    def award_scenario_to_participants(participant_ids, event, module, special_rule=False):
+        """
+        Awards a scenario's badges and point bonuses to many participants at once, following the rules of
+        award_scenario, and recalculates their total points. The module may be a Module or its id.
+        """
+        courses = {}
+        for participant_id, course_id in Participant.objects.filter(id__in=participant_ids) \
+                .values_list('id', 'classs__course'):
+            courses.setdefault(course_id, []).append(participant_id)
+
+        for course_id, ids in courses.items():
+            scenarios = Participant.get_course_scenarios(event, course_id, module, special_rule=special_rule)
+            for scenario in scenarios.select_related('point'):
+                # Badges may only be awarded once
+                if scenario.badge_id is None:
+                    continue
+
+                now = today()
+                existing = dict(ParticipantBadgeTemplateRel.objects
+                                .filter(participant_id__in=ids, badgetemplate_id=scenario.badge_id)
+                                .order_by('-id')
+                                .values_list('participant_id', 'id'))
+                new_ids = [participant_id for participant_id in ids if participant_id not in existing]
+                ParticipantBadgeTemplateRel.objects.bulk_create([
+                    ParticipantBadgeTemplateRel(participant_id=participant_id, badgetemplate_id=scenario.badge_id,
+                                                scenario=scenario, awarddate=now)
+                    for participant_id in new_ids])
+                awarded_ids = list(new_ids)
+                rel_ids = list(ParticipantBadgeTemplateRel.objects
+                               .filter(participant_id__in=new_ids, badgetemplate_id=scenario.badge_id)
+                               .values_list('id', flat=True))
+
+                if scenario.award_type == 2 and existing:
+                    ParticipantBadgeTemplateRel.objects.filter(id__in=existing.values()) \
+                        .update(awardcount=F('awardcount') + 1, awarddate=now)
+                    awarded_ids.extend(existing.keys())
+                    rel_ids.extend(existing.values())
+
+                if scenario.point_id is not None:
+                    ParticipantPointBonusRel.objects.bulk_create([
+                        ParticipantPointBonusRel(participant_id=participant_id, scenario=scenario,
+                                                 pointbonus_id=scenario.point_id, awarddate=now)
+                        for participant_id in awarded_ids])
+
+                BadgeAwardLog.objects.bulk_create([
+                    BadgeAwardLog(participant_badge_rel_id=rel_id, award_date=now) for rel_id in rel_ids])
+
+        # saved like award_scenario does, which also corrects any drift in the totals
+        for participant in Participant.objects.filter(id__in=participant_ids):
+            participant.recalculate_total_points()
+
     class Meta:
         verbose_name = "Participant"
         verbose_name_plural = "Participants"
@@ -365,6 +519,67 @@ class ParticipantQuestionAnswer(models.Model):
         self.participant.recalculate_total_points()
         super(ParticipantQuestionAnswer, self).delete()
 
+    @staticmethod
+    def answered_key(participant_id, *parts):
+        return 'core:answered_questions:%s' % ':'.join(unicode(part) for part in (participant_id,) + parts)
+
+    @staticmethod
+    def get_answered_version(participant_id):
+        return get_generation(ParticipantQuestionAnswer.answered_key(participant_id, 'version'))
+
+    @staticmethod
+    def get_answered_epoch(participant_id):
+        """
+        Returns a generation that's bumped when a participant's answers are changed or deleted rather than
+        added to, for state like core.question_selection's cursors that's only valid while answers are
+        added.
+        """
+        return get_generation(ParticipantQuestionAnswer.answered_key(participant_id, 'epoch'))
+
+    @staticmethod
+    def get_answered(participant_id):
+        """
+        Returns the participant's 'answered' and 'correct' question id sets. They're cached per version,
+        which every answer bumps, and rebuilt from the answers on a miss.
+        """
+        key = ParticipantQuestionAnswer.answered_key(participant_id,
+                                                     ParticipantQuestionAnswer.get_answered_version(participant_id))
+        state = cache.get(key)
+        if state is None:
+            state = {'answered': set(), 'correct': set()}
+            answers = ParticipantQuestionAnswer.objects \
+                .filter(participant_id=participant_id) \
+                .order_by() \
+                .values_list('question', 'correct') \
+                .distinct()
+            for question_id, correct in answers:
+                state['answered'].add(question_id)
+                if correct:
+                    state['correct'].add(question_id)
+            cache.add(key, state, ANSWERED_QUESTIONS_CACHE_TIMEOUT)
+        return state
+
+    @staticmethod
+    def record_answer(answer):
+        """
+        Bumps the version of the participant's answered questions and carries the previous version's
+        state forward with the new answer added. Each version's state is written once, so an answer
+        recorded concurrently leaves a version to be rebuilt rather than overwriting another answer.
+        """
+        version = bump_generation(ParticipantQuestionAnswer.answered_key(answer.participant_id, 'version'))
+        state = cache.get(ParticipantQuestionAnswer.answered_key(answer.participant_id, version - 1))
+        if state is not None:
+            state['answered'].add(answer.question_id)
+            if answer.correct:
+                state['correct'].add(answer.question_id)
+            cache.add(ParticipantQuestionAnswer.answered_key(answer.participant_id, version), state,
+                      ANSWERED_QUESTIONS_CACHE_TIMEOUT)
+
+    @staticmethod
+    def reset_answered(participant_id):
+        bump_generation(ParticipantQuestionAnswer.answered_key(participant_id, 'version'))
+        bump_generation(ParticipantQuestionAnswer.answered_key(participant_id, 'epoch'))
+
     class Meta:
         verbose_name = "Participant Question Response"
         verbose_name_plural = "Participant Question Responses"
@@ -388,18 +603,79 @@ class ParticipantRedoQuestionAnswer(models.Model):
         verbose_name_plural = "Participant Redo Question Responses"
 
 
+SETTINGS_CACHE_KEY = 'core:settings'
+SETTINGS_CACHE_TIMEOUT = getattr(settings, 'SETTINGS_CACHE_TIMEOUT', 60 * 60)
+TRUE_VALUES = ('1', 'true', 'yes', 'on')
+
+# the settings table as last seen by this process, checked before the shared
+# cache. Changes made in other processes are picked up once it times out.
+settings_cache = LRUCache(max_size=1, timeout=getattr(settings, 'SETTINGS_LOCAL_CACHE_TIMEOUT', 30))
+
+
+def get_setting_values():
+    values = settings_cache.get(SETTINGS_CACHE_KEY)
+    if values is None:
+        values = cache.get(SETTINGS_CACHE_KEY)
+        if values is None:
+            return Setting.preload()
+        settings_cache.set(SETTINGS_CACHE_KEY, values)
+    return values
+
+
+def invalidate_settings():
+    cache.delete(SETTINGS_CACHE_KEY)
+    settings_cache.clear()
+
+
 class Setting(models.Model):
     key = models.CharField("Key", max_length=50, blank=False, unique=True)
     value = models.TextField("Value", max_length=100, blank=False)
 
     @staticmethod
-    def get_setting(key):
-        setting = Setting.objects.filter(key__exact=key).first()
+    def preload():
+        """
+        Loads the whole settings table into the shared and process caches with one query.
+        """
+        values = dict(Setting.objects.values_list('key', 'value'))
+        cache.set(SETTINGS_CACHE_KEY, values, SETTINGS_CACHE_TIMEOUT)
+        settings_cache.set(SETTINGS_CACHE_KEY, values)
+        return values
 
-        if setting:
-            return setting.value
-        else:
-            return None
+    @staticmethod
+    def get_settings(*keys):
+        """
+        Returns a dict of the given settings that exist, or of all of them when no keys are given.
+        Settings are cached until one is saved or deleted.
+        """
+        values = get_setting_values()
+        if not keys:
+            return dict(values)
+        return dict((key, values[key]) for key in keys if key in values)
+
+    @staticmethod
+    def get_setting(key, default=None):
+        return get_setting_values().get(key, default)
+
+    @staticmethod
+    def get_int(key, default=None):
+        try:
+            return int(Setting.get_setting(key))
+        except (TypeError, ValueError):
+            return default
+
+    @staticmethod
+    def get_bool(key, default=False):
+        value = Setting.get_setting(key)
+        if value is None:
+            return default
+        return value.strip().lower() in TRUE_VALUES
+
+    @staticmethod
+    def get_json(key, default=None):
+        try:
+            return json.loads(Setting.get_setting(key))
+        except (TypeError, ValueError):
+            return default
 
 
 class TaskLogger(models.Model):
@@ -413,9 +689,166 @@ class TaskLogger(models.Model):
         verbose_name_plural = 'Task Logger'
 
 
+class GradeUpRun(models.Model):
+
+    """
+    Progress of a grade_up rollover, so a run that fails part of the way can
+    be resumed without promoting learners twice.
+    """
+    started_at = models.DateTimeField("Started", auto_now_add=True)
+    promoted = models.BooleanField("Learners Promoted", default=False)
+    last_learner_id = models.PositiveIntegerField("Last Enrolled Learner", default=0)
+    completed_at = models.DateTimeField("Completed", null=True, blank=True, db_index=True)
+
+    class Meta:
+        verbose_name = "Grade Up Run"
+        verbose_name_plural = "Grade Up Runs"
+
+
 class UnprocessedSchools(models.Model):
     learner = models.ForeignKey(Learner, null=True)
     province = models.CharField("Province", max_length=20, null=True, blank=True, choices=PROVINCE_CHOICES)
     date_added = models.DateTimeField("Date added", auto_now_add=True)
     suggested_name = models.CharField("Suggested name", max_length=30, blank=False)
     is_completed = models.BooleanField("Completed", default=False)
+
+
+@python_2_unicode_compatible
+class AirtimeEligibility(models.Model):
+
+    """
+    The number of questions a participant answered correctly in a week, which
+    is what airtime is awarded on. The current week is counted as answers come
+    in and each week is recomputed from the answers once it is over.
+    """
+    MIN_CORRECT = 12
+
+    week_start = models.DateField("Week Start", db_index=True)
+    participant = models.ForeignKey(Participant, verbose_name="Participant")
+    learner = models.ForeignKey(Learner, verbose_name="Learner")
+    correct = models.PositiveIntegerField("Correct Answers", default=0, db_index=True)
+    is_final = models.BooleanField("Final", default=False)
+
+    def __str__(self):
+        return u'%s %s' % (self.learner.username, self.week_start)
+
+    @staticmethod
+    def get_week_start(date):
+        if timezone.is_aware(date):
+            date = timezone.localtime(date)
+        return (date - timedelta(days=date.weekday())).date()
+
+    @staticmethod
+    def get_week_range(week_start):
+        start = datetime(week_start.year, week_start.month, week_start.day)
+        end = start + timedelta(days=6)
+        end = end.replace(hour=23, minute=59, second=59, microsecond=999999)
+        return [start, end]
+
+    @staticmethod
+    def previous_week_start():
+        return AirtimeEligibility.get_week_start(today()) - timedelta(weeks=1)
+
+    @staticmethod
+    def snapshot_week(week_start):
+        """
+        Recomputes the counts for a week from its correct answers.
+        """
+        week_range = AirtimeEligibility.get_week_range(week_start)
+        counts = ParticipantQuestionAnswer.objects.filter(
+            answerdate__range=week_range,
+            correct=True
+        ).values('participant', 'participant__learner').annotate(correct=Count('id'))
+        is_final = week_range[1] < today()
+
+        with transaction.atomic():
+            AirtimeEligibility.objects.filter(week_start=week_start).delete()
+            AirtimeEligibility.objects.bulk_create([
+                AirtimeEligibility(
+                    week_start=week_start,
+                    participant_id=row['participant'],
+                    learner_id=row['participant__learner'],
+                    correct=row['correct'],
+                    is_final=is_final)
+                for row in counts])
+        if is_final:
+            # marks the week as snapshotted even if nobody qualified, so it isn't recounted
+            cache.set(AIRTIME_SNAPSHOT_KEY % week_start, True, None)
+
+    @staticmethod
+    def record_answer(answer):
+        if not answer.correct or answer.answerdate is None:
+            return
+
+        week_start = AirtimeEligibility.get_week_start(answer.answerdate)
+        entries = AirtimeEligibility.objects.filter(week_start=week_start, participant_id=answer.participant_id)
+        if entries.update(correct=F('correct') + 1):
+            return
+
+        try:
+            with transaction.atomic():
+                AirtimeEligibility.objects.create(
+                    week_start=week_start,
+                    participant_id=answer.participant_id,
+                    learner_id=answer.participant.learner_id,
+                    correct=1)
+        except IntegrityError:
+            # created by a concurrent answer
+            entries.update(correct=F('correct') + 1)
+
+    @staticmethod
+    def get_eligible_learner_ids(week_start=None):
+        """
+        Returns the ids of the learners that qualify for airtime in the week,
+        by default the last full week. The week is snapshotted first if it
+        hasn't been since it ended.
+        """
+        if week_start is None:
+            week_start = AirtimeEligibility.previous_week_start()
+        entries = AirtimeEligibility.objects.filter(week_start=week_start)
+
+        week_end = AirtimeEligibility.get_week_range(week_start)[1]
+        if week_end < today() and not cache.get(AIRTIME_SNAPSHOT_KEY % week_start):
+            if entries.filter(is_final=True).exists():
+                cache.set(AIRTIME_SNAPSHOT_KEY % week_start, True, None)
+            else:
+                AirtimeEligibility.snapshot_week(week_start)
+
+        return entries.filter(correct__gte=AirtimeEligibility.MIN_CORRECT).values_list('learner', flat=True)
+
+    class Meta:
+        verbose_name = "Airtime Eligibility"
+        verbose_name_plural = "Airtime Eligibility"
+        unique_together = (('week_start', 'participant'),)
+
+
+@receiver(post_save, sender=ParticipantQuestionAnswer)
+def count_airtime_answer(sender, instance, created, **kwargs):
+    if created:
+        AirtimeEligibility.record_answer(instance)
+
+
+@receiver(post_save, sender=ParticipantQuestionAnswer)
+@receiver(post_delete, sender=ParticipantQuestionAnswer)
+def update_answered_questions(sender, instance, created=False, **kwargs):
+    if created:
+        ParticipantQuestionAnswer.record_answer(instance)
+    else:
+        # rebuilt from the remaining answers when next read
+        ParticipantQuestionAnswer.reset_answered(instance.participant_id)
+
+
+@receiver(post_save, sender=Class)
+@receiver(post_delete, sender=Class)
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+@receiver(post_save, sender=School)
+@receiver(post_delete, sender=School)
+def invalidate_class_resolver(sender, **kwargs):
+    invalidate_resolver()
+
+
+@receiver(post_save, sender=Setting)
+@receiver(post_delete, sender=Setting)
+def invalidate_setting_cache(sender, **kwargs):
+    invalidate_settings()
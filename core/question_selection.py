@@ -0,0 +1,119 @@
+"""
+Picks a participant's next question in a course according to the course's
+question order:
+
+Random
+    a random question the participant hasn't answered.
+Ordered
+    the first unanswered question in module and question order.
+Random Intelligent
+    a random question the participant hasn't answered and, once every
+    question has been answered, a random question they haven't answered
+    correctly yet.
+
+Questions come from the cached course content and the participant's answers
+from ParticipantQuestionAnswer.get_answered, so no queries are made once both
+are cached. Random picks sample the course's questions until an eligible one
+comes up and ordered picks resume from a cursor cached per participant, so a
+pick doesn't scan every question.
+"""
+import random
+from django.conf import settings
+from django.core.cache import cache
+from content.models import get_course_content, question_pool_key
+from core.models import ANSWERED_QUESTIONS_CACHE_TIMEOUT, ParticipantQuestionAnswer
+from mobileu.utils import LRUCache
+from organisation.models import Course, Module
+
+# random samples taken before the eligible questions are listed instead
+RANDOM_ATTEMPTS = 8
+
+# question sequences by course and module for the current content generation
+sequence_cache = LRUCache(getattr(settings, 'QUESTION_SEQUENCE_CACHE_SIZE', 500))
+
+
+def get_question_sequence(course_id, module_id=None):
+    """
+    Returns (key, ids, questions) where ids are the ids of the published questions of the course's
+    active normal modules, or of the given module, in order and questions is an {id: question} dict.
+    """
+    key = question_pool_key(course_id, 'sequence', module_id)
+    sequence = sequence_cache.get(key)
+    if sequence is None:
+        ids = []
+        questions = {}
+        for module in get_course_content(course_id):
+            if module_id is None:
+                if not module['is_active'] or module['type'] != Module.NORMAL:
+                    continue
+            elif module['id'] != module_id:
+                continue
+            for question in module['questions']:
+                ids.append(question['id'])
+                questions[question['id']] = question
+        sequence = (key, tuple(ids), questions)
+        sequence_cache.set(key, sequence)
+    return sequence
+
+
+def pick_random(ids, is_eligible, rng=random):
+    if not ids:
+        return None
+    for attempt in xrange(RANDOM_ATTEMPTS):
+        question_id = ids[rng.randrange(len(ids))]
+        if is_eligible(question_id):
+            return question_id
+
+    # most questions are ineligible
+    eligible = [candidate for candidate in ids if is_eligible(candidate)]
+    return rng.choice(eligible) if eligible else None
+
+
+def pick_ordered(ids, answered, start=0):
+    """
+    Returns the index of the first unanswered question from start, or len(ids) when all are answered.
+    """
+    index = start
+    while index < len(ids) and ids[index] in answered:
+        index += 1
+    return index
+
+
+def get_cursor_key(participant_id, sequence_key):
+    # questions before the cursor have all been answered, which holds until
+    # an answer is changed or deleted and the participant's epoch is bumped
+    epoch = ParticipantQuestionAnswer.get_answered_epoch(participant_id)
+    return 'core:question_cursor:%s:%s:%s' % (participant_id, epoch, sequence_key)
+
+
+def get_next_question(participant, course=None, module_id=None, rng=random):
+    """
+    Returns the participant's next question from the course's content as serialised by
+    content.models.get_course_content, or None when there are no questions left. The course defaults to
+    the participant's class's course.
+    """
+    if course is None:
+        course = participant.classs.course
+    key, ids, questions = get_question_sequence(course.id, module_id)
+    state = ParticipantQuestionAnswer.get_answered(participant.id)
+    answered = state['answered']
+
+    if course.question_order == Course.QO_ORDERED:
+        cursor_key = get_cursor_key(participant.id, key)
+        start = cache.get(cursor_key, 0)
+        index = pick_ordered(ids, answered, start)
+        if index != start:
+            cache.set(cursor_key, index, ANSWERED_QUESTIONS_CACHE_TIMEOUT)
+        question_id = ids[index] if index < len(ids) else None
+    else:
+        def is_unanswered(candidate):
+            return candidate not in answered
+
+        def is_not_answered_correctly(candidate):
+            return candidate not in state['correct']
+
+        question_id = pick_random(ids, is_unanswered, rng)
+        if question_id is None and course.question_order == Course.QO_RANDOM_INTELLIGENT:
+            question_id = pick_random(ids, is_not_answered_correctly, rng)
+
+    return questions.get(question_id)
@@ -1,6 +1,6 @@
 from djcelery import celery
 from datetime import datetime, timedelta
-from core.models import BadgeAwardLog, Setting
+from core.models import AirtimeEligibility, BadgeAwardLog, Setting
 from django.core.mail import EmailMultiAlternatives
 from django.db.models import Count
 
@@ -14,6 +14,10 @@ def get_this_week():
 
 @celery.task
 def weekly_badge_email():
+    to = Setting.get_setting("WEEKLY_BADGE_EMAIL")
+    if not to:
+        return
+
     week_range = get_this_week()
     results = BadgeAwardLog.objects.filter(award_date__range=week_range).\
         values("participant_badge_rel__participant__learner__first_name",
@@ -38,10 +42,15 @@ def weekly_badge_email():
     html_content += "</table></body></html>"
 
     subject = "dig-it Weekly Badge Earners %s - %s" % (week_range[0].date(), week_range[1].date())
-    to = Setting.objects.get(key="WEEKLY_BADGE_EMAIL").value
     from_email = "info@dig-it.me"
 
     text_content = 'This email contains a list of all the dig-it learners that earned badges this week.'
     msg = EmailMultiAlternatives(subject, text_content, from_email, [to])
     msg.attach_alternative(html_content, "text/html")
     msg.send()
+
+
+@celery.task
+def snapshot_airtime_eligibility():
+    # scheduled at the start of each week to finalise the week that just ended
+    AirtimeEligibility.snapshot_week(AirtimeEligibility.previous_week_start())
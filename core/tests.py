@@ -1,5 +1,6 @@
 from django.db.models import signals
 from django.contrib.auth.management import create_permissions
+from django.core.cache import cache
 from django.core.management import call_command
 from django.test import TestCase
 from django.test.runner import DiscoverRunner
@@ -7,9 +8,14 @@ from datetime import datetime
 from django.utils import timezone
 from auth.models import Learner
 from organisation.models import Course, Module, School, Organisation, CourseModuleRel
-from core.models import Participant, Class, ParticipantBadgeTemplateRel, ParticipantQuestionAnswer, Setting
+from core.models import AirtimeEligibility, Participant, Class, ParticipantBadgeTemplateRel, ParticipantQuestionAnswer, \
+    Setting, settings_cache
+from core.filters import LearnerFilter
+from core.question_selection import get_next_question, sequence_cache
+from mobileu.utils import bump_generation
 from gamification.models import GamificationBadgeTemplate, GamificationPointBonus, GamificationScenario
-from content.models import TestingQuestion, TestingQuestionOption
+from content.models import TestingQuestion, TestingQuestionOption, Event, EventParticipantRel, EventQuestionRel, \
+    EventQuestionAnswer
 import tablib
 from import_export import resources
 from auth.resources import LearnerResource
@@ -154,6 +160,28 @@ class TestMessage(TestCase):
             participant=self.participant)
         self.assertTrue(b.awarddate)
 
+    def test_award_scenario_to_participants(self):
+        learner2 = create_learner(self.school, username="+27123456788", mobile="+27123456788", country="country")
+        participant2 = create_participant(learner2, self.classs, datejoined=datetime.now())
+        self.scenario.award_type = 2
+        self.scenario.save()
+
+        Participant.award_scenario_to_participants(
+            [self.participant.id, participant2.id], 'test', self.module)
+
+        for participant in (self.participant, participant2):
+            participant = Participant.objects.get(id=participant.id)
+            self.assertEquals(5, participant.points)
+            self.assertEquals(5, participant.recalculate_total_points())
+            b = ParticipantBadgeTemplateRel.objects.get(participant=participant)
+            self.assertEquals(b.awardcount, 1)
+
+        # awarded again to participants that have the badge
+        Participant.award_scenario_to_participants([self.participant.id], 'test', self.module)
+        b = ParticipantBadgeTemplateRel.objects.get(participant=self.participant)
+        self.assertEquals(b.awardcount, 2)
+        self.assertEquals(5, Participant.objects.get(id=self.participant.id).points)
+
     def test_answer_question_correctly(self):
 
         # participant should have 0 points
@@ -439,7 +467,176 @@ class TestMessage(TestCase):
         self.assertEqual(count2, 50)
 
 
+class TestAutocompleteFilter(TestCase):
+    def setUp(self):
+        self.school = create_school('school name', create_organisation())
+        for i, name in enumerate(('Anna', 'Annie', 'Ben', 'Bob', 'Carl')):
+            create_learner(self.school, first_name=name, last_name='Smith', username='07200000%02d' % i,
+                           mobile='07200000%02d' % i)
+
+    def get_filter(self, params):
+        class PagedLearnerFilter(LearnerFilter):
+            page_size = 2
+
+        return PagedLearnerFilter(None, params, Participant, None)
+
+    def test_prefix_search(self):
+        lookups = self.get_filter({'id_q': 'ann'}).lookup_choices
+        self.assertEqual([label for _, label in lookups], ['Anna Smith', 'Annie Smith'])
+
+    def test_pagination(self):
+        first = self.get_filter({})
+        self.assertEqual([label for _, label in first.lookup_choices], ['Anna Smith', 'Annie Smith'])
+        self.assertTrue(first.has_next_page)
+
+        last = self.get_filter({'id_p': '3'})
+        self.assertEqual([label for _, label in last.lookup_choices], ['Carl Smith'])
+        self.assertFalse(last.has_next_page)
+
+    def test_selected_value_listed(self):
+        carl = Learner.objects.get(first_name='Carl')
+        lookups = self.get_filter({'id': str(carl.id)}).lookup_choices
+        self.assertEqual(lookups[0], (carl.id, 'Carl Smith'))
+        self.assertEqual(len(lookups), 3)
+
+    def test_no_matches(self):
+        learner_filter = self.get_filter({'id_q': 'zed'})
+        self.assertEqual(learner_filter.lookup_choices, [])
+        self.assertTrue(learner_filter.has_output())
+
+
+class TestAirtimeEligibility(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.course = create_course()
+        self.classs = create_class('class name', self.course)
+        self.school = create_school('school name', create_organisation())
+        self.module = create_module('module name', self.course)
+        self.question = create_test_question('question name', self.module)
+        self.option = create_test_question_option('option name', self.question)
+        self.learner = create_learner(self.school, mobile='0721234567', username='0721234567')
+        self.participant = create_participant(self.learner, self.classs)
+
+    def answer(self, count, answerdate, correct=True):
+        for i in xrange(count):
+            ParticipantQuestionAnswer.objects.create(participant=self.participant, question=self.question,
+                                                     option_selected=self.option, correct=correct,
+                                                     answerdate=answerdate)
+
+    def test_incremental_counts(self):
+        now = datetime.now()
+        self.answer(3, now)
+        self.answer(2, now, correct=False)
+        entry = AirtimeEligibility.objects.get(week_start=AirtimeEligibility.get_week_start(now))
+        self.assertEqual(entry.correct, 3)
+        self.assertEqual(entry.learner, self.learner)
+        self.assertFalse(entry.is_final)
+
+    def test_eligible_learners(self):
+        week_start = AirtimeEligibility.previous_week_start()
+        self.answer(AirtimeEligibility.MIN_CORRECT, AirtimeEligibility.get_week_range(week_start)[0])
+        self.assertEqual(list(AirtimeEligibility.get_eligible_learner_ids()), [self.learner.id])
+        self.assertTrue(AirtimeEligibility.objects.get(week_start=week_start).is_final)
+
+        # answers that bypass the signal are picked up when the week is recomputed
+        ParticipantQuestionAnswer.objects.filter(participant=self.participant).update(correct=False)
+        AirtimeEligibility.snapshot_week(week_start)
+        self.assertEqual(list(AirtimeEligibility.get_eligible_learner_ids()), [])
+
+    def test_empty_week_snapshotted_once(self):
+        self.assertEqual(list(AirtimeEligibility.get_eligible_learner_ids()), [])
+        # only the eligible learners are queried once the week has been snapshotted
+        with self.assertNumQueries(1):
+            self.assertEqual(list(AirtimeEligibility.get_eligible_learner_ids()), [])
+
+
+class TestQuestionSelection(TestCase):
+    def setUp(self):
+        cache.clear()
+        sequence_cache.clear()
+        self.course = create_course()
+        self.module = create_module('module name', self.course)
+        self.classs = create_class('class name', self.course)
+        self.organisation = create_organisation()
+        self.school = create_school('school name', self.organisation)
+        self.learner = create_learner(self.school, mobile="+27123456789", country="country")
+        self.participant = create_participant(self.learner, self.classs, datejoined=datetime.now())
+        self.questions = []
+        self.options = []
+        for i in range(1, 4):
+            question = create_test_question('question %d' % i, self.module, order=i,
+                                            state=TestingQuestion.PUBLISHED)
+            self.questions.append(question)
+            self.options.append(create_test_question_option('option %d' % i, question))
+        create_test_question('unpublished question', self.module)
+
+    def answer(self, i, correct=True):
+        ParticipantQuestionAnswer.objects.create(participant=self.participant, question=self.questions[i],
+                                                 option_selected=self.options[i], correct=correct)
+
+    def next_question_id(self):
+        question = get_next_question(self.participant, self.course)
+        return question['id'] if question else None
+
+    def test_ordered(self):
+        self.course.question_order = Course.QO_ORDERED
+        self.assertEquals(self.next_question_id(), self.questions[0].id)
+
+        self.answer(0)
+        self.answer(2)
+        with self.assertNumQueries(0):
+            self.assertEquals(self.next_question_id(), self.questions[1].id)
+
+        self.answer(1)
+        self.assertIsNone(self.next_question_id())
+
+    def test_concurrent_answers(self):
+        ParticipantQuestionAnswer.get_answered(self.participant.id)
+
+        # an answer saved elsewhere that has bumped the version but not carried the state forward yet
+        ParticipantQuestionAnswer.objects.bulk_create([ParticipantQuestionAnswer(
+            participant=self.participant, question=self.questions[0], option_selected=self.options[0],
+            correct=True)])
+        bump_generation(ParticipantQuestionAnswer.answered_key(self.participant.id, 'version'))
+
+        self.answer(1)
+        self.assertEquals(ParticipantQuestionAnswer.get_answered(self.participant.id)['answered'],
+                          set([self.questions[0].id, self.questions[1].id]))
+
+    def test_random(self):
+        self.course.question_order = Course.QO_RANDOM
+        self.assertIn(self.next_question_id(), [question.id for question in self.questions])
+
+        self.answer(0)
+        self.answer(1, correct=False)
+        self.assertEquals(self.next_question_id(), self.questions[2].id)
+
+        self.answer(2)
+        self.assertIsNone(self.next_question_id())
+
+        # answers are read from the database again when they're deleted
+        ParticipantQuestionAnswer.objects.filter(question=self.questions[0]).delete()
+        self.assertEquals(self.next_question_id(), self.questions[0].id)
+
+    def test_random_intelligent(self):
+        self.course.question_order = Course.QO_RANDOM_INTELLIGENT
+        self.answer(0)
+        self.answer(1, correct=False)
+        self.assertEquals(self.next_question_id(), self.questions[2].id)
+
+        # questions answered incorrectly come up again
+        self.answer(2)
+        self.assertEquals(self.next_question_id(), self.questions[1].id)
+
+        self.answer(1)
+        self.assertIsNone(self.next_question_id())
+
+
 class TestSettingMethods(TestCase):
+    def setUp(self):
+        cache.clear()
+        settings_cache.clear()
+
     def test_find_setting(self):
         setting = Setting.objects.create(key="TEST1", value="TestValue")
 
@@ -448,9 +645,46 @@ class TestSettingMethods(TestCase):
         self.assertIsNotNone(result)
         self.assertEquals(result, setting.value)
 
+    def test_typed_settings(self):
+        Setting.objects.create(key="INT", value="12")
+        Setting.objects.create(key="BOOL", value="True")
+        Setting.objects.create(key="JSON", value='{"grades": [10, 11]}')
+        Setting.objects.create(key="TEXT", value="TestValue")
+
+        self.assertEquals(Setting.get_int("INT"), 12)
+        self.assertEquals(Setting.get_int("TEXT", 5), 5)
+        self.assertEquals(Setting.get_int("MISSING", 5), 5)
+        self.assertTrue(Setting.get_bool("BOOL"))
+        self.assertFalse(Setting.get_bool("TEXT"))
+        self.assertTrue(Setting.get_bool("MISSING", True))
+        self.assertEquals(Setting.get_json("JSON"), {"grades": [10, 11]})
+        self.assertIsNone(Setting.get_json("TEXT"))
+        self.assertEquals(Setting.get_settings("INT", "TEXT", "MISSING"), {"INT": "12", "TEXT": "TestValue"})
+
+    def test_settings_cached(self):
+        setting = Setting.objects.create(key="TEST1", value="TestValue")
+        Setting.preload()
+
+        with self.assertNumQueries(0):
+            self.assertEquals(Setting.get_setting("TEST1"), "TestValue")
+            self.assertIsNone(Setting.get_setting("TEST2"))
+
+        # the process cache falls back to the shared cache
+        settings_cache.clear()
+        with self.assertNumQueries(0):
+            self.assertEquals(Setting.get_setting("TEST1"), "TestValue")
+
+        setting.value = "Changed"
+        setting.save()
+        self.assertEquals(Setting.get_setting("TEST1"), "Changed")
+
+        setting.delete()
+        self.assertIsNone(Setting.get_setting("TEST1"))
+
 
 class TestClassMethods(TestCase):
     def setUp(self):
+        cache.clear()
         gr10_course = create_course(GRADE_10_COURSE_NAME)
         gr11_course = create_course(GRADE_11_COURSE_NAME)
         gr12_course = create_course(GRADE_12_COURSE_NAME)
@@ -477,9 +711,22 @@ class TestClassMethods(TestCase):
         new_class = Class.get_or_create_class(Learner.GR_10, self.school)
         self.assertEqual(classs.id, new_class.id, 'Same class should be returned the second time.')
 
+    def test_get_or_create_class_cached(self):
+        classs = Class.get_or_create_class(Learner.GR_10, self.school)
+        with self.assertNumQueries(0):
+            self.assertEqual(Class.get_or_create_class(Learner.GR_10, self.school).id, classs.id)
+
+        # renaming the school invalidates the resolved classes
+        self.school.name = 'new school name'
+        self.school.save()
+        new_class = Class.get_or_create_class(Learner.GR_10, self.school)
+        self.assertNotEqual(new_class.id, classs.id)
+        self.assertEqual(new_class.name, 'new school name - ' + Learner.GR_10)
+
 
 class TestParticipantMethods(TestCase):
     def setUp(self):
+        cache.clear()
         gr10_course = create_course(GRADE_10_COURSE_NAME)
         self.module = create_module('module name', gr10_course)
         self.classs = create_class('class name', gr10_course)
@@ -517,3 +764,31 @@ class TestParticipantMethods(TestCase):
         self.assertEqual(level, 2)
         self.assertEqual(points_remaining, 47)
 
+    def test_can_take_events(self):
+        events = [Event.objects.create(name='event %d' % i,
+                                       course=self.classs.course,
+                                       activation_date=datetime.now(),
+                                       deactivation_date=datetime.now(),
+                                       number_sittings=Event.MULTIPLE,
+                                       type=Event.ET_EXAM)
+                  for i in range(3)]
+        question = create_test_question('event question', self.module)
+        option = create_test_question_option('event option', question)
+        for event in events:
+            EventQuestionRel.objects.create(order=1, event=event, question=question)
+
+        # one not started, one in progress and one done
+        EventParticipantRel.objects.create(event=events[1], participant=self.participant, sitting_number=1)
+        EventParticipantRel.objects.create(event=events[2], participant=self.participant, sitting_number=1,
+                                           results_received=True)
+        EventQuestionAnswer.objects.create(event=events[2], participant=self.participant, question=question,
+                                           question_option=option, correct=True)
+
+        expected = dict((event.id, self.participant.can_take_event(event)) for event in events)
+        self.assertEqual(expected[events[0].id], (True, None))
+        self.assertTrue(expected[events[1].id][0])
+        self.assertIsNone(expected[events[2].id][0])
+
+        # the question totals are cached
+        with self.assertNumQueries(2):
+            self.assertEqual(self.participant.can_take_events(events), expected)
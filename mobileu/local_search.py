@@ -0,0 +1,175 @@
+"""
+An in-process school search backend for deployments and test runs without
+ElasticSearch. Schools are loaded from the database into a trigram index,
+kept up to date by School signals in this process and reloaded after
+LOCAL_SCHOOL_SEARCH_TIMEOUT seconds to pick up changes made elsewhere.
+"""
+import re
+from threading import Lock
+from time import time
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.timezone import now
+from organisation.models import School, SchoolIndexChange
+
+MIN_SIMILARITY = 0.3
+
+
+def normalise(value):
+    return u' '.join(re.findall(r'\w+', (value or u'').lower(), re.UNICODE))
+
+
+def trigrams(value):
+    """
+    The trigrams of each word padded like pg_trgm does, so short words and
+    word starts still produce trigrams.
+    """
+    result = set()
+    for word in value.split():
+        padded = u'  %s ' % word
+        result.update(padded[i:i + 3] for i in xrange(len(padded) - 2))
+    return result
+
+
+class SchoolTrigramIndex(object):
+
+    def __init__(self):
+        self.lock = Lock()
+        self.loaded_at = None
+        self.schools = {}
+        self.postings = {}
+
+    def is_stale(self):
+        timeout = getattr(settings, 'LOCAL_SCHOOL_SEARCH_TIMEOUT', 300)
+        return self.loaded_at is None or self.loaded_at + timeout < time()
+
+    def load(self):
+        schools = {}
+        postings = {}
+        for school in School.objects.values('id', 'name', 'province'):
+            self._add(schools, postings, school)
+        with self.lock:
+            self.schools = schools
+            self.postings = postings
+            self.loaded_at = time()
+
+    def _add(self, schools, postings, school):
+        name = normalise(school['name'])
+        grams = trigrams(name)
+        schools[school['id']] = (school, name, grams)
+        for gram in grams:
+            postings.setdefault(gram, set()).add(school['id'])
+
+    def _remove(self, school_id):
+        entry = self.schools.pop(school_id, None)
+        if entry is not None:
+            for gram in entry[2]:
+                self.postings.get(gram, set()).discard(school_id)
+
+    def update(self, school):
+        with self.lock:
+            if self.loaded_at is None:
+                return
+            self._remove(school['id'])
+            self._add(self.schools, self.postings, school)
+
+    def remove(self, school_id):
+        with self.lock:
+            if self.loaded_at is not None:
+                self._remove(school_id)
+
+    def search(self, search, province):
+        """
+        Returns (score, school) pairs for the matching schools. Names that
+        start with the search or have words starting with each of its words
+        rank above names that are only similar.
+        """
+        if self.is_stale():
+            self.load()
+
+        province = (province or u'').lower()
+        query = normalise(search)
+        with self.lock:
+            if query:
+                query_grams = trigrams(query)
+                candidates = set()
+                for gram in query_grams:
+                    candidates.update(self.postings.get(gram, ()))
+                entries = [self.schools[school_id] for school_id in candidates]
+            else:
+                query_grams = None
+                entries = self.schools.values()
+
+        matches = []
+        for school, name, grams in entries:
+            if province and (school['province'] or u'').lower() != province:
+                continue
+            if query_grams is None:
+                matches.append((1.0, school))
+                continue
+
+            score = float(len(query_grams & grams)) / len(query_grams | grams)
+            words = name.split()
+            if name.startswith(query):
+                score += 1.0
+            elif all(any(word.startswith(part) for word in words) for part in query.split()):
+                score += 0.5
+            elif score < MIN_SIMILARITY:
+                continue
+            matches.append((score, school))
+        return matches
+
+
+school_trigram_index = SchoolTrigramIndex()
+
+
+class LocalSchoolIndex(object):
+
+    """
+    Implements the parts of SchoolIndex used to manage and search the school
+    index against school_trigram_index.
+    """
+
+    def ensure_index(self):
+        if school_trigram_index.is_stale():
+            school_trigram_index.load()
+
+    def update_index(self, update_time=None, delete_stale=False, index_name=None):
+        school_trigram_index.load()
+        return len(school_trigram_index.schools), []
+
+    def rebuild_index(self):
+        school_trigram_index.load()
+
+    def flush_changes(self, batch_size=500):
+        # the index is kept up to date by signals, so the tracked changes
+        # only need clearing
+        SchoolIndexChange.objects.filter(changed_at__lte=now()).delete()
+        return 0, []
+
+    def count(self):
+        self.ensure_index()
+        return len(school_trigram_index.schools)
+
+    def search_name(self, search=None, province=None, limit=10, offset=0):
+        limit = int(limit or 10)
+        offset = int(offset or 0)
+
+        matches = school_trigram_index.search(search, province)
+        matches.sort(key=lambda match: (-match[0], match[1]['name']))
+        return [{
+            '_id': unicode(school['id']),
+            '_score': score,
+            '_source': {'name': school['name'], 'province': school['province']},
+        } for score, school in matches[offset:offset + limit]]
+
+
+@receiver(post_save, sender=School)
+def update_local_school_index(sender, instance, **kwargs):
+    school_trigram_index.update({'id': instance.id, 'name': instance.name, 'province': instance.province})
+
+
+@receiver(post_delete, sender=School)
+def remove_from_local_school_index(sender, instance, **kwargs):
+    school_trigram_index.remove(instance.id)
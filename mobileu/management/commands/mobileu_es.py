@@ -1,7 +1,7 @@
 from optparse import make_option
 from django.core.management.base import BaseCommand
 from elasticsearch.exceptions import TransportError
-from mobileu.mobileu_elasticsearch import SchoolIndex
+from mobileu.mobileu_elasticsearch import get_school_index
 
 
 class Command(BaseCommand):
@@ -18,7 +18,7 @@ class Command(BaseCommand):
         if args[0] == 'ensure_indices':
             self.stdout.write('Ensuring indices exist... ', ending='')
             try:
-                SchoolIndex().ensure_index()
+                get_school_index().ensure_index()
                 self.stdout.write('done')
             except TransportError as e:
                 self.stdout.write('failed')
@@ -26,7 +26,15 @@ class Command(BaseCommand):
         elif args[0] == 'update':
             self.stdout.write('Updating indices... ', ending='')
             try:
-                SchoolIndex().update_index(delete_stale=options['delete_stale'])
+                get_school_index().update_index(delete_stale=options['delete_stale'])
+                self.stdout.write('done')
+            except TransportError as e:
+                self.stdout.write('failed')
+                self.stdout.write(e.message)
+        elif args[0] == 'flush':
+            self.stdout.write('Indexing changes... ', ending='')
+            try:
+                get_school_index().flush_changes()
                 self.stdout.write('done')
             except TransportError as e:
                 self.stdout.write('failed')
@@ -34,7 +42,7 @@ class Command(BaseCommand):
         elif args[0] == 'rebuild':
             self.stdout.write('Rebuilding indices... ', ending='')
             try:
-                SchoolIndex().rebuild_index()
+                get_school_index().rebuild_index()
                 self.stdout.write('done')
             except TransportError as e:
                 self.stdout.write('failed')
@@ -1,15 +1,47 @@
-from django.utils.timezone import now
+import calendar
+import logging
+from copy import deepcopy
+from datetime import datetime
+from time import sleep
+from django.utils.timezone import now, utc
 from django.conf import settings
 from elasticsearch import helpers as es_help, Elasticsearch
-from organisation.models import School
+from elasticsearch.exceptions import ConnectionError
+from mobileu.utils import LRUCache
+from organisation.models import School, SchoolIndexChange
+
+
+def get_version(timestamp):
+    """
+    External document version for a change made at timestamp, so an older
+    change never overwrites a newer one.
+    """
+    return calendar.timegm(timestamp.utctimetuple()) * 1000 + timestamp.microsecond // 1000
+
+
+logger = logging.getLogger(__name__)
+
+# the creation time suffix of versioned index names
+VERSION_FORMAT = '%Y%m%d%H%M%S%f'
 
 
 def ensure_indices():
-    school_idx = SchoolIndex()
+    school_idx = get_school_index()
     school_idx.ensure_index()
 
 
-class ElasticSearchIndex:
+def get_school_index():
+    """
+    Returns the school index for SCHOOL_SEARCH_BACKEND, 'elasticsearch' or
+    'local' for the in-process index in mobileu.local_search.
+    """
+    if getattr(settings, 'SCHOOL_SEARCH_BACKEND', 'elasticsearch') == 'local':
+        from mobileu.local_search import LocalSchoolIndex
+        return LocalSchoolIndex()
+    return SchoolIndex()
+
+
+class ElasticSearchIndex(object):
     base_index_name = None
     index_name = None
 
@@ -20,17 +52,59 @@ class ElasticSearchIndex:
         else:
             self.index_name = self.base_index_name
 
+    def get_index_body(self):
+        """
+        Settings and mappings used to create a version of the index.
+        """
+        return {}
+
+    def get_versions(self):
+        """
+        Returns the names of the versioned indices behind the index alias.
+        """
+        return sorted(self.es.indices.get(index='%s-*' % self.index_name).keys())
+
+    def get_version_created(self, name):
+        return datetime.strptime(name[len(self.index_name) + 1:], VERSION_FORMAT).replace(tzinfo=utc)
+
+    def get_rebuild_start(self):
+        """
+        Returns when the oldest version that's being loaded and isn't behind
+        the alias yet was created, or None when no rebuild is running.
+        Versions older than ELASTICSEARCH_REBUILD_TIMEOUT seconds were left by
+        rebuilds that died and are ignored.
+        """
+        if not self.es.indices.exists_alias(name=self.index_name):
+            return None
+        live = set(self.es.indices.get_alias(name=self.index_name).keys())
+        timeout = getattr(settings, 'ELASTICSEARCH_REBUILD_TIMEOUT', 60 * 60 * 6)
+        started = [created for created in (self.get_version_created(name) for name in self.get_versions()
+                                           if name not in live)
+                   if (now() - created).total_seconds() < timeout]
+        return min(started) if started else None
+
+    def create_version(self, **index_settings):
+        name = '%s-%s' % (self.index_name, now().strftime(VERSION_FORMAT))
+        body = deepcopy(self.get_index_body())
+        body.setdefault('settings', {}).setdefault('index', {}).update(index_settings)
+        self.es.indices.create(name, body=body)
+        return name
+
     def ensure_index(self):
         if not self.index_name:
             raise AssertionError('Index name not set.')
 
         if not self.es.indices.exists(self.index_name):
-            self.es.indices.create(self.index_name)
+            self.es.indices.put_alias(index=self.create_version(), name=self.index_name)
 
     def delete_index(self):
         if not self.index_name:
             raise AssertionError('Index name not set.')
 
+        for name in self.get_versions():
+            self.es.indices.delete(name)
+
+        # indices created before the alias was introduced
         if self.es.indices.exists(self.index_name):
             self.es.indices.delete(self.index_name)
 
@@ -48,68 +122,340 @@ class ElasticSearchIndex:
     def exists(self):
         return self.es.exists(index=self.index_name)
 
-    def update_index(self, update_time=None, delete_stale=False):
-        raise NotImplementedError('update_index must be implemented.')
+    def get_queryset(self):
+        """
+        Returns a values() queryset of the rows to index, including their id.
+        """
+        raise NotImplementedError('get_queryset must be implemented.')
 
-    def rebuild_index(self):
-        self.delete_index()
-        self.ensure_index()
-        self.update_index()
+    def get_document(self, row):
+        raise NotImplementedError('get_document must be implemented.')
 
+    def get_action(self, row, update_time, version, index_name=None):
+        action = {
+            '_id': row['id'],
+            '_index': index_name or self.index_name,
+            '_op_type': 'index',
+            '_type': 'document',
+            '_version': version,
+            '_version_type': 'external',
+            'date_updated': update_time,
+        }
+        action.update(self.get_document(row))
+        return action
 
-class SchoolIndex(ElasticSearchIndex):
-    base_index_name = 'school'
+    def get_delete_action(self, object_id, version, index_name=None):
+        return {
+            '_id': object_id,
+            '_index': index_name or self.index_name,
+            '_op_type': 'delete',
+            '_type': 'document',
+            '_version': version,
+            '_version_type': 'external',
+        }
+
+    def send_bulk(self, actions):
+        """
+        Sends actions to ElasticSearch in chunks, over several connections when
+        ELASTICSEARCH_BULK_THREAD_COUNT is more than one, and returns the number
+        of successful actions, the failures and the ids of the documents
+        rejected because the cluster was too busy.
+
+        Version conflicts (a newer version is already indexed) and deletes of
+        missing documents are neither successes nor failures.
+        """
+        chunk_size = getattr(settings, 'ELASTICSEARCH_BULK_CHUNK_SIZE', 500)
+        thread_count = getattr(settings, 'ELASTICSEARCH_BULK_THREAD_COUNT', 4)
+        if thread_count > 1:
+            results = es_help.parallel_bulk(self.es, actions, thread_count=thread_count, chunk_size=chunk_size,
+                                            raise_on_error=False, raise_on_exception=False)
+        else:
+            results = es_help.streaming_bulk(self.es, actions, chunk_size=chunk_size,
+                                             raise_on_error=False, raise_on_exception=False)
+
+        num_successful = 0
+        errors = []
+        rejected_ids = []
+        for ok, result in results:
+            op_type, item = result.items()[0]
+            status = item.get('status')
+            if ok:
+                num_successful += 1
+            elif status == 409 or (op_type == 'delete' and status == 404):
+                continue
+            elif status == 429:
+                rejected_ids.append(item['_id'])
+            else:
+                errors.append({
+                    'id': item.get('_id'),
+                    'op_type': op_type,
+                    'status': status,
+                    'error': item.get('error', item.get('exception')),
+                })
+        return num_successful, errors, rejected_ids
+
+    def load(self, queryset, update_time, index_name=None):
+        """
+        Streams the rows of the queryset into the index. Documents the cluster
+        rejects are reloaded and sent again with exponential backoff, up to
+        ELASTICSEARCH_BULK_MAX_RETRIES times.
+        """
+        version = get_version(update_time)
+        max_retries = getattr(settings, 'ELASTICSEARCH_BULK_MAX_RETRIES', 3)
+        backoff = getattr(settings, 'ELASTICSEARCH_BULK_INITIAL_BACKOFF', 2)
 
-    def update_index(self, update_time=now(), delete_stale=False):
-        update_gen = ({
-                '_id': school.pk,
-                '_index': self.index_name,
-                '_op_type': 'index',
-                '_type': 'document',
-                'date_updated': update_time,
-                'name': school.name,
-                'province': school.province,
-            } for school in School.objects.all())
+        num_successful, errors, rejected_ids = self.send_bulk(
+            self.get_action(row, update_time, version, index_name) for row in queryset.iterator())
 
-        num_successful, errors = es_help.bulk(self.es, update_gen)
+        for attempt in xrange(max_retries):
+            if not rejected_ids:
+                break
+            logger.warning('%s: retrying %d rejected documents in %ss' % (self.index_name, len(rejected_ids), backoff))
+            sleep(backoff)
+            backoff *= 2
 
+            success, retry_errors, rejected_ids = self.send_bulk(
+                self.get_action(row, update_time, version, index_name)
+                for row in queryset.filter(id__in=rejected_ids).iterator())
+            num_successful += success
+            errors.extend(retry_errors)
+
+        errors.extend({'id': object_id, 'op_type': 'index', 'status': 429, 'error': 'rejected'}
+                      for object_id in rejected_ids)
         if errors:
-            pass
+            logger.error('%s: %d documents failed to index' % (self.index_name, len(errors)))
+        return num_successful, errors
+
+    def update_index(self, update_time=None, delete_stale=False, index_name=None):
+        if update_time is None:
+            update_time = now()
+
+        num_successful, errors = self.load(self.get_queryset(), update_time, index_name)
 
         if delete_stale:
-            self.es.delete_by_query(self.index_name,
+            self.es.delete_by_query(index_name or self.index_name,
                                     {'query': {'range': {'date_updated': {'lt': update_time.isoformat()}}}})
 
         return num_successful, errors
 
-    def search_name(self, search=None, province=None, limit=10):
-        results = None
-
-        if search and province:
-            results = self.es.search(index=self.index_name,
-                                     body={'query': {'bool': {'must': {'match': {'name': {'query': search,
-                                                                                          'boost': 1.0,
-                                                                                          'fuzziness': 'AUTO'}}},
-                                                              'filter': {'match': {'province': province}}}}})
-        elif search:
-            results = self.es.search(index=self.index_name,
-                                     body={'query': {'match': {'name': {'query': search,
-                                                                        'boost': 1.0,
-                                                                        'fuzziness': 'AUTO'}}}})
+    def apply_changes_since(self, since, index_name):
+        """
+        Writes the changes tracked since the given time to the named version.
+        Indices that track changes override this so a rebuilt version doesn't
+        miss changes made while it was loading.
+        """
+        pass
+
+    def rebuild_index(self):
+        """
+        Loads a new version of the index and then atomically points the alias
+        at it, so searches use the current version until the new one is ready.
+        Changes made since the version was created are applied to it before
+        the alias moves. Older versions are deleted once the alias has moved.
+        """
+        if not self.index_name:
+            raise AssertionError('Index name not set.')
+
+        # refreshing and replicating while bulk loading only slows the load down
+        name = self.create_version(refresh_interval='-1', number_of_replicas=0)
+        try:
+            self.update_index(index_name=name)
+            self.apply_changes_since(self.get_version_created(name), name)
+            self.es.indices.put_settings(index=name, body={'index': {
+                'refresh_interval': getattr(settings, 'ELASTICSEARCH_REFRESH_INTERVAL', '1s'),
+                'number_of_replicas': getattr(settings, 'ELASTICSEARCH_NUMBER_OF_REPLICAS', 1),
+            }})
+            self.es.indices.refresh(index=name)
+        except Exception:
+            self.es.indices.delete(name)
+            raise
+
+        actions = [{'add': {'index': name, 'alias': self.index_name}}]
+        if self.es.indices.exists_alias(name=self.index_name):
+            actions = [{'remove': {'index': index, 'alias': self.index_name}}
+                       for index in self.es.indices.get_alias(name=self.index_name).keys()] + actions
+        elif self.es.indices.exists(self.index_name):
+            # an index created before the alias was introduced has to make way for it
+            self.es.indices.delete(self.index_name)
+        self.es.indices.update_aliases(body={'actions': actions})
+
+        for old_name in self.get_versions():
+            if old_name != name:
+                self.es.indices.delete(old_name)
+
+
+class SchoolIndex(ElasticSearchIndex):
+    base_index_name = 'school'
+    search_cache = LRUCache(max_size=getattr(settings, 'ELASTICSEARCH_SEARCH_CACHE_SIZE', 1000),
+                            timeout=getattr(settings, 'ELASTICSEARCH_SEARCH_CACHE_TIMEOUT', 60))
+
+    def get_index_body(self):
+        # name.autocomplete holds the edge n-grams of each word so partly
+        # typed names match without fuzzy queries
+        return {
+            'settings': {
+                'analysis': {
+                    'filter': {
+                        'autocomplete_filter': {'type': 'edge_ngram', 'min_gram': 1, 'max_gram': 20},
+                    },
+                    'analyzer': {
+                        'autocomplete': {
+                            'type': 'custom',
+                            'tokenizer': 'standard',
+                            'filter': ['lowercase', 'autocomplete_filter'],
+                        },
+                    },
+                },
+            },
+            'mappings': {
+                'document': {
+                    'properties': {
+                        'date_updated': {'type': 'date'},
+                        'name': {
+                            'type': 'text',
+                            'fields': {
+                                'autocomplete': {
+                                    'type': 'text',
+                                    'analyzer': 'autocomplete',
+                                    'search_analyzer': 'standard',
+                                },
+                                'raw': {'type': 'keyword'},
+                            },
+                        },
+                        'province': {
+                            'type': 'text',
+                            'fields': {'raw': {'type': 'keyword'}},
+                        },
+                    },
+                },
+            },
+        }
+
+    def get_search_body(self, search, province, limit, offset):
+        if search:
+            query = {'bool': {
+                'should': [
+                    {'match': {'name.autocomplete': {'query': search, 'operator': 'and'}}},
+                    {'match': {'name': {'query': search, 'boost': 1.0, 'fuzziness': 'AUTO'}}},
+                ],
+                'minimum_should_match': 1,
+            }}
+            if province:
+                query['bool']['filter'] = {'match': {'province': province}}
         elif province:
-            results = self.es.search(index=self.index_name,
-                                     body={'query': {'match': {'province': province}}})
+            query = {'match': {'province': province}}
         else:
-            results = self.es.search(index=self.index_name,
-                                     body={'query': {'match_all': {}}})
+            query = {'match_all': {}}
 
-        if limit:
-            results['from'] = 0
-            results['size'] = limit
+        return {
+            'query': query,
+            'from': offset,
+            'size': limit,
+            'sort': ['_score', {'name.raw': {'order': 'asc', 'unmapped_type': 'keyword'}}],
+            '_source': ['name', 'province'],
+        }
 
-        results['sort'] = '_score'
+    def update_index(self, update_time=None, delete_stale=False, index_name=None):
+        result = super(SchoolIndex, self).update_index(update_time, delete_stale, index_name)
+        self.search_cache.clear()
+        return result
 
-        while type(results) == dict and results.get('hits', None) is not None:
-            results = results.pop('hits', None)
+    def get_queryset(self):
+        return School.objects.values('id', 'name', 'province')
+
+    def get_document(self, school):
+        return {
+            'name': school['name'],
+            'province': school['province'],
+        }
+
+    def index_changes(self, changes, update_time, index_name=None):
+        """
+        Writes the given (id, school_id, changed_at) changes to the index and
+        returns the number of successful actions, the failures and the ids of
+        the schools that didn't index.
+        """
+        versions = dict((school_id, get_version(changed_at)) for _, school_id, changed_at in changes)
+
+        actions = []
+        for school in self.get_queryset().filter(id__in=versions.keys()):
+            actions.append(self.get_action(school, update_time, versions.pop(school['id']), index_name))
+        # whatever is left has been deleted
+        for school_id, version in versions.items():
+            actions.append(self.get_delete_action(school_id, version, index_name))
+
+        num_successful, errors, rejected_ids = self.send_bulk(actions)
+        failed_ids = set(int(school_id) for school_id in rejected_ids)
+        failed_ids.update(int(error['id']) for error in errors if error['id'] is not None)
+        return num_successful, errors, failed_ids
+
+    def iter_changes(self, changes, batch_size=500):
+        last_id = 0
+        while True:
+            batch = list(changes.filter(id__gt=last_id).order_by('id')
+                         .values_list('id', 'school_id', 'changed_at')[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1][0]
+            yield batch
+
+    def apply_changes_since(self, since, index_name, batch_size=500):
+        update_time = now()
+        for changes in self.iter_changes(SchoolIndexChange.objects.filter(changed_at__gte=since), batch_size):
+            self.index_changes(changes, update_time, index_name)
+
+    def flush_changes(self, batch_size=500):
+        """
+        Writes the schools saved or deleted since they were last flushed to
+        the index. Changes that fail to index are kept for the next run, as
+        are changes made since a running rebuild created its version, which
+        the rebuild applies to that version before it goes live.
+        """
+        update_time = now()
+        pending = SchoolIndexChange.objects.filter(changed_at__lte=update_time)
+        done = pending
+        rebuild_start = self.get_rebuild_start()
+        if rebuild_start is not None:
+            done = done.filter(changed_at__lt=rebuild_start)
+        num_successful = 0
+        errors = []
+
+        for changes in self.iter_changes(pending, batch_size):
+            success, batch_errors, failed_ids = self.index_changes(changes, update_time)
+            num_successful += success
+            errors.extend(batch_errors)
+
+            done.filter(id__in=[change_id for change_id, school_id, _ in changes if school_id not in failed_ids]) \
+                .delete()
+
+        self.search_cache.clear()
+        return num_successful, errors
+
+    def search_name(self, search=None, province=None, limit=10, offset=0):
+        """
+        Returns the hits for schools whose name matches search, as typed so
+        far or misspelt, optionally limited to a province. Results are cached
+        per (search, province, page) for ELASTICSEARCH_SEARCH_CACHE_TIMEOUT
+        seconds.
+        """
+        search = (search or '').strip().lower() or None
+        province = province or None
+        limit = int(limit or 10)
+        offset = int(offset or 0)
+
+        key = (search, province, limit, offset)
+        hits = self.search_cache.get(key)
+        if hits is None:
+            try:
+                results = self.es.search(index=self.index_name,
+                                         body=self.get_search_body(search, province, limit, offset))
+            except ConnectionError:
+                if not getattr(settings, 'SCHOOL_SEARCH_FALLBACK', True):
+                    raise
+                logger.warning('ElasticSearch unavailable, searching schools locally')
+                from mobileu.local_search import LocalSchoolIndex
+                return LocalSchoolIndex().search_name(search, province, limit, offset)
+            hits = results['hits']['hits']
+            self.search_cache.set(key, hits)
+        return list(hits)
 
-        return results
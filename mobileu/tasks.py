@@ -6,17 +6,21 @@ from auth.models import Learner
 
 from content.models import SUMit
 
-from core.models import Class, Participant
+from core.models import Class, GradeUpRun, Participant
+
+from django.conf import settings
 
 from django.core.mail import mail_managers
 
 from django.core.management import call_command
 
+from django.db import transaction
+
 from djcelery import celery
 
 from teacher_report import send_teacher_reports_body
 
-from mobileu_elasticsearch import SchoolIndex
+from mobileu_elasticsearch import get_school_index
 
 logger = logging.getLogger(__name__)
 
@@ -61,35 +65,95 @@ def send_sumit_counts_body():
 
 @celery.task
 def run_elasticsearch_update(delete_stale=False):
-    SchoolIndex().ensure_index()
-    SchoolIndex().update_index(delete_stale=delete_stale)
+    get_school_index().ensure_index()
+    get_school_index().update_index(delete_stale=delete_stale)
+
+
+@celery.task
+def run_elasticsearch_flush():
+    get_school_index().ensure_index()
+    get_school_index().flush_changes()
 
 
 @celery.task
 def run_elasticsearch_rebuild():
-    SchoolIndex().ensure_index()
-    SchoolIndex().rebuild_index()
+    get_school_index().rebuild_index()
 
 
 @celery.task
-def grade_up():
-    grade_up_body()
+def grade_up(resume=False):
+    grade_up_body(resume)
 
 
-def grade_up_body():
+def grade_up_body(resume=False):
+    """
+    Promotes learners a grade and enrols them in their new grade's class. A
+    run that didn't complete is resumed rather than promoting learners again
+    if it started within GRADE_UP_RESUME_DAYS, or whenever resume is True.
+    Older incomplete runs are closed and a new run is started.
+    """
     valid_grades = ['Grade 10', 'Grade 11', 'Grade 12', 'Graduate']
 
-    # set i to 2nd last index
-    i = (len(valid_grades) - 1) - 1
-    while i >= 0:
-        grade = valid_grades[i]
-        old_participants = Participant.objects.filter(learner__grade=grade, is_active=True)
-        old_participants.update(is_active=False)
-        learners = Learner.objects.filter(grade=grade, is_active=True)
-        learners.update(grade=valid_grades[i+1])
-        i -= 1
-
-    for grade in valid_grades[:-1]:
-        learners = Learner.objects.filter(grade=grade, is_active=True)
-        for learner in learners:
-            Class.get_or_create_class(grade, learner.school).create_participant(learner)
+    incomplete = GradeUpRun.objects.filter(completed_at__isnull=True)
+    if not resume:
+        window_start = datetime.now() - timedelta(days=getattr(settings, 'GRADE_UP_RESUME_DAYS', 7))
+        stale = incomplete.filter(started_at__lt=window_start)
+        if stale.exists():
+            logger.warning("Closing grade up runs started before %s without resuming them" % window_start)
+            stale.update(completed_at=datetime.now())
+    run = incomplete.order_by('-id').first()
+    if run is None:
+        run = GradeUpRun.objects.create()
+
+    if not run.promoted:
+        with transaction.atomic():
+            # set i to 2nd last index
+            i = (len(valid_grades) - 1) - 1
+            while i >= 0:
+                grade = valid_grades[i]
+                old_participants = Participant.objects.filter(learner__grade=grade, is_active=True)
+                old_participants.update(is_active=False)
+                learners = Learner.objects.filter(grade=grade, is_active=True)
+                learners.update(grade=valid_grades[i+1])
+                i -= 1
+
+            run.promoted = True
+            run.save()
+
+    enrol_promoted_learners(run, valid_grades[:-1])
+
+    run.completed_at = datetime.now()
+    run.save()
+
+
+def enrol_promoted_learners(run, grades):
+    """
+    Adds learners in the given grades without an active participant to the
+    open class for their school and grade, in chunks of GRADE_UP_CHUNK_SIZE.
+    Each chunk is committed along with the run's checkpoint.
+    """
+    chunk_size = getattr(settings, 'GRADE_UP_CHUNK_SIZE', 1000)
+    learners = Learner.objects.filter(grade__in=grades, is_active=True, school__isnull=False)\
+        .exclude(participant__is_active=True)\
+        .order_by('id')
+    classes = {}
+
+    while True:
+        rows = list(learners.filter(id__gt=run.last_learner_id)
+                    .values_list('id', 'grade', 'school', 'school__name', 'school__province')[:chunk_size])
+        if not rows:
+            break
+
+        needed = set((grade, school_id, school_name, province)
+                     for _, grade, school_id, school_name, province in rows
+                     if (school_id, grade) not in classes)
+        if needed:
+            classes.update(Class.get_or_create_classes(needed))
+
+        joined = datetime.now()
+        with transaction.atomic():
+            Participant.objects.bulk_create([
+                Participant(learner_id=learner_id, classs_id=classes[(school_id, grade)], datejoined=joined)
+                for learner_id, grade, school_id, _, _ in rows])
+            run.last_learner_id = rows[-1][0]
+            run.save()
@@ -1,9 +1,10 @@
 # -*- coding: utf-8 -*-
 from time import sleep
+from mock import patch
 from django.test import TestCase
 from django.test.utils import override_settings
 
-from organisation.models import Organisation, School
+from organisation.models import Organisation, School, SchoolIndexChange
 from .mobileu_elasticsearch import SchoolIndex
 
 
@@ -24,6 +25,7 @@ class TestSchoolIndex(TestCase):
         try:
             self.school_index = SchoolIndex()
             self.school_index.ensure_index()
+            SchoolIndex.search_cache.clear()
         except Exception as e:
             self.skipTest('ElasticSearch not available.')
             return
@@ -42,6 +44,19 @@ class TestSchoolIndex(TestCase):
         sleep(1)
         self.assertEqual(self.school_index.count(), School.objects.count())
 
+    @patch('mobileu.mobileu_elasticsearch.sleep')
+    def test_update_retries_rejected(self, mock_sleep):
+        schools = [create_school('School %i' % (i,), self.organisation, province='Gauteng') for i in xrange(3)]
+
+        with patch.object(SchoolIndex, 'send_bulk', side_effect=[(2, [], [schools[0].id]), (1, [], [])]) as send:
+            num_successful, errors = self.school_index.update_index()
+
+        self.assertEqual(num_successful, 3)
+        self.assertEqual(errors, [])
+        self.assertEqual(mock_sleep.call_count, 1)
+        retried = list(send.call_args_list[1][0][0])
+        self.assertEqual([action['_id'] for action in retried], [schools[0].id])
+
     def test_rebuild(self):
         num_schools = 10
         for i in xrange(num_schools):
@@ -50,10 +65,32 @@ class TestSchoolIndex(TestCase):
         self.school_index.rebuild_index()
         sleep(1)
         self.assertEqual(self.school_index.count(), School.objects.count())
+        first_version = self.school_index.get_versions()
         self.school_index.rebuild_index()
         sleep(1)
         self.assertEqual(self.school_index.count(), School.objects.count())
 
+        # the alias moved to a new version and the old one was cleaned up
+        versions = self.school_index.get_versions()
+        self.assertEqual(len(versions), 1)
+        self.assertNotEqual(versions, first_version)
+        self.assertEqual(self.school_index.es.indices.get_alias(name=self.school_index.index_name).keys(), versions)
+
+    def test_flush_changes(self):
+        schools = [create_school('School %i' % (i,), self.organisation, province='Gauteng') for i in xrange(10)]
+
+        self.school_index.flush_changes()
+        sleep(1)
+        self.assertEqual(self.school_index.count(), School.objects.count())
+        self.assertFalse(SchoolIndexChange.objects.exists())
+
+        schools[0].delete()
+        num_successful, errors = self.school_index.flush_changes()
+        sleep(1)
+        self.assertEqual(num_successful, 1)
+        self.assertEqual(errors, [])
+        self.assertEqual(self.school_index.count(), School.objects.count())
+
     def test_search(self):
         num_schools = 10
         for i in xrange(num_schools):
@@ -81,3 +118,17 @@ class TestSchoolIndex(TestCase):
         self.assertGreaterEqual(len(results), 1)
         self.assertEqual(results[0]['_source']['name'], 'FREEDOM')
 
+        # test limit and partly typed names
+        results = self.school_index.search_name(search='Scho', limit=3)
+        self.assertEqual(len(results), 3)
+        self.assertTrue(all(r['_source']['name'].startswith('School') for r in results))
+
+    def test_search_cached(self):
+        create_school('FREEDOM', self.organisation, province='Western Cape')
+        self.school_index.update_index()
+        sleep(1)
+
+        results = self.school_index.search_name(search='free')
+        with patch.object(self.school_index.es, 'search') as search:
+            self.assertEqual(self.school_index.search_name(search='Free '), results)
+            self.assertFalse(search.called)
@@ -1,9 +1,11 @@
 # -*- coding: utf-8 -*-
 from django.test import TestCase
+from django.test.utils import override_settings
 from django.contrib.auth import get_user_model
 from django.test.client import Client
 from django.utils import timezone
-from utils import format_option, format_content
+from utils import format_option, format_content, format_many, format_cache, LRUCache
+from local_search import LocalSchoolIndex, school_trigram_index
 from communication.models import ChatMessage, Discussion, PostComment, ChatGroup, Post, CoursePostRel
 from organisation.models import Course, Organisation
 from auth.models import CustomUser
@@ -12,8 +14,8 @@ import math
 from mock import Mock, patch, mock_open, call, ANY, DEFAULT
 import mobileu.teacher_report as teacher_report
 from mobileu.tasks import grade_up_body
-from core.models import Class, Teacher, TeacherClass, TestingQuestion, TestingQuestionOption, Learner, Participant, \
-    ParticipantQuestionAnswer
+from core.models import Class, GradeUpRun, Teacher, TeacherClass, TestingQuestion, TestingQuestionOption, Learner, \
+    Participant, ParticipantQuestionAnswer
 from organisation.models import Course, CourseModuleRel, Module, School
 from settings import GRADE_10_COURSE_NAME, GRADE_11_COURSE_NAME, GRADE_12_COURSE_NAME
 
@@ -134,6 +136,85 @@ class TestContent(TestCase):
         output = format_option(content)
         self.assertEquals(output, u'Zoë')
 
+    def test_format_cached(self):
+        format_cache.clear()
+        content = '<img style="width:300px"/>'
+        result = format_content(content)
+        self.assertEquals(len(format_cache), 1)
+        self.assertIs(format_content(content), result)
+        self.assertEquals(len(format_cache), 1)
+
+        # options are cached separately
+        format_option(content)
+        self.assertEquals(len(format_cache), 2)
+
+    def test_format_many(self):
+        format_cache.clear()
+        contents = ["<p><b>Test</b></p>", '<img style="width:60px"/>', "<p><b>Test</b></p>"]
+        self.assertEquals(format_many(contents), [format_content(content) for content in contents])
+        self.assertEquals(len(format_cache), 2)
+        self.assertEquals(format_many(["<b>Test</b><p></p><img/>"], formatter=format_option),
+                          [u'<b>Test</b><br/><img style="vertical-align:middle"/>'])
+
+
+class TestLRUCache(TestCase):
+
+    def test_eviction(self):
+        cache = LRUCache(max_size=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        self.assertEquals(cache.get('a'), 1)
+        cache.set('c', 3)
+        # b is the least recently used
+        self.assertIsNone(cache.get('b'))
+        self.assertEquals(cache.get('a'), 1)
+        self.assertEquals(cache.get('c'), 3)
+
+    @patch('mobileu.utils.time')
+    def test_timeout(self, mock_time):
+        cache = LRUCache(timeout=60)
+        mock_time.return_value = 1000
+        cache.set('a', 1)
+        mock_time.return_value = 1059
+        self.assertEquals(cache.get('a'), 1)
+        mock_time.return_value = 1061
+        self.assertIsNone(cache.get('a'))
+
+
+class TestLocalSchoolSearch(TestCase):
+
+    def setUp(self):
+        self.organisation = Organisation.objects.create(name='Test Org')
+        for i in xrange(10):
+            School.objects.create(name='School %i' % (i + 1,), organisation=self.organisation, province='Gauteng')
+        School.objects.create(name='FREEDOM', organisation=self.organisation, province='Western Cape')
+        school_trigram_index.load()
+        self.school_index = LocalSchoolIndex()
+
+    def test_search(self):
+        results = self.school_index.search_name(search='School 1', province='Gauteng')
+        self.assertEquals(results[0]['_source']['name'], 'School 1')
+
+        results = self.school_index.search_name(search='freedome', province='Western Cape')
+        self.assertEquals(len(results), 1)
+        self.assertEquals(results[0]['_source']['name'], 'FREEDOM')
+
+        results = self.school_index.search_name(search='freedome', province='Gauteng')
+        self.assertEquals(results, [])
+
+        results = self.school_index.search_name(province='Western Cape')
+        self.assertEquals([r['_source']['name'] for r in results], ['FREEDOM'])
+
+        results = self.school_index.search_name(search='Scho', limit=3, offset=3)
+        self.assertEquals(len(results), 3)
+
+    def test_signals(self):
+        school = School.objects.create(name='Nu School', organisation=self.organisation, province='Limpopo')
+        self.assertEquals(self.school_index.search_name(search='nu sch')[0]['_id'], unicode(school.id))
+
+        school.delete()
+        self.assertEquals(self.school_index.search_name(province='Limpopo'), [])
+
 
 class TestPublishViews(TestCase):
 
@@ -854,3 +935,51 @@ class TestGradeUp(TestCase):
         self.assertEqual(gr_12_count, 0, 'Should have 0 Gr 12 learners, got %d' % (gr_12_count,))
         grad_count = Learner.objects.filter(grade=Learner.GR_GRAD).count()
         self.assertEqual(grad_count, 1, 'Should have 1 graduates, got %d' % (grad_count,))
+
+    @override_settings(GRADE_UP_CHUNK_SIZE=2)
+    def test_grade_up_chunks(self):
+        other_school = create_school('other school name', self.organisation, province='Gauteng')
+        learners = [create_learner(school=school, grade=Learner.GR_10, mobile='08212345%02d' % i,
+                                   username='08212345%02d' % i)
+                    for i, school in enumerate([self.school, other_school] * 3)]
+
+        grade_up_body()
+        run = GradeUpRun.objects.get()
+        self.assertIsNotNone(run.completed_at)
+        self.assertEqual(run.last_learner_id, learners[-1].id)
+        for learner in learners:
+            participant = Participant.objects.get(learner=learner, is_active=True)
+            self.assertEqual(participant.classs.name, '%s - %s' % (learner.school.name, Learner.GR_11))
+        self.assertEqual(Class.objects.get(name='other school name - Grade 11').province, 'Gauteng')
+
+    def test_grade_up_resume(self):
+        # a run that failed after promoting the learners
+        learner = create_learner(school=self.school, grade=Learner.GR_11)
+        GradeUpRun.objects.create(promoted=True)
+
+        grade_up_body()
+        learner = Learner.objects.get(id=learner.id)
+        self.assertEqual(learner.grade, Learner.GR_11)
+        self.assertEqual(Participant.objects.get(learner=learner, is_active=True).classs.name,
+                         'school name - Grade 11')
+        self.assertFalse(GradeUpRun.objects.filter(completed_at__isnull=True).exists())
+
+    def test_grade_up_stale_run(self):
+        # a run that failed last year isn't resumed
+        learner = create_learner(school=self.school, grade=Learner.GR_11)
+        stale = GradeUpRun.objects.create(promoted=True)
+        GradeUpRun.objects.filter(id=stale.id).update(started_at=datetime.now() - timedelta(days=365))
+
+        grade_up_body()
+        self.assertEqual(Learner.objects.get(id=learner.id).grade, Learner.GR_12)
+        self.assertIsNotNone(GradeUpRun.objects.get(id=stale.id).completed_at)
+        self.assertEqual(GradeUpRun.objects.count(), 2)
+
+    def test_grade_up_resume_stale_run(self):
+        learner = create_learner(school=self.school, grade=Learner.GR_11)
+        stale = GradeUpRun.objects.create(promoted=True)
+        GradeUpRun.objects.filter(id=stale.id).update(started_at=datetime.now() - timedelta(days=365))
+
+        grade_up_body(resume=True)
+        self.assertEqual(Learner.objects.get(id=learner.id).grade, Learner.GR_11)
+        self.assertEqual(GradeUpRun.objects.count(), 1)
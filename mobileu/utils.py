@@ -1,10 +1,111 @@
 from bs4 import BeautifulSoup
+from collections import OrderedDict
+from multiprocessing import Pool
+from threading import Lock
+from time import time
+import hashlib
 import re
+from django.conf import settings
+from django.core.cache import cache
 from django.utils.html import remove_tags
 import bleach
 
 
+def new_generation():
+    # a timestamp rather than a counter so an evicted generation key can't
+    # bring back entries from an earlier generation
+    return int(time() * 1000)
+
+
+def get_generation(key):
+    """
+    Returns the generation stored under key. Groups of cache entries that
+    are too many to delete one by one, e.g. everything cached for a course,
+    include the generation in their keys. Bumping the generation then
+    invalidates the whole group at once, and the old entries expire.
+    """
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, new_generation(), None)
+        generation = cache.get(key)
+    return generation
+
+
+def bump_generation(key):
+    """
+    Moves the generation stored under key on, invalidating the entries
+    namespaced by it, and returns the new generation.
+    """
+    try:
+        return cache.incr(key)
+    except ValueError:
+        generation = new_generation()
+        cache.set(key, generation, None)
+        return generation
+
+
+def content_digest(value):
+    if isinstance(value, unicode):
+        value = value.encode('utf-8')
+    return hashlib.sha1(value).hexdigest()
+
+
+def cached_format(formatter, value):
+    """
+    Returns formatter(value), reusing the result for content that has been
+    formatted before.
+    """
+    key = (formatter.__name__, content_digest(value))
+    result = format_cache.get(key)
+    if result is None:
+        result = formatter(value)
+        format_cache.set(key, result)
+    return result
+
+
 def format_content(value):
+    return cached_format(clean_content, value)
+
+
+def format_option(value):
+    return cached_format(clean_option, value)
+
+
+def format_many(values, formatter=format_content, processes=None):
+    """
+    Formats a list of values with format_content or format_option, e.g. for
+    imports. Uncached values are formatted once each, in a process pool when
+    there are at least FORMAT_POOL_MIN_SIZE of them.
+    """
+    clean = {format_content: clean_content, format_option: clean_option}[formatter]
+    keys = [(clean.__name__, content_digest(value)) for value in values]
+    results = [format_cache.get(key) for key in keys]
+
+    missing = OrderedDict()
+    for key, value, result in zip(keys, values, results):
+        if result is None:
+            missing.setdefault(key, value)
+
+    if missing:
+        if len(missing) >= getattr(settings, 'FORMAT_POOL_MIN_SIZE', 100):
+            pool = Pool(processes)
+            try:
+                formatted = pool.map(clean, missing.values())
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            formatted = [clean(value) for value in missing.values()]
+
+        formatted = dict(zip(missing.keys(), formatted))
+        for key, result in formatted.items():
+            format_cache.set(key, result)
+        results = [formatted[key] if result is None else result for key, result in zip(keys, results)]
+
+    return results
+
+
+def clean_content(value):
     value = value.replace('</p>', '<br>')
     value = bleach.clean(value, allowed_tags,
                          allowed_attributes,
@@ -36,7 +137,7 @@ def format_content(value):
     return unicode(output)
 
 
-def format_option(value):
+def clean_option(value):
 
     value = value.replace('</p>', '<br>')
     value = bleach.clean(value, allowed_tags,
@@ -70,3 +171,49 @@ allowed_styles = [
     'font-variant',
     'width',
     'height']
+
+
+class LRUCache(object):
+
+    """
+    A small thread safe in-process cache which evicts the least recently
+    used entry once it holds max_size entries. Entries also expire after
+    timeout seconds when a timeout is given.
+    """
+
+    def __init__(self, max_size=1000, timeout=None):
+        self.max_size = max_size
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return default
+            value, expires = entry
+            if expires is not None and expires < time():
+                return default
+            # re-inserting moves the entry to the most recently used end
+            self._entries[key] = entry
+            return value
+
+    def set(self, key, value):
+        expires = time() + self.timeout if self.timeout is not None else None
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (value, expires)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# formatted content keyed by formatter and content digest
+format_cache = LRUCache(getattr(settings, 'FORMAT_CACHE_SIZE', 2000))
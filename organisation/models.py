@@ -1,5 +1,8 @@
 from django.db import models
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.utils.encoding import python_2_unicode_compatible
+from django.utils.timezone import now
 
 PROVINCE_CHOICES = (
     ("Eastern Cape", "Eastern Cape"),
@@ -69,6 +72,27 @@ class School(models.Model):
         verbose_name_plural = "Schools"
 
 
+class SchoolIndexChange(models.Model):
+
+    """
+    Schools that have been saved or deleted since they were last written to
+    the ElasticSearch school index.
+    """
+    school_id = models.PositiveIntegerField("School", unique=True)
+    changed_at = models.DateTimeField("Changed At", db_index=True)
+
+    @staticmethod
+    def track(school_id):
+        if not SchoolIndexChange.objects.filter(school_id=school_id).update(changed_at=now()):
+            SchoolIndexChange.objects.get_or_create(school_id=school_id, defaults={'changed_at': now()})
+
+
+@receiver(post_save, sender=School)
+@receiver(post_delete, sender=School)
+def track_school_index_change(sender, instance, **kwargs):
+    SchoolIndexChange.track(instance.pk)
+
+
 @python_2_unicode_compatible
 class Course(models.Model):
 
@@ -78,6 +102,10 @@ class Course(models.Model):
     additionally have a series of settings which define the 'business
     logic' for a courses.
     """
+    QO_RANDOM = 1
+    QO_ORDERED = 2
+    QO_RANDOM_INTELLIGENT = 3
+
     name = models.CharField(
         "Name", max_length=500, null=True, blank=False, unique=True)
     description = models.CharField("Description", max_length=500, blank=True)
@@ -86,7 +114,8 @@ class Course(models.Model):
     # This means a Module and its questions can be presented differently in
     # different courses.
     question_order = models.PositiveIntegerField("Question Order", choices=(
-        (1, "Random"), (2, "Ordered"), (3, "Random Intelligent")), default=1)
+        (QO_RANDOM, "Random"), (QO_ORDERED, "Ordered"), (QO_RANDOM_INTELLIGENT, "Random Intelligent")),
+        default=QO_RANDOM)
     is_active = models.BooleanField("Is Active", default=True)
 
     # modulees
@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 from django.test import TestCase
 from tablib import Dataset
-from organisation.models import Organisation, School
+from organisation.models import Organisation, School, SchoolIndexChange
 from organisation.resources import SchoolResource
 
 
@@ -52,3 +52,16 @@ class TestOrganisation(TestCase):
         School.objects.get(name='Nu School 1')
         School.objects.get(name='Nu School 2')
         School.objects.get(name='Nu School 3')
+
+    def test_school_index_change_tracking(self):
+        change = SchoolIndexChange.objects.get(school_id=self.school.id)
+
+        self.school.province = 'Gauteng'
+        self.school.save()
+        self.assertEqual(SchoolIndexChange.objects.filter(school_id=self.school.id).count(), 1)
+        self.assertGreaterEqual(SchoolIndexChange.objects.get(school_id=self.school.id).changed_at, change.changed_at)
+
+        school_id = self.school.id
+        SchoolIndexChange.objects.all().delete()
+        self.school.delete()
+        self.assertTrue(SchoolIndexChange.objects.filter(school_id=school_id).exists())